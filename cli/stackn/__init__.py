@@ -1,6 +1 @@
-from .create import create
-from .delete import delete
-from .get import get
-from .login import login
 from .main import main
-from .set import set
@@ -0,0 +1,137 @@
+"""
+Content addressed upload of model artifacts.
+
+An artifact is stored under the sha256 of its bytes, so re-releasing the
+same weights under a new version stores nothing new. The artifact is
+read in CHUNK_SIZE chunks and every chunk that Studio already knows
+(from the manifests of earlier versions, see get_known) is taken from
+the stored artifact it is part of instead of being uploaded: only new
+chunks are uploaded, as temporary objects, and the artifact is composed
+server side from those and ranges of earlier artifacts. The manifest of
+chunk hashes is stored with the model by Studio.
+"""
+import hashlib
+import io
+import uuid
+
+import stackn.client
+
+# Compose sources except the last must be at least 5 MiB, chunks are
+# reused as such sources.
+CHUNK_SIZE = 8*1024*1024
+PART_PREFIX = 'uploads/'
+
+
+def content_key(content_hash):
+    """ The object name of the artifact with sha256 content_hash. """
+    return 'sha256-{}'.format(content_hash)
+
+
+def get_known(url, auth_header, verify, model_name):
+    """
+    The artifacts and chunks Studio has stored for earlier versions of
+    model_name, as ({hash: location}, {chunk hash: location}). Empty if
+    Studio does not keep manifests.
+    """
+    r = stackn.client.get_session().get(url, headers=auth_header,
+                                        params={'name': model_name},
+                                        verify=verify)
+    if not r:
+        return dict(), dict()
+    known = r.json()
+    return known['objects'], known['chunks']
+
+
+def _read_chunk(data, size):
+    parts = []
+    missing = size
+    while missing > 0:
+        part = data.read(missing)
+        if not part:
+            break
+        parts.append(part)
+        missing -= len(part)
+    return b''.join(parts)
+
+
+def _object_exists(client, bucket, name):
+    try:
+        client.stat_object(bucket, name)
+    except Exception:
+        return False
+    return True
+
+
+def _sources(locations):
+    """ ComposeSources of locations, adjacent ranges of an object merged. """
+    from minio.commonconfig import ComposeSource
+    merged = []
+    for bucket, name, offset, length in locations:
+        if merged and merged[-1][:2] == [bucket, name] and \
+                offset is not None and merged[-1][2] is not None and \
+                merged[-1][2]+merged[-1][3] == offset:
+            merged[-1][3] += length
+        else:
+            merged.append([bucket, name, offset, length])
+    return [ComposeSource(bucket, name, offset=offset, length=length)
+            for bucket, name, offset, length in merged]
+
+
+def upload(client, bucket, data, known_objects={}, known_chunks={},
+           chunk_size=CHUNK_SIZE):
+    """
+    Stores the file-like data in bucket under its content key, uploading
+    only chunks that are not in known_chunks. Returns (object name,
+    manifest, bytes uploaded).
+    """
+    total = hashlib.sha256()
+    hashes = []
+    locations = []
+    parts = []
+    size = 0
+    uploaded = 0
+    upload_id = uuid.uuid4().hex
+    try:
+        chunk = _read_chunk(data, chunk_size)
+        first = chunk
+        while chunk:
+            digest = hashlib.sha256(chunk).hexdigest()
+            total.update(chunk)
+            hashes.append(digest)
+            size += len(chunk)
+            next_chunk = _read_chunk(data, chunk_size)
+            known = known_chunks.get(digest)
+            if known:
+                locations.append((known['bucket'], known['object'],
+                                  known['offset'], known['length']))
+            elif len(hashes) > 1 or next_chunk:
+                # A single chunk artifact is stored directly below.
+                part = '{}{}/{}'.format(PART_PREFIX, upload_id, len(hashes))
+                client.put_object(bucket, part, io.BytesIO(chunk), len(chunk))
+                parts.append(part)
+                locations.append((bucket, part, None, None))
+                uploaded += len(chunk)
+            chunk = next_chunk
+
+        content_hash = total.hexdigest()
+        name = content_key(content_hash)
+        known = known_objects.get(content_hash)
+        if (known and known['bucket'] == bucket and known['object'] == name) or \
+                _object_exists(client, bucket, name):
+            pass
+        elif not locations:
+            # A new artifact of at most one chunk.
+            client.put_object(bucket, name, io.BytesIO(first), len(first))
+            uploaded += len(first)
+        else:
+            client.compose_object(bucket, name, _sources(locations))
+    finally:
+        for part in parts:
+            try:
+                client.remove_object(bucket, part)
+            except Exception as err:
+                print('Failed to remove temporary object {}: {}'.format(part, err))
+
+    manifest = {'algorithm': 'sha256', 'chunk_size': chunk_size,
+                'size': size, 'hash': content_hash, 'chunks': hashes}
+    return name, manifest, uploaded
@@ -1,19 +1,22 @@
 
 import base64
+import contextlib
+import copy
 import json
 import os
+import threading
+import time
 import urllib.parse
 from getpass import getpass
-from pathlib import Path
 
-import jwt
-import requests
-import urllib3
+try:
+    import fcntl
+except ImportError:  # Windows, the config is then only locked in process.
+    fcntl = None
 
+import stackn.client
 import stackn.error_msg
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
 STACKN_CONFIG_PATH = '~/.scaleout'
 STACKN_CONFIG_FILE = 'stackn.json'
 
@@ -37,6 +40,9 @@ env_vars = {
     # 'STACKN_REFRESH_TOKEN': []
 }
 
+# An access token is refreshed when it expires within this many seconds.
+REFRESH_MARGIN = 300
+
 
 # STACKN_SECURE is by default always set to True. However we allow to deploy STACKn locally for development and testing purposes.
 # That's when a user needs to login with the flag --insecure, and thus STACKN_SECURE will be False
@@ -75,6 +81,8 @@ def _get_studio_url_key(studio_url):
 
 def _get_config_file(rw='r'):
     path_to_config = _get_stackn_config_path()
+    if rw != 'r':
+        _forget_config()
     try:
         fin = open(path_to_config, rw)
     except Exception as err:
@@ -95,15 +103,76 @@ def _is_user_logged():
         return True
 
 
-def _load_config_file_full(conf):
-    stackn_config = []
-    fin = _get_config_file()
-    if fin:
+# Parsed config files by path. A command reads the config many times, it
+# is parsed once per process and dropped whenever it is written.
+_config_cache = dict()
+
+
+def _forget_config():
+    _config_cache.clear()
+
+
+_lock = threading.RLock()
+_lock_file = None
+_lock_depth = 0
+
+
+@contextlib.contextmanager
+def _config_lock():
+    """
+    Holds an exclusive lock on the config file, shared with other stackn
+    processes, for a read-modify-write of the config. Reentrant.
+    """
+    global _lock_file, _lock_depth
+    with _lock:
+        if _lock_depth == 0:
+            _lock_file = open(_get_stackn_config_path()+'.lock', 'a')
+            if fcntl:
+                fcntl.flock(_lock_file, fcntl.LOCK_EX)
+        _lock_depth += 1
         try:
-            stackn_config = json.load(fin)
-        except:
-            return []
-    return stackn_config
+            yield
+        finally:
+            _lock_depth -= 1
+            if _lock_depth == 0:
+                # Closing the file releases the lock.
+                _lock_file.close()
+                _lock_file = None
+
+
+def _update_config(update):
+    """
+    Calls update(config) on the config as stored now and writes the
+    result, under the config lock so that concurrent commands do not
+    lose each other's changes. The file is replaced atomically, readers
+    never see it half written.
+    """
+    path_to_config = _get_stackn_config_path()
+    with _config_lock():
+        _forget_config()
+        stackn_config = _load_config_file_full({}) or dict()
+        update(stackn_config)
+        tmp = path_to_config+'.tmp'
+        with open(tmp, 'w') as fout:
+            json.dump(stackn_config, fout)
+        os.replace(tmp, path_to_config)
+        _forget_config()
+
+
+def _load_config_file_full(conf):
+    path_to_config = _get_stackn_config_path()
+    if path_to_config not in _config_cache:
+        stackn_config = []
+        fin = _get_config_file()
+        if fin:
+            try:
+                stackn_config = json.load(fin)
+            except:
+                stackn_config = []
+            fin.close()
+        _config_cache[path_to_config] = stackn_config
+    # Callers modify the result before writing it back.
+    return copy.deepcopy(_config_cache[path_to_config])
 
 
 def _load_config_file_url(conf, is_login=False):
@@ -173,20 +242,29 @@ def _set_current(conf):
         print("Failed to get current STACKn configuration file.")
         return []
 
-    stackn_config = _load_config_file_full(conf)
-    if not 'current' in stackn_config:
-        stackn_config['current'] = {'STACKN_URL': '',
-                                    'STACKN_PROJECT': '', 'STACKN_SECURE': ''}
-    if current['STACKN_URL']:
-        stackn_config['current']['STACKN_URL'] = current['STACKN_URL']
-        if current['STACKN_PROJECT']:
+    def update_current(stackn_config):
+        if not 'current' in stackn_config:
+            stackn_config['current'] = {'STACKN_URL': '',
+                                        'STACKN_PROJECT': '', 'STACKN_SECURE': ''}
+        if current['STACKN_URL']:
+            stackn_config['current']['STACKN_URL'] = current['STACKN_URL']
+            if current['STACKN_PROJECT']:
+                stackn_config['current']['STACKN_PROJECT'] = current['STACKN_PROJECT']
+            else:
+                stackn_config['current']['STACKN_PROJECT'] = ''
+        elif current['STACKN_PROJECT']:
             stackn_config['current']['STACKN_PROJECT'] = current['STACKN_PROJECT']
-        else:
-            stackn_config['current']['STACKN_PROJECT'] = ''
-    elif current['STACKN_PROJECT']:
-        stackn_config['current']['STACKN_PROJECT'] = current['STACKN_PROJECT']
-    if current['STACKN_SECURE'] != 'NOTSET':
-        stackn_config['current']['STACKN_SECURE'] = current['STACKN_SECURE']
+        if current['STACKN_SECURE'] != 'NOTSET':
+            stackn_config['current']['STACKN_SECURE'] = current['STACKN_SECURE']
+
+    # Write to file
+    try:
+        _update_config(update_current)
+    except Exception as err:
+        print("Failed to write current settings to file.")
+        print(err)
+        return []
+    stackn_config = _load_config_file_full(conf)
 
     if 'STACKN_URL' in os.environ and stackn_config['current']['STACKN_URL'] != '':
         print("STACKN_URL set as environment variable and this takes priority.")
@@ -200,16 +278,7 @@ def _set_current(conf):
         print("STACKN_SECURE set as environment variable and this takes priority.")
         print("Set by 'export STACKN_SECURE={}'".format(
             stackn_config['current']['STACKN_SECURE']))
-
-    # Write to file
-    fout = _get_config_file('w')
-    if fout:
-        json.dump(stackn_config, fout)
-        fout.close()
-        return True
-    else:
-        print("Failed to write current settings to file.")
-        return []
+    return True
 
 
 def get_config(inp_config=dict(), required=[], is_login=False, print_warnings=True):
@@ -277,54 +346,123 @@ def get_config(inp_config=dict(), required=[], is_login=False, print_warnings=Tr
     return conf, True
 
 
-def get_token(conf={}):
+def _studio_url(conf):
+    if not "http" in conf['STACKN_URL']:
+        return "http://" + conf['STACKN_URL']
+    return conf['STACKN_URL']
+
+
+def _token_expires(resp):
+    # Studio reports the lifetime in seconds (None: never expires), it is
+    # stored as a local timestamp so that clock skew does not matter.
+    if resp.get('expires_in') is None:
+        return None
+    return time.time()+resp['expires_in']
+
+
+def fetch_token(conf={}):
+    """
+    Logs in with STACKN_USER and STACKN_PASS, returns (token, expiry
+    timestamp or None) or (False, None).
+    """
     # It send a POST request to /api/token-auth/
     # components/studio/api/views.py --> CustomAuthToken
-    if not "http" in conf['STACKN_URL']:
-        studio_url = "http://" + conf['STACKN_URL']
-    else:
-        studio_url = conf['STACKN_URL']
     # previously keycloak token url
-    token_url = studio_url.strip('/')+'/api/token-auth/'
+    token_url = _studio_url(conf).strip('/')+'/api/token-auth/'
 
     print("INFO: Token URL is: {}".format(token_url))
 
     req = {'username': conf['STACKN_USER'],
            'password': conf['STACKN_PASS'],
            }
-    res = requests.post(token_url, json=req, verify=conf['STACKN_SECURE'])
-    resp = res.json()
+    res = stackn.client.get_session().post(token_url, json=req,
+                                           verify=conf['STACKN_SECURE'])
+    try:
+        resp = res.json()
+    except ValueError:
+        resp = {}
 
     if 'token' in resp:
         print('Token retrieved successfully.')
-        return resp['token']
+        return resp['token'], _token_expires(resp)
     else:
         print('Failed to fetch token.')
         print(res.text)
-        return False
+        return False, None
 
 
-def write_config(conf):
+def get_token(conf={}):
+    return fetch_token(conf)[0]
+
+
+def refresh_token(conf):
+    """
+    Extends the lifetime of the access token of conf, returns (token,
+    expiry timestamp or None) or (False, None) if it has expired.
+    """
+    refresh_url = _studio_url(conf).strip('/')+'/api/token-refresh/'
+    header = {'Authorization': 'Token {}'.format(conf['STACKN_ACCESS_TOKEN'])}
+    res = stackn.client.get_session().post(refresh_url, headers=header,
+                                           verify=conf['STACKN_SECURE'])
+    if not res:
+        return False, None
+    resp = res.json()
+    return resp['token'], _token_expires(resp)
+
+
+def _token_valid(conf):
+    expires = conf.get('STACKN_TOKEN_EXPIRES')
+    return not expires or expires-time.time() > REFRESH_MARGIN
+
+
+def get_access_token(conf):
+    """
+    The access token of conf (as returned by get_config). A token that
+    expires within REFRESH_MARGIN seconds is refreshed first, or replaced
+    by logging in again if it has expired and the password is known.
+    The new token is stored in the config file and in conf, so concurrent
+    commands share it and later calls cost nothing.
+    """
+    if _token_valid(conf):
+        return conf['STACKN_ACCESS_TOKEN']
+
+    with _config_lock():
+        # Another command may have refreshed it while we waited.
+        _forget_config()
+        stored = _load_config_file_url(conf) or {}
+        if stored.get('STACKN_ACCESS_TOKEN') and _token_valid(stored):
+            token = stored['STACKN_ACCESS_TOKEN']
+            expires = stored.get('STACKN_TOKEN_EXPIRES')
+        else:
+            token, expires = False, None
+            if conf['STACKN_TOKEN_EXPIRES'] > time.time():
+                token, expires = refresh_token(conf)
+            if not token and conf.get('STACKN_USER') and conf.get('STACKN_PASS'):
+                token, expires = fetch_token(conf)
+            if not token:
+                print('Access token has expired, please login again.')
+                return conf['STACKN_ACCESS_TOKEN']
+            studio_url_key = _get_studio_url_key(conf['STACKN_URL'])
+
+            def store_token(stackn_config):
+                if studio_url_key in stackn_config:
+                    stackn_config[studio_url_key].update(
+                        STACKN_ACCESS_TOKEN=token, STACKN_TOKEN_EXPIRES=expires)
+            _update_config(store_token)
+    conf['STACKN_ACCESS_TOKEN'] = token
+    conf['STACKN_TOKEN_EXPIRES'] = expires
+    return token
 
-    studio_url = conf['STACKN_URL']
 
-    path_to_config = _get_stackn_config_path()
-    Path(path_to_config).touch()
+def write_config(conf):
 
-    f = open(path_to_config, 'r')
-    try:
-        current_config = json.load(f)
-    except:
-        current_config = dict()
-    f.close()
+    studio_url_key = _get_studio_url_key(conf['STACKN_URL'])
 
-    studio_url_key = _get_studio_url_key(studio_url)
-    current_config[studio_url_key] = conf
+    def store(current_config):
+        current_config[studio_url_key] = conf
 
     try:
-        fout = open(path_to_config, 'w')
-        json.dump(current_config, fout)
-        fout.close()
+        _update_config(store)
     except Exception as err:
         print('Could not write tokens -- failed to write to file.')
         print(err)
@@ -365,8 +503,10 @@ def stackn_login(studio_url=[], client_id=[], username=[], password=[], secure=T
         conf['STACKN_PASS'] = getpass()
 
     if conf['STACKN_PASS']:
-        conf['STACKN_ACCESS_TOKEN'] = get_token(conf)
-        #conf['STACKN_REFRESH_TOKEN'] = refresh_token
+        token, expires = fetch_token(conf)
+        conf['STACKN_ACCESS_TOKEN'] = token
+        conf['STACKN_TOKEN_EXPIRES'] = expires
+        # conf['STACKN_REFRESH_TOKEN'] = refresh_token
 
     write_config(conf)
 
@@ -0,0 +1,165 @@
+import atexit
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import stackn.auth
+import stackn.client
+import stackn.stackn
+
+# Records kept for retry while Studio is unreachable, the oldest are
+# dropped beyond this.
+MAX_BUFFER = 10000
+
+
+class BufferedLogger:
+    """
+    Buffers per-run records (training logs or metadata) and sends them to
+    the bulk endpoint of the current project in batches.
+
+    Records are flushed when batch_size records are buffered, when
+    flush_interval seconds have passed since the last flush, on close()
+    and at interpreter exit. Records that fail to send are kept and
+    retried on the next flush, up to max_buffer records after which the
+    oldest are dropped. With background=True add() never waits
+    for Studio, the flushes it triggers run on a separate thread.
+
+    The project is resolved from conf unless url (of the project endpoint),
+    auth_header and a resolved conf are passed, as stackn.sdk.Client does.
+
+        with BufferedLogger('metadata') as log:
+            for epoch in range(epochs):
+                log.add(run_id=..., trained_model=..., metrics={...})
+    """
+
+    def __init__(self, endpoint_type, batch_size=100, flush_interval=10.0, conf={},
+                 background=False, max_buffer=MAX_BUFFER, url=None,
+                 auth_header=None, session=None):
+        if url is None:
+            conf, auth_header, url = stackn.stackn.setup_project_endpoint_call(
+                conf, endpoint_type)
+            if not conf:
+                raise RuntimeError(
+                    'Failed to set up {} logging for the current project.'.format(endpoint_type))
+        self.conf = conf
+        self.endpoint_type = endpoint_type
+        self.url = url+'bulk/'
+        # The project id may come from the cache, a 404 looks it up again
+        # once.
+        self._refreshed = False
+        self.verify = conf['STACKN_SECURE']
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max(max_buffer, batch_size)
+        # The shared session is used unless the caller passes its own,
+        # the headers go with each request since it is not ours.
+        self.session = session or stackn.client.get_session()
+        self.headers = dict(auth_header)
+        self.headers['Content-Type'] = 'application/x-ndjson'
+        self._buffer = []
+        # add() only appends while a flush removes sent records from the
+        # front, _lock guards the buffer and _flush_lock lets one flush
+        # run at a time.
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._executor = None
+        if background:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        # Records dropped from the front of a full buffer, in total and
+        # since the last report.
+        self._dropped = 0
+        self._unreported = 0
+        self._pending = None
+        self._last_flush = time.monotonic()
+        atexit.register(self.close)
+
+    def add(self, **record):
+        with self._lock:
+            self._buffer.append(record)
+            if len(self._buffer) > self.max_buffer:
+                del self._buffer[0]
+                self._dropped += 1
+                self._unreported += 1
+            due = (len(self._buffer) >= self.batch_size or
+                   time.monotonic()-self._last_flush >= self.flush_interval)
+        if not due:
+            return
+        if self._executor is None:
+            self.flush()
+        elif self._pending is None or self._pending.done():
+            self._last_flush = time.monotonic()
+            self._pending = self._executor.submit(self.flush)
+
+    def flush(self):
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        with self._lock:
+            dropped, self._unreported = self._unreported, 0
+        if dropped:
+            print('Dropped {} records that could not be sent.'.format(dropped))
+        # A long running job outlives its token, refresh it if needed.
+        self.headers['Authorization'] = 'Token {}'.format(
+            stackn.auth.get_access_token(self.conf))
+        while True:
+            with self._lock:
+                batch = self._buffer[:self.batch_size]
+                dropped = self._dropped
+            if not batch:
+                return True
+            body = '\n'.join(json.dumps(record, default=str)
+                             for record in batch)
+            try:
+                r = self.session.post(self.url, data=body.encode('utf-8'),
+                                      headers=self.headers, verify=self.verify)
+            except requests.RequestException as err:
+                print('Failed to send {} records: {}'.format(len(batch), err))
+                return False
+            if r.status_code == 404 and not self._refreshed:
+                self._refreshed = True
+                auth_header = {'Authorization': self.headers['Authorization']}
+                url = stackn.stackn.refresh_project_url(
+                    self.conf, auth_header, self.endpoint_type,
+                    self.url[:-len('bulk/')])
+                if url:
+                    self.url = url+'bulk/'
+                    continue
+            if not stackn.stackn._check_status(r, error_msg='Failed to send {} records.'.format(len(batch))):
+                if r.status_code == 400:
+                    # The batch itself is malformed, retrying will not help.
+                    self._remove_sent(batch, dropped)
+                return False
+            self._remove_sent(batch, dropped)
+
+    def _remove_sent(self, batch, dropped):
+        with self._lock:
+            # add() may have dropped records of the batch meanwhile.
+            del self._buffer[:max(0, len(batch)-(self._dropped-dropped))]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        if self._buffer:
+            self.flush()
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def metadata_logger(**kwargs):
+    """ Buffered client for /projects/<id>/metadata/bulk/. """
+    return BufferedLogger('metadata', **kwargs)
+
+
+def modellog_logger(**kwargs):
+    """ Buffered client for /projects/<id>/modellogs/bulk/. """
+    return BufferedLogger('modellogs', **kwargs)
@@ -0,0 +1,92 @@
+"""
+Concurrent execution of bulk CLI commands (creating apps and templates
+from folders, deleting apps and model objects).
+
+run() calls an operation once per item on a thread pool, retries
+transient failures with exponential backoff and prints one line per
+item followed by a summary. Operations run concurrently, so they must
+not depend on the working directory or other process wide state.
+Operations that are not idempotent (creating apps and templates) are
+only retried when the request cannot have been processed, otherwise a
+retry could create a duplicate.
+"""
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import stackn.client
+
+DEFAULT_WORKERS = 4
+RETRIES = 3
+# Seconds before the first retry, doubled on every further attempt.
+BACKOFF = 0.5
+# Responses that are worth retrying, any other failure is final.
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# Responses to requests that were refused before any processing, safe
+# to retry for operations that are not idempotent.
+REFUSED_STATUS = (429,)
+
+Result = namedtuple('Result', ['item', 'ok', 'message', 'attempts'])
+
+
+def _call(operation, item, retries, backoff, idempotent=True):
+    import requests
+    if idempotent:
+        retry_errors, retry_status = requests.RequestException, RETRY_STATUS
+    else:
+        # The connection was never made, so nothing was sent.
+        retry_errors, retry_status = requests.ConnectTimeout, REFUSED_STATUS
+    attempts = 0
+    while True:
+        attempts += 1
+        retry = False
+        try:
+            res = operation(item)
+        except retry_errors as err:
+            message = str(err)
+            retry = True
+        except Exception as err:
+            message = str(err)
+        else:
+            if res:
+                return Result(item, True, '', attempts)
+            message = 'Status code: {} {}'.format(res.status_code,
+                                                  res.text[:200])
+            retry = res.status_code in retry_status
+        if not retry or attempts > retries:
+            return Result(item, False, message, attempts)
+        time.sleep(backoff * 2**(attempts-1))
+
+
+def run(operation, items, describe=str, success='Done: {}',
+        failure='Failed: {}', workers=DEFAULT_WORKERS, retries=RETRIES,
+        backoff=BACKOFF, idempotent=True):
+    """
+    Calls operation(item) for every item, at most workers at a time.
+    operation returns a requests.Response, a failed response or a
+    requests.RequestException is retried up to retries times when it may
+    be transient. With idempotent=False only requests that were refused
+    unprocessed are retried. success and failure are formatted with describe(item)
+    for the per item report. Returns the list of Results in completion
+    order.
+    """
+    items = list(items)
+    # Never run more workers than the shared session keeps connections.
+    workers = max(1, min(workers, stackn.client.POOL_SIZE))
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_call, operation, item, retries, backoff,
+                                   idempotent)
+                   for item in items]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if result.ok:
+                print(success.format(describe(result.item)))
+            else:
+                print(failure.format(describe(result.item)))
+                print('  {}'.format(result.message))
+    if len(items) > 1:
+        failed = sum(1 for result in results if not result.ok)
+        print('{} succeeded, {} failed.'.format(len(results)-failed, failed))
+    return results
@@ -0,0 +1,106 @@
+import json
+import os
+import time
+
+import stackn.auth
+
+# Connections kept open per host by the shared session.
+POOL_SIZE = 10
+
+# Seconds a project name stays mapped to its id, overridden by
+# STACKN_CACHE_TTL (0 disables the cache).
+PROJECT_CACHE_TTL = 300
+PROJECT_CACHE_FILE = 'stackn_cache.json'
+# Only these project fields are cached, the S3 credentials are not.
+PROJECT_CACHE_FIELDS = ('id', 'name', 'slug')
+
+_session = None
+
+
+def get_session():
+    """
+    The requests session shared by all calls of this process, so that
+    connections (and their TLS handshakes) are reused between requests.
+    """
+    global _session
+    if _session is None:
+        # requests (and urllib3) take a large share of the CLI start up
+        # time, they are loaded with the first request.
+        import requests
+        import urllib3
+        from requests.adapters import HTTPAdapter
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE,
+                              pool_maxsize=POOL_SIZE)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _session = session
+    return _session
+
+
+def _project_cache_path():
+    config_path = stackn.auth._get_stackn_config_path()
+    return os.path.join(os.path.dirname(config_path), PROJECT_CACHE_FILE)
+
+
+def _project_cache_ttl():
+    try:
+        return float(os.environ.get('STACKN_CACHE_TTL', PROJECT_CACHE_TTL))
+    except ValueError:
+        return PROJECT_CACHE_TTL
+
+
+def _project_cache_key(conf):
+    studio_url = stackn.auth._get_studio_url_key(conf['STACKN_URL'])
+    return '{}|{}|{}'.format(studio_url, conf.get('STACKN_USER') or '',
+                             conf['STACKN_PROJECT'])
+
+
+def _load_project_cache():
+    try:
+        with open(_project_cache_path(), 'r') as fin:
+            return json.load(fin)
+    except (OSError, ValueError):
+        return dict()
+
+
+def _write_project_cache(cache):
+    path = _project_cache_path()
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as fout:
+            json.dump(cache, fout)
+    except OSError as err:
+        print('Failed to write project cache {}: {}'.format(path, err))
+
+
+def get_cached_project(conf):
+    """ The cached project of conf['STACKN_PROJECT'] or None. """
+    if _project_cache_ttl() <= 0:
+        return None
+    entry = _load_project_cache().get(_project_cache_key(conf))
+    if not entry or entry['expires'] < time.time():
+        return None
+    return entry['project']
+
+
+def cache_project(conf, project):
+    ttl = _project_cache_ttl()
+    if ttl <= 0:
+        return
+    now = time.time()
+    cache = {key: entry for key, entry in _load_project_cache().items()
+             if entry['expires'] >= now}
+    cache[_project_cache_key(conf)] = {
+        'expires': now + ttl,
+        'project': {field: project[field] for field in PROJECT_CACHE_FIELDS
+                    if field in project},
+    }
+    _write_project_cache(cache)
+
+
+def forget_project(conf):
+    cache = _load_project_cache()
+    if cache.pop(_project_cache_key(conf), None) is not None:
+        _write_project_cache(cache)
@@ -1,11 +1,12 @@
 import json
+import sys
 
 import click
 
-from .main import main
+from .bulk import DEFAULT_WORKERS, RETRIES
 from .stackn import (create_app, create_appinstance, create_apps,
                      create_meta_resource, create_object, create_project,
-                     create_template, create_templates)
+                     create_template, create_templates, wait_app)
 
 
 class AliasedGroup(click.Group):
@@ -17,7 +18,7 @@ class AliasedGroup(click.Group):
         return super().get_command(ctx, cmd_name)
 
 
-@main.group('create', cls=AliasedGroup)
+@click.group('create', cls=AliasedGroup)
 def create():
     pass
 
@@ -39,19 +40,28 @@ def app(settings, chart, logo, studio_url, secure):
 
 
 @create.command('apps')
+@click.option('-f', '--folder', required=False, default=".")
 @click.option('-u', '--studio-url', required=False, default=[])
+@click.option('-j', '--jobs', required=False, default=DEFAULT_WORKERS, help="Apps created in parallel")
+@click.option('--retries', required=False, default=RETRIES)
 @click.option('--secure/--insecure', default=True)
-def apps(studio_url, secure):
-    create_apps(studio_url=studio_url,
-                secure_mode=secure)
+def apps(folder, studio_url, jobs, retries, secure):
+    """Create an app from every subfolder of FOLDER."""
+    create_apps(folder,
+                studio_url=studio_url,
+                secure_mode=secure,
+                workers=jobs,
+                retries=retries)
 
 
 @create.command('appinstance')
 @click.option('-u', '--studio-url', required=False, default=[], help="Studio URL")
 @click.option('-p', '--project', required=False, default=[], help="Project name")
+@click.option('--wait', is_flag=True, help="Wait until the app is running")
+@click.option('--timeout', required=False, default=300, help="Seconds to wait at most")
 @click.option('--secure/--insecure', default=True)
 @click.argument('file')
-def apps(studio_url, project, secure, file):
+def apps(studio_url, project, wait, timeout, secure, file):
     """Deploy an app instance based on parameters given in FILE.\n
        Example FILE: {"app_name": "test",\n
                       "slug": "jupyter-lab",\n
@@ -64,8 +74,13 @@ def apps(studio_url, project, secure, file):
     with open(file) as f:
         data = json.load(f)
     click.echo(f"READING APP PARAMETERS: {data}")
-    create_appinstance(studio_url=studio_url, project=project, data=data,
-                       secure_mode=secure)
+    created = create_appinstance(studio_url=studio_url, project=project,
+                                 data=data, secure_mode=secure)
+    if wait:
+        if not created or not wait_app(data['app_name'], timeout=timeout,
+                                       studio_url=studio_url, project=project,
+                                       secure=secure):
+            sys.exit(1)
 
 
 @create.command('projecttemplate')
@@ -81,11 +96,18 @@ def template(settings, image, studio_url, secure):
 
 
 @create.command('projecttemplates')
+@click.option('-f', '--folder', required=False, default=".")
 @click.option('-u', '--studio-url', required=False, default=[])
+@click.option('-j', '--jobs', required=False, default=DEFAULT_WORKERS, help="Templates created in parallel")
+@click.option('--retries', required=False, default=RETRIES)
 @click.option('--secure/--insecure', default=True)
-def templates(studio_url, secure):
-    create_templates(studio_url=studio_url,
-                     secure_mode=secure)
+def templates(folder, studio_url, jobs, retries, secure):
+    """Create a project template from every subfolder of FOLDER."""
+    create_templates(folder,
+                     studio_url=studio_url,
+                     secure_mode=secure,
+                     workers=jobs,
+                     retries=retries)
 
 
 # Also for non-admin users
@@ -111,8 +133,9 @@ def metaresource(filename, studio_url, project, secure):
 @click.option('-p', '--project', required=False, default=[])
 @click.option('-u', '--studio-url', required=False, default=[])
 @click.option('-s', '--s3-storage', required=False, default=None)
+@click.option('--dedup/--no-dedup', default=True, help="Upload only data that is not stored yet")
 @click.option('--secure/--insecure', default=True)
-def obj(name, object_type, file_name, release_type, version, description, model_card, project, studio_url, s3_storage, secure):
+def obj(name, object_type, file_name, release_type, version, description, model_card, project, studio_url, s3_storage, dedup, secure):
     create_object(name,
                   model_file=file_name,
                   project_name=project,
@@ -123,6 +146,7 @@ def obj(name, object_type, file_name, release_type, version, description, model_
                   model_card=model_card,
                   studio_url=studio_url,
                   s3storage=s3_storage,
+                  dedup=dedup,
                   secure_mode=secure)
 
 
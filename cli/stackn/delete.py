@@ -1,6 +1,6 @@
 import click
 
-from .main import main
+from .bulk import DEFAULT_WORKERS, RETRIES
 from .stackn import (delete_app, delete_meta_resource, delete_object,
                      delete_project)
 
@@ -14,7 +14,7 @@ class AliasedGroup(click.Group):
         return super().get_command(ctx, cmd_name)
 
 
-@main.group('delete')
+@click.group('delete')
 def delete():
     pass
 
@@ -23,9 +23,12 @@ def delete():
 @click.argument('name')
 @click.option('-u', '--studio-url', required=False, default=[])
 @click.option('-p', '--project', required=False, default=[])
+@click.option('-j', '--jobs', required=False, default=DEFAULT_WORKERS, help="Apps deleted in parallel")
+@click.option('--retries', required=False, default=RETRIES)
 @click.option('--secure/--insecure', default=True)
-def app(name, studio_url, project, secure):
-    delete_app(name, studio_url, project, secure)
+def app(name, studio_url, project, jobs, retries, secure):
+    delete_app(name, studio_url, project, secure,
+               workers=jobs, retries=retries)
 
 
 @delete.command('environment')
@@ -63,13 +66,17 @@ def delete_mlflow(name, project, studio_url, secure):
 @click.option('-v', '--version', required=False, default=[])
 @click.option('-u', '--studio-url', required=False, default=[])
 @click.option('-p', '--project', required=False, default=[])
+@click.option('-j', '--jobs', required=False, default=DEFAULT_WORKERS, help="Objects deleted in parallel")
+@click.option('--retries', required=False, default=RETRIES)
 @click.option('--secure/--insecure', default=True)
-def delete_obj(name, version, studio_url, project, secure):
+def delete_obj(name, version, studio_url, project, jobs, retries, secure):
     delete_object(name,
                   version=version,
                   studio_url=studio_url,
                   project=project,
-                  secure=secure)
+                  secure=secure,
+                  workers=jobs,
+                  retries=retries)
 
 
 @delete.command('project')
@@ -0,0 +1,163 @@
+"""
+Parallel, resumable download of model artifacts with a local cache.
+
+An artifact is fetched with ranged GETs of PART_SIZE (or the chunk size
+of its manifest) on a thread pool into '<uid>.part' in the cache
+directory. Finished parts are recorded in '<uid>.part.json' so that an
+interrupted download continues where it stopped. Parts are checked
+against the chunk hashes of the manifest as they arrive and the whole
+artifact against its sha256 (or the MD5 ETag of older, single part
+uploads, older multipart uploads cannot be verified and only get a
+warning) before it is moved into the cache under its uid. Later
+downloads of the same uid are served from the cache.
+
+The cache lives in $STACKN_CACHE_DIR, by default ~/.cache/stackn, and
+can be deleted at any time.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PART_SIZE = 8*1024*1024
+WORKERS = 4
+RETRIES = 3
+BACKOFF = 0.5
+
+
+class DownloadError(Exception):
+    pass
+
+
+def cache_dir():
+    default = os.path.join(os.environ.get('XDG_CACHE_HOME') or
+                           os.path.join(os.path.expanduser('~'), '.cache'),
+                           'stackn')
+    return os.environ.get('STACKN_CACHE_DIR') or default
+
+
+def cache_path(uid):
+    # uids are file names (uuid hex or 'sha256-<hex>'), never paths.
+    return os.path.join(cache_dir(), 'models', os.path.basename(uid))
+
+
+def _file_hash(path, algorithm):
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as fin:
+        for block in iter(lambda: fin.read(1024*1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_state(path, size, etag, part_size):
+    try:
+        with open(path, 'r') as fin:
+            state = json.load(fin)
+    except (OSError, ValueError):
+        return set()
+    # A changed object (or part size) invalidates the finished parts.
+    if [state.get('size'), state.get('etag'), state.get('part_size')] != \
+            [size, etag, part_size]:
+        return set()
+    return set(state.get('done', []))
+
+
+def _save_state(path, size, etag, part_size, done):
+    tmp = path+'.tmp'
+    with open(tmp, 'w') as fout:
+        json.dump({'size': size, 'etag': etag, 'part_size': part_size,
+                   'done': sorted(done)}, fout)
+    os.replace(tmp, path)
+
+
+def _fetch(client, bucket, name, offset, length):
+    for attempt in range(RETRIES+1):
+        response = None
+        try:
+            response = client.get_object(bucket, name, offset, length)
+            data = response.read()
+            if len(data) != length:
+                raise DownloadError('Short read at offset {}.'.format(offset))
+            return data
+        except Exception:
+            if attempt == RETRIES:
+                raise
+            time.sleep(BACKOFF * 2**attempt)
+        finally:
+            if response is not None:
+                response.close()
+                response.release_conn()
+
+
+def fetch(client, bucket, name, uid, manifest=None, workers=WORKERS):
+    """
+    The path of the verified artifact name in bucket in the cache,
+    downloaded unless it is cached already. Raises DownloadError.
+    """
+    target = cache_path(uid)
+    if os.path.exists(target):
+        return target
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+
+    stat = client.stat_object(bucket, name)
+    size = stat.size
+    etag = (stat.etag or '').strip('"')
+    if manifest and manifest['size'] != size:
+        raise DownloadError('Stored artifact does not match its manifest.')
+    part_size = manifest['chunk_size'] if manifest else PART_SIZE
+    part_path = target+'.part'
+    state_path = target+'.part.json'
+
+    done = _load_state(state_path, size, etag, part_size)
+    if not done or not os.path.exists(part_path):
+        done = set()
+        with open(part_path, 'wb') as part:
+            part.truncate(size)
+    todo = [i for i in range(-(-size // part_size)) if i not in done]
+    if done:
+        print('Resuming download, {} of {} parts left.'.format(
+            len(todo), len(todo)+len(done)))
+
+    lock = threading.Lock()
+
+    def download_part(index):
+        offset = index*part_size
+        length = min(part_size, size-offset)
+        data = _fetch(client, bucket, name, offset, length)
+        if manifest and hashlib.sha256(data).hexdigest() != manifest['chunks'][index]:
+            raise DownloadError('Checksum mismatch in part {}.'.format(index))
+        with lock:
+            part.seek(offset)
+            part.write(data)
+            part.flush()
+            done.add(index)
+            _save_state(state_path, size, etag, part_size, done)
+
+    with open(part_path, 'r+b') as part:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            # list() raises the first failure, finished parts are kept.
+            list(pool.map(download_part, todo))
+
+    if manifest:
+        expected, actual = manifest['hash'], _file_hash(part_path, 'sha256')
+    elif len(etag) == 32 and '-' not in etag:
+        # The ETag of a single part upload is the MD5 of the object.
+        expected, actual = etag, _file_hash(part_path, 'md5')
+    else:
+        # Multipart uploads without a manifest carry no checksum of the
+        # whole object.
+        print('Warning: {} has no checksum, the download could not be '
+              'verified.'.format(name))
+        expected = actual = None
+    if expected != actual:
+        for path in (part_path, state_path):
+            if os.path.exists(path):
+                os.remove(path)
+        raise DownloadError('Checksum mismatch, the download was discarded.')
+
+    os.replace(part_path, target)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    return target
@@ -1,9 +1,9 @@
 import click
-import prettytable
 
-from .main import main
-from .stackn import (call_admin_endpoint, call_project_endpoint, get_current,
-                     get_projects, get_remote)
+from .download import WORKERS
+from .output import FORMATS, write_pages
+from .stackn import (call_project_endpoint, download_object, get_current,
+                     get_remote, iter_admin_endpoint, iter_project_endpoint)
 
 
 class AliasedGroup(click.Group):
@@ -15,13 +15,9 @@ class AliasedGroup(click.Group):
         return super().get_command(ctx, cmd_name)
 
 
-def _print_table(resource, names, keys):
-    x = prettytable.PrettyTable()
-    x.field_names = names
-    for item in resource:
-        row = [item[k] for k in keys]
-        x.add_row(row)
-    print(x)
+output_option = click.option(
+    '-o', '--output', type=click.Choice(FORMATS), default='table',
+    help="Output format, json, ndjson and csv are printed as pages arrive")
 
 
 def _find_dict_by_value(dicts, key, value):
@@ -33,31 +29,23 @@ def _find_dict_by_value(dicts, key, value):
     return res
 
 
-@main.group('get', cls=AliasedGroup)
+@click.group('get', cls=AliasedGroup)
 def get():
     pass
 
 
 @get.command('app')
 @click.option('-c', '--category', required=False, default=[])
+@output_option
 @click.option('--secure/--insecure', required=False, default=True)
-def app(category, secure):
-    params = []
+def app(category, output, secure):
+    params = {'fields': 'name,app,table_field,state,status'}
     if category:
-        params = {"app__category": category.lower()}
-    apps = call_project_endpoint('appinstances', params=params, conf={
-                                 "STACKN_SECURE": secure})
+        params['app__category'] = category.lower()
+    pages = iter_project_endpoint('appinstances', params=params, conf={
+                                  "STACKN_SECURE": secure})
 
-    # call_project_endpoint can return false for various reasons
-    if apps == False:
-        print("Apps could not be fetched.")
-        return False
-    elif len(apps) == 0:
-        print("There are no apps associated with the current project.")
-        return
-
-    applist = list()
-    for app in apps:
+    def row(app):
         tmp = dict()
         tmp['name'] = app['name']
         tmp['app_name'] = app['app']['name']
@@ -68,11 +56,15 @@ def app(category, secure):
         tmp['status'] = status['status_type']
         if 'url' in app['table_field']:
             tmp['url'] = app['table_field']['url']
-        applist.append(tmp)
-    applist = sorted(applist, key=lambda k: k['app_cat'])
+        return tmp
 
-    _print_table(applist, ['Category', 'App', 'Name', 'URL', 'Status'], [
-                 'app_cat', 'app_name', 'name', 'url', 'status'])
+    # iter_project_endpoint yields None for various reasons
+    if not write_pages(pages, ['Category', 'App', 'Name', 'URL', 'Status'],
+                       ['app_cat', 'app_name', 'name', 'url', 'status'],
+                       output, row=row, sort_key=lambda k: k['app_cat'],
+                       empty="There are no apps associated with the current project."):
+        print("Apps could not be fetched.")
+        return False
 
 
 @get.command('current')
@@ -95,8 +87,9 @@ def get_curr(secure):
 @get.command('environment')
 @click.option('-p', '--project', required=False, default=[])
 @click.option('-u', '--studio-url', required=False, default=[])
+@output_option
 @click.option('--secure/--insecure', required=False, default=True)
-def environment(project, studio_url, secure):
+def environment(project, studio_url, output, secure):
 
     conf = {
         'STACKN_PROJECT': project,
@@ -104,34 +97,31 @@ def environment(project, studio_url, secure):
         'STACKN_SECURE': secure
     }
 
-    environments = call_project_endpoint('environments', conf=conf)
-
-    if environments == False:
-        return False
-    elif len(environments) == 0:
-        print("There are no environments associated with the current project")
-        return
+    params = {'fields': 'name,app,repository,image'}
+    pages = iter_project_endpoint('environments', conf=conf, params=params)
 
-    envlist = list()
-    for env in environments:
+    def row(env):
         tmp = dict()
         tmp['name'] = env['name']
         tmp['app_name'] = env['app']['name']
         tmp['cat'] = env['app']['category']['name']
         tmp['image'] = env['repository']+'/'+env['image']
-        envlist.append(tmp)
+        return tmp
     header = ['Category', 'App', 'Name', 'Image']
     fields = ['cat', 'app_name', 'name', 'image']
-    envlist = sorted(envlist, key=lambda k: k['cat'])
 
-    _print_table(envlist, header, fields)
+    if not write_pages(pages, header, fields, output, row=row,
+                       sort_key=lambda k: k['cat'],
+                       empty="There are no environments associated with the current project"):
+        return False
 
 
 @get.command('flavor')
 @click.option('-p', '--project', required=False, default=[])
 @click.option('-u', '--studio-url', required=False, default=[])
+@output_option
 @click.option('--secure/--insecure', required=False, default=True)
-def flavor(project, studio_url, secure):
+def flavor(project, studio_url, output, secure):
 
     conf = {
         'STACKN_PROJECT': project,
@@ -139,27 +129,24 @@ def flavor(project, studio_url, secure):
         'STACKN_SECURE': secure
     }
 
-    flavors = call_project_endpoint('flavors', conf=conf)
-
-    if flavors == False:
-        return False
-    elif len(flavors) == 0:
-        print("No flavors are associated to the current project.")
-        return
-
     header = ['Name', 'CPU req', 'CPU lim', 'Mem req',
               'Mem lim', 'GPUs', 'Eph mem req', 'Eph mem lim']
     fields = ['name', 'cpu_req', 'cpu_lim', 'mem_req',
               'mem_lim', 'gpu_req', 'ephmem_req', 'ephmem_lim']
 
-    _print_table(flavors, header, fields)
+    pages = iter_project_endpoint('flavors', conf=conf,
+                                  params={'fields': ','.join(fields)})
+    if not write_pages(pages, header, fields, output,
+                       empty="No flavors are associated to the current project."):
+        return False
 
 
 @get.command('mlflow')
 @click.option('-p', '--project', required=False, default=[])
 @click.option('-u', '--studio-url', required=False, default=[])
+@output_option
 @click.option('--secure/--insecure', required=False, default=True)
-def mlflow(project, studio_url, secure):
+def mlflow(project, studio_url, output, secure):
 
     conf = {
         'STACKN_PROJECT': project,
@@ -167,31 +154,38 @@ def mlflow(project, studio_url, secure):
         'STACKN_SECURE': secure
     }
 
-    mlflows = call_project_endpoint('mlflow', conf=conf)
+    pages = iter_project_endpoint('mlflow', conf=conf,
+                                  params={'fields': 'name,mlflow_url,s3'})
 
-    if mlflows == False:
-        return False
-    elif len(mlflows) == 0:
-        print("No MLflows endpoints are associated to the current project.")
-        return
-
-    mlflowlist = list()
-    for mlflow in mlflows:
+    def row(mlflow):
         tmp = dict()
         tmp['name'] = mlflow['name']
         tmp['URL'] = mlflow['mlflow_url']
         tmp['S3'] = mlflow['s3']['name']
-        mlflowlist.append(tmp)
+        return tmp
 
-    _print_table(mlflowlist, ['Name', 'URL', 'S3'], ['name', 'URL', 'S3'])
+    if not write_pages(pages, ['Name', 'URL', 'S3'], ['name', 'URL', 'S3'],
+                       output, row=row,
+                       empty="No MLflows endpoints are associated to the current project."):
+        return False
 
 
 @get.command('model-obj')
 @click.option('-t', '--object-type', required=False, default="model")
 @click.option('-p', '--project', required=False, default=[])
 @click.option('-u', '--studio-url', required=False, default=[])
+@click.option('--download', required=False, metavar='NAME', help="Download model object NAME")
+@click.option('-v', '--version', required=False, default=None, help="Version to download, the latest by default")
+@click.option('-f', '--file', required=False, default=None, help="File to download to")
+@click.option('-j', '--jobs', required=False, default=WORKERS, help="Parts downloaded in parallel")
+@output_option
 @click.option('--secure/--insecure', required=False, default=True)
-def obj(object_type, project, studio_url, secure):
+def obj(object_type, project, studio_url, download, version, file, jobs, output, secure):
+    if download:
+        download_object(download, version=version, output=file,
+                        studio_url=studio_url, project=project,
+                        secure=secure, workers=jobs)
+        return
 
     conf = {
         'STACKN_OBJECT_TYPE': object_type,
@@ -211,74 +205,63 @@ def obj(object_type, project, studio_url, secure):
         print("No model objects found for this project.")
         return
 
-    params = {'object_type': obj_type['id']}
-
-    objects = call_project_endpoint('models', conf=conf, params=params)
+    params = {'object_type': obj_type['id'],
+              'fields': 'name,version,object_type,uploaded_at'}
 
-    if objects == False:
-        return False
-    elif len(objects) == 0:
-        print("No model objects are associated to the current project.")
-        return
+    pages = iter_project_endpoint('models', conf=conf, params=params)
 
     obj_dict = dict()
     for obj_type in object_types:
         obj_dict[str(obj_type['id'])] = obj_type['name']
-    for obj in objects:
+
+    def row(obj):
         obj['object_type'] = obj_dict[str(obj['object_type'][0])]
+        return obj
 
-    _print_table(objects, ['Name', 'Version', 'Type', 'Created'], [
-                 'name', 'version', 'object_type', 'uploaded_at'])
+    if not write_pages(pages, ['Name', 'Version', 'Type', 'Created'],
+                       ['name', 'version', 'object_type', 'uploaded_at'],
+                       output, row=row,
+                       empty="No model objects are associated to the current project."):
+        return False
 
 
 @get.command('project')
 @click.option('-u', '--studio-url', required=False, default=[])
+@output_option
 @click.option('--secure/--insecure', required=False, default=True)
-def project(studio_url, secure):
+def project(studio_url, output, secure):
 
     conf = {
         'STACKN_URL': studio_url,
         'STACKN_SECURE': secure
     }
 
-    projects = get_projects(conf=conf)
+    pages = iter_admin_endpoint('projects', conf=conf,
+                                params={'fields': 'name,created_at'})
 
-    if projects == False:
+    if not write_pages(pages, ['Name', 'Created'], ['name', 'created_at'],
+                       output,
+                       empty="There are no projects associated to the current user."):
         return False
-    elif len(projects) == 0:
-        print("There are no projects associated to the current user.")
-        return
-
-    _print_table(projects, ['Name', 'Created'], ['name', 'created_at'])
 
 
 @get.command('project-templates')
 @click.option('-u', '--studio-url', required=False, default=[])
+@output_option
 @click.option('--secure/--insecure', required=False, default=True)
-def templates(studio_url, secure):
+def templates(studio_url, output, secure):
     conf = {
         'STACKN_URL': studio_url,
         'STACKN_SECURE': secure
     }
-    templates = call_admin_endpoint('project_templates', conf=conf)
+    pages = iter_admin_endpoint('project_templates', conf=conf,
+                                params={'fields': 'name,description'})
 
-    # call_admin_endpoint can return false for various reasons
-    if templates == False:
+    # iter_admin_endpoint yields None for various reasons
+    if not write_pages(pages, ['Name', 'Description'], ['name', 'description'],
+                       output, empty="There are no templates."):
         print("Templates could not be fetched.")
         return False
-    elif len(templates) == 0:
-        print("There are no templates.")
-        return
-
-    templateslist = list()
-    for template in templates:
-        tmp = dict()
-        tmp['name'] = template['name']
-        tmp['description'] = template['description']
-        templateslist.append(tmp)
-
-    _print_table(templateslist, ['Name', 'Description'], [
-                 'name', 'description'])
 
 
 @get.command('remote')
@@ -298,27 +281,25 @@ def get_rem(secure):
 @click.option('-p', '--project', required=False, default=[])
 @click.option('-u', '--studio-url', required=False, default=[])
 @click.option('-n', '--name', required=False, default=[])
+@output_option
 @click.option('--secure/--insecure', required=False, default=True)
-def s3(project, studio_url, name, secure):
+def s3(project, studio_url, name, output, secure):
     conf = {
         'STACKN_PROJECT': project,
         'STACKN_URL': studio_url,
         'STACKN_SECURE': secure
     }
-    params = []
+    # Only the listed fields, the credentials are not fetched.
+    params = {'fields': 'name,host,region'}
     if name:
-        params = {"name": name}
+        params['name'] = name
 
-    s3s = call_project_endpoint('s3', params=params, conf=conf)
+    pages = iter_project_endpoint('s3', params=params, conf=conf)
 
-    if s3s == False:
+    if not write_pages(pages, ['Name', 'Host', 'Region'],
+                       ['name', 'host', 'region'], output,
+                       empty="There are no S3 endpoints associated with the current project."):
         return False
-    elif len(s3s) == 0:
-        print("There are no S3 endpoints associated with the current project.")
-        return
-    else:
-        _print_table(s3s, ['Name', 'Host', 'Region'],
-                     ['name', 'host', 'region'])
 
 
 ALIASES = {
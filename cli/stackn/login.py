@@ -1,10 +1,9 @@
 import click
 
 from .auth import stackn_login
-from .main import main
 
 
-@main.command('login')
+@click.command('login')
 @click.option('-h', '--url', required=False, default=[])
 @click.option('--secure/--insecure', required=False, default=True)
 @click.option('-u', '--username', required=False, default=[])
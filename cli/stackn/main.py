@@ -1,19 +1,51 @@
+import importlib
 import logging
 
 import click
-import pkg_resources
-
-version = pkg_resources.require("stackn-cli")[0].version
 
 logging.basicConfig(format='%(asctime)s [%(filename)s:%(lineno)d] %(message)s',
                     datefmt='%m/%d/%Y %I:%M:%S %p')  # , level=logging.DEBUG)
 
+# Command groups by name and the module that defines them. A module is
+# only imported when its command runs (or help lists it), so that quick
+# commands do not pay for the imports of every other command.
+COMMANDS = {
+    'create': 'stackn.create',
+    'delete': 'stackn.delete',
+    'get': 'stackn.get',
+    'login': 'stackn.login',
+    'search': 'stackn.search',
+    'set': 'stackn.set',
+    'wait': 'stackn.wait',
+}
+
+
+class LazyGroup(click.Group):
+    def list_commands(self, ctx):
+        return sorted(set(COMMANDS) | set(self.commands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name not in self.commands and cmd_name in COMMANDS:
+            module = importlib.import_module(COMMANDS[cmd_name])
+            self.add_command(getattr(module, cmd_name), cmd_name)
+        return self.commands.get(cmd_name)
+
+
+def _print_version(ctx, param, value):
+    if not value or ctx.resilient_parsing:
+        return
+    try:
+        from importlib.metadata import version
+        cli_version = version('stackn-cli')
+    except ImportError:  # Python < 3.8
+        import pkg_resources
+        cli_version = pkg_resources.get_distribution('stackn-cli').version
+    click.echo('Scaleout STACKn CLI, {}'.format(cli_version))
+    ctx.exit()
+
 
-@click.version_option(
-    version=version,
-    prog_name='Scaleout STACKn CLI',
-    message='%(prog)s, %(version)s'
-)
-@click.group(help='CLI tool to manage STACKn common tasks. Please note that stackn cli commands are case sensitive.')
+@click.group(cls=LazyGroup, help='CLI tool to manage STACKn common tasks. Please note that stackn cli commands are case sensitive.')
+@click.option('--version', is_flag=True, expose_value=False, is_eager=True,
+              callback=_print_version, help='Show the version and exit.')
 def main():
     pass
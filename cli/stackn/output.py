@@ -0,0 +1,82 @@
+"""
+Output of stackn get listings.
+
+'table' collects all rows into a PrettyTable. The machine readable
+formats write each page of rows as soon as it arrives from Studio, so
+large listings start printing at once and memory use does not grow with
+their size: 'json' writes one JSON array, 'ndjson' one JSON object per
+line and 'csv' a header of the keys followed by one line per row.
+"""
+import csv
+import json
+import sys
+
+FORMATS = ('table', 'json', 'ndjson', 'csv')
+
+
+def print_table(rows, names, keys):
+    import prettytable
+    x = prettytable.PrettyTable()
+    x.field_names = names
+    for row in rows:
+        x.add_row([row[k] for k in keys])
+    print(x)
+
+
+def _table(pages, names, keys, row, sort_key, empty):
+    rows = []
+    for page in pages:
+        if page is None:
+            return False
+        rows.extend(row(item) for item in page)
+    if not rows:
+        print(empty)
+        return True
+    if sort_key:
+        rows.sort(key=sort_key)
+    print_table(rows, names, keys)
+    return True
+
+
+def write_pages(pages, names, keys, fmt='table', row=None, sort_key=None,
+                empty='Nothing found.', out=None):
+    """
+    Prints the items of pages, lists of API items as they arrive (None if
+    fetching failed), converted to dicts by row. Only keys are written,
+    under the column names in a table. Tables are sorted on sort_key,
+    streamed formats keep the order of the API. Returns False if fetching
+    failed, a streamed listing is then cut short.
+    """
+    row = row or (lambda item: item)
+    if fmt == 'table':
+        return _table(pages, names, keys, row, sort_key, empty)
+
+    out = out or sys.stdout
+    writer = csv.writer(out) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(keys)
+    elif fmt == 'json':
+        out.write('[')
+    count = 0
+    for page in pages:
+        if page is None:
+            # An unterminated JSON array tells consumers the list is incomplete.
+            out.flush()
+            return False
+        for item in page:
+            values = row(item)
+            if writer:
+                writer.writerow([values[k] for k in keys])
+                continue
+            line = json.dumps({k: values[k] for k in keys}, default=str)
+            if fmt == 'json':
+                line = (',\n' if count else '\n')+line
+            else:
+                line += '\n'
+            out.write(line)
+            count += 1
+        out.flush()
+    if fmt == 'json':
+        out.write('\n]\n' if count else ']\n')
+    out.flush()
+    return True
@@ -0,0 +1,225 @@
+"""
+In-process tar.gz packaging of model folders and app charts.
+
+TarGzStream archives a directory on the fly: a background thread writes
+the tar stream in fixed size blocks, the blocks are gzip compressed on a
+thread pool (zlib releases the GIL) and read() hands out the compressed
+members in order. Concatenated gzip members are a valid gzip file, so
+the result unpacks with tar -xzf or tarfile. Nothing is written to disk
+and memory use is bounded by a few blocks per worker.
+
+Files matching DEFAULT_IGNORE or the patterns of a .stacknignore file in
+the packaged directory are left out, see load_ignore().
+"""
+import fnmatch
+import os
+import queue
+import tarfile
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+IGNORE_FILE = '.stacknignore'
+DEFAULT_IGNORE = ('.git/', '__pycache__/', '.ipynb_checkpoints/', '*.pyc')
+BLOCK_SIZE = 1024*1024
+COMPRESS_LEVEL = 6
+WORKERS = min(4, os.cpu_count() or 1)
+# Files larger than this are reported, they are often data sets that
+# should have been ignored.
+LARGE_FILE = 100*1024*1024
+
+
+def load_ignore(root):
+    """
+    The ignore patterns of root: DEFAULT_IGNORE followed by the lines of
+    root/.stacknignore. Patterns use gitignore syntax: '#' starts a
+    comment, a trailing '/' only matches directories, a pattern with a
+    '/' elsewhere is matched against the path relative to root (other
+    patterns against the name at any depth) and a leading '!' includes
+    a path excluded by an earlier pattern.
+    """
+    patterns = list(DEFAULT_IGNORE)
+    try:
+        with open(os.path.join(root, IGNORE_FILE), 'r') as fin:
+            patterns += [line.strip() for line in fin]
+    except FileNotFoundError:
+        pass
+    return [p for p in patterns if p and not p.startswith('#')]
+
+
+def is_ignored(relpath, is_dir, patterns):
+    """ True if relpath (relative to the packaged root, '/' separated) is ignored. """
+    ignored = False
+    name = relpath.rsplit('/', 1)[-1]
+    for pattern in patterns:
+        negate = pattern.startswith('!')
+        if negate:
+            pattern = pattern[1:]
+        if pattern.endswith('/'):
+            if not is_dir:
+                continue
+            pattern = pattern.rstrip('/')
+        if '/' in pattern:
+            matched = fnmatch.fnmatchcase(relpath, pattern.lstrip('/'))
+        else:
+            matched = fnmatch.fnmatchcase(name, pattern)
+        if matched:
+            ignored = not negate
+    return ignored
+
+
+def iter_paths(root, patterns=None):
+    """
+    Yields (path, relative path) of the directories and files of root
+    that are not ignored, parents before their contents.
+    """
+    if patterns is None:
+        patterns = load_ignore(root)
+    for dirpath, dirnames, filenames in os.walk(root):
+        reldir = os.path.relpath(dirpath, root).replace(os.sep, '/')
+        reldir = '' if reldir == '.' else reldir+'/'
+        dirnames[:] = sorted(d for d in dirnames
+                             if not is_ignored(reldir+d, True, patterns))
+        for dirname in dirnames:
+            yield os.path.join(dirpath, dirname), reldir+dirname
+        for filename in sorted(filenames):
+            if not is_ignored(reldir+filename, False, patterns):
+                yield os.path.join(dirpath, filename), reldir+filename
+
+
+def _compress(block, level):
+    # wbits 31 writes a complete gzip member.
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(block)+compressor.flush()
+
+
+class _Closed(Exception):
+    pass
+
+
+class _BlockWriter:
+    """ Write-only file object for tarfile that queues fixed size blocks. """
+
+    def __init__(self, blocks, block_size, closed):
+        self.blocks = blocks
+        self.block_size = block_size
+        self.closed = closed
+        self.buffer = bytearray()
+
+    def put(self, item):
+        # Gives up when the reader went away instead of blocking forever.
+        while True:
+            try:
+                self.blocks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if self.closed.is_set():
+                    raise _Closed()
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= self.block_size:
+            self.put(bytes(self.buffer[:self.block_size]))
+            del self.buffer[:self.block_size]
+        return len(data)
+
+    def flush(self):
+        if self.buffer:
+            self.put(bytes(self.buffer))
+            self.buffer.clear()
+
+
+class TarGzStream:
+    """
+    A gzipped tar archive of root, produced while it is read. Entries are
+    named like those of 'tar -C root -czf - .'.
+
+        with TarGzStream('chart') as archive:
+            requests.post(url, files={'chart': ('chart.tgz', archive)})
+    """
+
+    def __init__(self, root='.', patterns=None, workers=WORKERS,
+                 level=COMPRESS_LEVEL, block_size=BLOCK_SIZE):
+        self.root = root
+        self.patterns = load_ignore(root) if patterns is None else patterns
+        self.workers = max(1, workers)
+        self.level = level
+        self.block_size = block_size
+        self.files = 0
+        self.size = 0
+        self._closed = threading.Event()
+        self._blocks = queue.Queue(maxsize=2*self.workers)
+        self._chunks = None
+        self._pending = b''
+
+    def _write_tar(self):
+        writer = _BlockWriter(self._blocks, self.block_size, self._closed)
+        try:
+            with tarfile.open(fileobj=writer, mode='w|') as tar:
+                tar.add(self.root, arcname='.', recursive=False)
+                for path, relpath in iter_paths(self.root, self.patterns):
+                    tar.add(path, arcname='./'+relpath, recursive=False)
+                    if not os.path.isfile(path):
+                        continue
+                    size = os.path.getsize(path)
+                    if size > LARGE_FILE:
+                        print('Included large file {} ({} MB), add it to {} to leave it out.'.format(
+                            relpath, size//(1024*1024), IGNORE_FILE))
+                    self.files += 1
+                    self.size += size
+            writer.flush()
+            writer.put(None)
+        except _Closed:
+            pass
+        except Exception as err:
+            try:
+                writer.put(err)
+            except _Closed:
+                pass
+
+    def _generate(self):
+        thread = threading.Thread(target=self._write_tar, daemon=True)
+        thread.start()
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                block = self._blocks.get()
+                if isinstance(block, Exception):
+                    raise block
+                if block is None:
+                    break
+                pending.append(pool.submit(_compress, block, self.level))
+                if len(pending) > self.workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def read(self, size=-1):
+        if self._chunks is None:
+            self._chunks = self._generate()
+        parts = [self._pending]
+        length = len(self._pending)
+        while size < 0 or length < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            parts.append(chunk)
+            length += len(chunk)
+        data = b''.join(parts)
+        if size < 0:
+            self._pending = b''
+            return data
+        self._pending = data[size:]
+        return data[:size]
+
+    def close(self):
+        self._closed.set()
+        if self._chunks is not None:
+            self._chunks.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,10 +1,13 @@
 import io
 
-from minio import Minio
-from minio.error import S3Error
+import stackn.artifact
+
+# Part size of streamed uploads, the S3 minimum is 5 MiB.
+PART_SIZE = 16*1024*1024
 
 
 def create_client(config, secure_mode=True):
+    from minio import Minio
     try:
         access_key = config['access_key']
     except Exception:
@@ -34,19 +37,57 @@ def create_client(config, secure_mode=True):
     return client
 
 
+def _ensure_bucket(client, bucket):
+    if client.bucket_exists(bucket):
+        return True
+    try:
+        client.make_bucket(bucket)
+    except Exception as err:
+        print('Bucket does not exist, and failed to create bucket.')
+        return False
+    return True
+
+
+def put_artifact(data, bucket, config, known_objects={}, known_chunks={}, secure_mode=True):
+    """
+    Stores the file-like data under its content hash, see
+    stackn.artifact.upload. Returns (object name, manifest, bytes
+    uploaded) or False.
+    """
+    from minio.error import S3Error
+    client = create_client(config, secure_mode)
+    if not _ensure_bucket(client, bucket):
+        return False
+    try:
+        return stackn.artifact.upload(client, bucket, data,
+                                      known_objects, known_chunks)
+    except S3Error as err:
+        print('Failed to upload artifact: {}'.format(err))
+        return False
+
+
 def set_artifact(instance_name, instance, bucket, config, is_file=False, secure_mode=True):
-    """ Instance must be a byte-like object. """
+    """
+    Instance must be a byte-like object, a path if is_file is True or a
+    file-like object of unknown size, which is streamed in parts.
+    """
     client = create_client(config, secure_mode)
-    found = client.bucket_exists(bucket)
-    if not found:
-        try:
-            client.make_bucket(bucket)
-        except Exception as err:
-            print('Bucket does not exist, and failed to create bucket.')
-            return False
+    if not _ensure_bucket(client, bucket):
+        return False
 
     if is_file == True:
         client.fput_object(bucket, instance_name, instance)
+    elif hasattr(instance, 'read'):
+        from minio.error import S3Error
+        from urllib3.exceptions import HTTPError
+        try:
+            client.put_object(bucket, instance_name, instance, -1,
+                              part_size=PART_SIZE)
+        except (S3Error, HTTPError, OSError) as err:
+            print('Failed to upload artifact: {}'.format(err))
+            # Stops the thread producing a streamed archive.
+            instance.close()
+            return False
     else:
         try:
             client.put_object(bucket, instance_name,
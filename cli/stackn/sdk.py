@@ -0,0 +1,225 @@
+"""
+Python client for scripts and training code.
+
+The functions of stackn.stackn resolve the config, the token and the
+project on every call, which is right for one-off CLI commands. Client
+resolves them once and keeps them, together with the shared connection
+pool and a thread pool for work that should not block the caller:
+
+    with Client(project='demo') as studio:
+        studio.log_metadata([{'run_id': 'run1', 'trained_model': 'mnist:1.0',
+                              'metrics': {'accuracy': 0.98}}])
+        upload = studio.submit(studio.create_object, 'mnist', 'models/1/')
+        ...  # keep training
+        upload.result()
+
+AsyncClient offers the same methods as coroutines for asyncio code, the
+blocking calls run on the client's thread pool.
+"""
+import asyncio
+import functools
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import stackn.auth
+import stackn.batch
+import stackn.client
+import stackn.stackn
+
+WORKERS = 4
+# Records per bulk request, Studio accepts at most 5000.
+BATCH_SIZE = 1000
+
+
+class ClientError(Exception):
+    pass
+
+
+class Client:
+    """
+    A Studio project, with config, token and project resolved once.
+    Arguments left out are taken from the environment and the stackn
+    config, as for CLI commands.
+    """
+
+    def __init__(self, project=None, studio_url=None, secure=None,
+                 workers=WORKERS):
+        conf = {'STACKN_PROJECT': project,
+                'STACKN_URL': studio_url,
+                'STACKN_SECURE': secure}
+        conf, status = stackn.auth.get_config(
+            conf, required=['STACKN_URL', 'STACKN_PROJECT'])
+        if not status:
+            raise ClientError(
+                'Failed to get the STACKn configuration, please login.')
+        auth_header, conf = stackn.stackn.get_auth_header(conf)
+        if not auth_header:
+            raise ClientError('Failed to get an access token, please login.')
+        # The full project holds the S3 settings needed for uploads.
+        project, _ = stackn.stackn.get_project(conf, auth_header, refresh=True)
+        if not project:
+            raise ClientError(
+                'Project {} not found.'.format(conf['STACKN_PROJECT']))
+        self.conf = conf
+        self.project = project
+        self.endpoints = stackn.stackn.get_endpoints(conf['STACKN_URL'])
+        self.session = stackn.client.get_session()
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(1, min(workers, stackn.client.POOL_SIZE)))
+
+    @property
+    def auth_header(self):
+        # Refreshed when the token is about to expire, free otherwise.
+        return {'Authorization': 'Token {}'.format(
+            stackn.auth.get_access_token(self.conf))}
+
+    def url(self, name):
+        return self.endpoints[name].format(self.project['id'])
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Runs fn(*args, **kwargs) on the client's thread pool, returns a
+        concurrent.futures.Future.
+        """
+        return self.executor.submit(fn, *args, **kwargs)
+
+    def list(self, name, params=None):
+        """ Yields the items of project endpoint name, fetched page by page. """
+        pages = stackn.stackn._iter_pages(self.url(name), self.auth_header,
+                                          params, self.conf['STACKN_SECURE'])
+        for page in pages:
+            if page is None:
+                raise ClientError('Fetching {} failed.'.format(name))
+            yield from page
+
+    def create_object(self, name, path='', release_type='minor', version='',
+                      object_type='model', description=None, model_card=None,
+                      dedup=True):
+        """
+        Publishes the file or folder path (by default the current
+        directory) as object name. Returns True on success.
+        """
+        return stackn.stackn._create_object(
+            self.conf, self.auth_header, self.project, name,
+            model_file=path, release_type=release_type, version=version,
+            object_type=object_type, model_description=description,
+            model_card=model_card, dedup=dedup)
+
+    def create_objects(self, objects):
+        """
+        Publishes several objects concurrently. objects are dicts of
+        create_object arguments, returns a list of True/False in the same
+        order.
+        """
+        futures = [self.submit(self.create_object, **kwargs)
+                   for kwargs in objects]
+        results = []
+        for future in futures:
+            try:
+                results.append(bool(future.result()))
+            except Exception as err:
+                print('Failed to create object: {}'.format(err))
+                results.append(False)
+        return results
+
+    def _bulk(self, name, records, batch_size):
+        url = self.url(name)+'bulk/'
+        header = dict(self.auth_header)
+        header['Content-Type'] = 'application/x-ndjson'
+        counts = {'created': 0, 'updated': 0}
+        records = list(records)
+        for start in range(0, len(records), batch_size):
+            body = '\n'.join(json.dumps(record, default=str)
+                             for record in records[start:start+batch_size])
+            r = self.session.post(url, data=body.encode('utf-8'),
+                                  headers=header, verify=self.conf['STACKN_SECURE'])
+            if not r:
+                raise ClientError('Failed to send {} records: {} {}'.format(
+                    name, r.status_code, r.text[:200]))
+            for key, count in r.json().items():
+                counts[key] += count
+        return counts
+
+    def log_metadata(self, records, batch_size=BATCH_SIZE):
+        """
+        Creates or updates metadata records (run_id, trained_model,
+        parameters, metrics, ...) in bulk requests. Returns the number of
+        records created and updated.
+        """
+        return self._bulk('metadata', records, batch_size)
+
+    def log_models(self, records, batch_size=BATCH_SIZE):
+        """ Creates or updates training session logs in bulk requests. """
+        return self._bulk('modellogs', records, batch_size)
+
+    def metadata_logger(self, **kwargs):
+        """ A stackn.batch.BufferedLogger for metadata of this project. """
+        return self._logger('metadata', **kwargs)
+
+    def modellog_logger(self, **kwargs):
+        """ A stackn.batch.BufferedLogger for training logs of this project. """
+        return self._logger('modellogs', **kwargs)
+
+    def _logger(self, name, **kwargs):
+        # The logger reuses the resolved project and the shared session.
+        return stackn.batch.BufferedLogger(
+            name, conf=self.conf, url=self.url(name),
+            auth_header=self.auth_header, session=self.session, **kwargs)
+
+    def close(self):
+        """ Waits for submitted work to finish. """
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class AsyncClient:
+    """
+    Client for asyncio code. The methods of Client are coroutines here,
+    they run on the thread pool of the wrapped client so the event loop
+    is never blocked. Construct with the arguments of Client (this
+    blocks while the project is resolved) or wrap an existing client.
+    """
+
+    def __init__(self, *args, client=None, **kwargs):
+        self.client = client or Client(*args, **kwargs)
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self.client.executor, functools.partial(fn, *args, **kwargs))
+
+    async def list(self, name, params=None):
+        return await self._run(lambda: list(self.client.list(name, params)))
+
+    async def create_object(self, *args, **kwargs):
+        return await self._run(self.client.create_object, *args, **kwargs)
+
+    async def create_objects(self, objects):
+        results = await asyncio.gather(*[self.create_object(**kwargs)
+                                         for kwargs in objects],
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                print('Failed to create object: {}'.format(result))
+        return [not isinstance(result, Exception) and bool(result)
+                for result in results]
+
+    async def log_metadata(self, records, batch_size=BATCH_SIZE):
+        return await self._run(self.client.log_metadata, records, batch_size)
+
+    async def log_models(self, records, batch_size=BATCH_SIZE):
+        return await self._run(self.client.log_models, records, batch_size)
+
+    async def close(self):
+        await asyncio.get_event_loop().run_in_executor(None, self.client.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
@@ -0,0 +1,39 @@
+import click
+
+from .stackn import search as search_studio
+
+SEARCH_COLUMNS = {
+    'models': (['Name', 'Version', 'Project'], ['name', 'version', 'project__slug']),
+    'appinstances': (['Name', 'App', 'Project'], ['name', 'app__name', 'project__slug']),
+    'apps': (['Name', 'Slug', 'Description'], ['name', 'slug', 'description']),
+    'projects': (['Name', 'Slug', 'Description'], ['name', 'slug', 'description']),
+}
+
+
+@click.command('search')
+@click.argument('query', nargs=-1, required=True)
+@click.option('-t', '--type', 'types', multiple=True,
+              type=click.Choice(list(SEARCH_COLUMNS)),
+              help='Only search this type, can be repeated.')
+@click.option('-n', '--limit', required=False, default=None, type=int)
+@click.option('--secure/--insecure', required=False, default=True)
+def search(query, types, limit, secure):
+    """ Search models, apps and projects, words match as prefixes. """
+    results = search_studio(' '.join(query), types=types, limit=limit,
+                            conf={'STACKN_SECURE': secure})
+    if results == False:
+        return False
+
+    for search_type, hits in results.items():
+        if not hits:
+            continue
+        names, keys = SEARCH_COLUMNS[search_type]
+        import prettytable
+        x = prettytable.PrettyTable()
+        x.field_names = names
+        for hit in hits:
+            x.add_row([hit[k] for k in keys])
+        print(search_type.capitalize())
+        print(x)
+    if not any(results.values()):
+        print("No matches.")
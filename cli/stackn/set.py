@@ -1,7 +1,5 @@
 import click
-import prettytable
 
-from .main import main
 from .stackn import set_current
 
 
@@ -14,7 +12,7 @@ class AliasedGroup(click.Group):
         return super().get_command(ctx, cmd_name)
 
 
-@main.group('set', cls=AliasedGroup)
+@click.group('set', cls=AliasedGroup)
 def set():
     pass
 
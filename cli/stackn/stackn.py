@@ -1,12 +1,18 @@
+import io
+import itertools
 import json
 import os
-import subprocess
+import shutil
+import time
 import uuid
 
-import requests
-
+import stackn.artifact
 import stackn.auth
+import stackn.bulk
+import stackn.client
+import stackn.download
 import stackn.error_msg
+import stackn.package
 import stackn.s3
 
 
@@ -20,6 +26,44 @@ def _check_status(r, error_msg="Failed"):
     else:
         return True
 
+
+# Number of items requested per page from list endpoints.
+PAGE_SIZE = 100
+
+
+def _iter_pages(url, auth_header, params=[], verify=True, page_size=PAGE_SIZE):
+    """
+    Yields the items of a list endpoint page by page, following the
+    cursor links. Servers that do not paginate return a plain list,
+    which is yielded as a single page. Yields None if a request fails.
+    """
+    params = dict(params) if params else dict()
+    params['page_size'] = page_size
+    while url:
+        r = stackn.client.get_session().get(url, headers=auth_header,
+                                            params=params, verify=verify)
+        if not r:
+            print('Returned status code: {}'.format(r.status_code))
+            print('Reason: {}'.format(r.reason))
+            yield None
+            return
+        page = json.loads(r.content)
+        if isinstance(page, list):
+            yield page
+            return
+        yield page['results']
+        # The next link already carries the query parameters.
+        url, params = page['next'], None
+
+
+def _get_all(url, auth_header, params=[], verify=True):
+    objs = []
+    for page in _iter_pages(url, auth_header, params, verify):
+        if page is None:
+            return None
+        objs.extend(page)
+    return objs
+
 # Sort of utils functions
 
 
@@ -39,20 +83,10 @@ def call_admin_endpoint(name, conf={}, params=[]):
     endpoints = get_endpoints(conf['STACKN_URL'])
     url = endpoints[name]
 
-    if params:
-        r = requests.get(url, headers=auth_header,
-                         params=params, verify=conf['STACKN_SECURE'])
-    else:
-        r = requests.get(url, headers=auth_header,
-                         verify=conf['STACKN_SECURE'])
-    if r:
-        objs = json.loads(r.content)
-        return objs
-    else:
+    objs = _get_all(url, auth_header, params, conf['STACKN_SECURE'])
+    if objs is None:
         print("Fetching {} failed.".format(name))
-        print('Returned status code: {}'.format(r.status_code))
-        print('Reason: {}'.format(r.reason))
-        return None
+    return objs
 
 
 def call_project_endpoint(name, conf={}, params=[]):
@@ -70,36 +104,87 @@ def call_project_endpoint(name, conf={}, params=[]):
 
     endpoints = get_endpoints(conf['STACKN_URL'])
 
-    if conf['STACKN_PROJECT']:
-        project = get_projects(conf, params={'name': conf['STACKN_PROJECT']})
-    else:
-        print("No project name specified.")
-        print("Try to run 'stackn get current' to check if a project is set.")
-        return False
-    if len(project) > 1:
-        print('Found several matching projects.')
-        return
+    project, cached = get_project(conf, auth_header)
     if not project:
-        print("Project \'{}\' not found.".format(conf['STACKN_PROJECT']))
         return False
 
-    project = project[0]
     url = endpoints[name].format(project['id'])
-
-    if params:
-        r = requests.get(url, headers=auth_header,
-                         params=params, verify=conf['STACKN_SECURE'])
-    else:
-        r = requests.get(url, headers=auth_header,
-                         verify=conf['STACKN_SECURE'])
-    if r:
-        projects = json.loads(r.content)
-        return projects
-    else:
+    objs = _get_all(url, auth_header, params, conf['STACKN_SECURE'])
+    if objs is None and cached:
+        # The project may have been recreated under the same name.
+        project, cached = get_project(conf, auth_header, refresh=True)
+        if not project:
+            return False
+        url = endpoints[name].format(project['id'])
+        objs = _get_all(url, auth_header, params, conf['STACKN_SECURE'])
+    if objs is None:
         print("Fetching {} failed.".format(name))
-        print('Returned status code: {}'.format(r.status_code))
-        print('Reason: {}'.format(r.reason))
-        return None
+    return objs
+
+
+def iter_admin_endpoint(name, conf={}, params=[]):
+    """
+    Yields the items of endpoint name page by page while they arrive,
+    the streaming counterpart of call_admin_endpoint. Yields None if
+    fetching fails.
+    """
+    conf, status = stackn.auth.get_config(conf)
+    if not status:
+        print("Failed to get current STACKn configuration file.")
+        yield None
+        return
+
+    auth_header, conf = get_auth_header(conf)
+    if not auth_header:
+        yield None
+        return
+
+    url = get_endpoints(conf['STACKN_URL'])[name]
+    for page in _iter_pages(url, auth_header, params, conf['STACKN_SECURE']):
+        if page is None:
+            print("Fetching {} failed.".format(name))
+        yield page
+
+
+def iter_project_endpoint(name, conf={}, params=[]):
+    """
+    Yields the items of project endpoint name page by page while they
+    arrive, the streaming counterpart of call_project_endpoint. Yields
+    None if fetching fails.
+    """
+    conf, status = stackn.auth.get_config(conf)
+    if not status:
+        print("The configuration file for STACKn could not be correctly retrieved.")
+        yield None
+        return
+
+    auth_header, conf = get_auth_header(conf)
+    if not auth_header:
+        yield None
+        return
+
+    endpoints = get_endpoints(conf['STACKN_URL'])
+    project, cached = get_project(conf, auth_header)
+    if not project:
+        yield None
+        return
+
+    url = endpoints[name].format(project['id'])
+    pages = _iter_pages(url, auth_header, params, conf['STACKN_SECURE'])
+    first = next(pages)
+    if first is None and cached:
+        # The project may have been recreated under the same name.
+        project, cached = get_project(conf, auth_header, refresh=True)
+        if not project:
+            yield None
+            return
+        url = endpoints[name].format(project['id'])
+        pages = _iter_pages(url, auth_header, params, conf['STACKN_SECURE'])
+        first = next(pages)
+    for page in itertools.chain([first], pages):
+        if page is None:
+            print("Fetching {} failed.".format(name))
+        yield page
 
 
 def setup_project_endpoint_call(conf, endpoint_type):
@@ -114,23 +199,29 @@ def setup_project_endpoint_call(conf, endpoint_type):
     if not auth_header:
         return False, False, False
 
-    project = get_projects(
-        conf, params={'name': conf['STACKN_PROJECT']}, auth_header=auth_header)
-
-    if project == False:
-        return False, False, False
-    elif len(project) > 1:
-        print('Found several matching projects. Please select a specific project.')
-        return False, False, False
-    elif len(project) == 0:
-        print("Project \'{}\' not found.".format(conf['STACKN_PROJECT']))
+    project, _ = get_project(conf, auth_header)
+    if not project:
         return False, False, False
 
-    project = project[0]
     endpoints = get_endpoints(conf['STACKN_URL'])
     url = endpoints[endpoint_type].format(project['id'])
     return conf, auth_header, url
 
+
+def refresh_project_url(conf, auth_header, endpoint_type, url):
+    """
+    The project id in a URL from setup_project_endpoint_call may come from
+    a stale cache entry. Called when a request to url failed, it looks the
+    project up again and returns the URL for its current id, or None if
+    the id is unchanged or the project is gone. Callers retry at most once.
+    """
+    project, _ = get_project(conf, auth_header, refresh=True)
+    if not project:
+        return None
+    fresh = get_endpoints(conf['STACKN_URL'])[endpoint_type].format(
+        project['id'])
+    return fresh if fresh != url else None
+
 # Get functions
 
 
@@ -146,14 +237,17 @@ def get_endpoints(studio_url):
     endpoints['environments'] = base+'/projects/{}/environments/'
     endpoints['flavors'] = base+'/projects/{}/flavors/'
     endpoints['members'] = base+'/projects/{}/members/'
+    endpoints['metadata'] = base+'/projects/{}/metadata/'
     endpoints['models'] = base+'/projects/{}/models/'
     endpoints['mlflow'] = base+'/projects/{}/mlflow/'
+    endpoints['modellogs'] = base+'/projects/{}/modellogs/'
     endpoints['objecttypes'] = base+'/projects/{}/objecttype'
     endpoints['project_del'] = base+'/projects/{}'
     endpoints['projects'] = base+'/projects/'
     endpoints['project_templates'] = base+'/projecttemplates/'
     endpoints['resources'] = base+'/projects/{}/resources/'
     endpoints['s3'] = base+'/projects/{}/s3/'
+    endpoints['search'] = base+'/search/'
 
     return endpoints
 
@@ -163,7 +257,7 @@ def get_auth_header(conf):
     if not status:
         return False, False
     auth_header = {"Authorization": "Token {}".format(
-        conf['STACKN_ACCESS_TOKEN'])}
+        stackn.auth.get_access_token(conf))}
     return auth_header, conf
 
 
@@ -198,20 +292,62 @@ def get_projects(conf={}, params=[], auth_header=[]):
 
     endpoints = get_endpoints(conf['STACKN_URL'])
     url = endpoints['projects']
-    if params:
-        r = requests.get(url, headers=auth_header,
-                         params=params, verify=conf['STACKN_SECURE'])
-    else:
-        r = requests.get(url, headers=auth_header,
-                         verify=conf['STACKN_SECURE'])
-    if r:
-        projects = json.loads(r.content)
-        return projects
-    else:
+    projects = _get_all(url, auth_header, params, conf['STACKN_SECURE'])
+    if projects is None:
         print("Fetching projects failed.")
-        print('Returned status code: {}'.format(r.status_code))
-        print('Reason: {}'.format(r.reason))
-        return None
+    return projects
+
+
+def get_project(conf, auth_header, refresh=False):
+    """
+    Returns (project, cached) for conf['STACKN_PROJECT']. The project is
+    False if it is not set, not found or ambiguous. Lookups are cached
+    on disk for stackn.client.PROJECT_CACHE_TTL seconds, cached is True
+    when the project came from that cache (it holds id, name and slug).
+    """
+    if not conf['STACKN_PROJECT']:
+        print("No project name specified.")
+        print("Try to run 'stackn get current' to check if a project is set.")
+        return False, False
+
+    if not refresh:
+        project = stackn.client.get_cached_project(conf)
+        if project:
+            return project, True
+
+    projects = get_projects(conf, params={'name': conf['STACKN_PROJECT']},
+                            auth_header=auth_header)
+    if projects is None or projects is False:
+        return False, False
+    if len(projects) > 1:
+        print('Found several matching projects. Please select a specific project.')
+        return False, False
+    if not projects:
+        stackn.client.forget_project(conf)
+        print("Project \'{}\' not found.".format(conf['STACKN_PROJECT']))
+        return False, False
+
+    stackn.client.cache_project(conf, projects[0])
+    return projects[0], False
+
+
+def search(query, types=[], limit=None, conf={}):
+    """ Full-text search, returns the hits grouped by type or False. """
+    auth_header, conf = get_auth_header(conf)
+    if not auth_header:
+        return False
+
+    params = {'q': query}
+    if types:
+        params['type'] = ','.join(types)
+    if limit:
+        params['limit'] = limit
+    url = get_endpoints(conf['STACKN_URL'])['search']
+    r = stackn.client.get_session().get(url, headers=auth_header, params=params,
+                                        verify=conf['STACKN_SECURE'])
+    if not _check_status(r, error_msg="Search failed."):
+        return False
+    return r.json()
 
 
 def get_remote(inp_conf):
@@ -231,8 +367,7 @@ def get_remote(inp_conf):
 
 # Create functions
 
-def create_template(template='template.json', image="image.png", studio_url=[], secure_mode=True):
-
+def _admin_call_setup(studio_url, secure_mode):
     conf = {
         'STACKN_URL': studio_url,
         'STACKN_SECURE': secure_mode
@@ -242,29 +377,42 @@ def create_template(template='template.json', image="image.png", studio_url=[],
 
     if not status:
         print("Failed to get current STACKn configuration file.")
-        return False
+        return False, False
 
     auth_header, conf = get_auth_header(conf)
     if not auth_header:
-        return False
+        return False, False
+    return conf, auth_header
+
 
+def _post_template(url, auth_header, verify, template, image):
     with open(template, 'r') as templ_file:
-        try:
-            settings = json.load(templ_file)
-        except Exception as err:
-            print("Failed to load JSON from settings file.")
-            print(err)
+        settings = json.load(templ_file)
 
     payload = {
         'settings': json.dumps(settings)
     }
 
-    file_ob = {'image': open(image, 'rb')}
+    with open(image, 'rb') as image_file:
+        return stackn.client.get_session().post(url, headers=auth_header,
+                                                files={'image': image_file},
+                                                data=payload, verify=verify)
 
-    endpoints = get_endpoints(conf['STACKN_URL'])
-    url = endpoints['project_templates']
-    r = requests.post(url, headers=auth_header, files=file_ob,
-                      data=payload, verify=conf['STACKN_SECURE'])
+
+def create_template(template='template.json', image="image.png", studio_url=[], secure_mode=True):
+
+    conf, auth_header = _admin_call_setup(studio_url, secure_mode)
+    if not conf:
+        return False
+
+    url = get_endpoints(conf['STACKN_URL'])['project_templates']
+    try:
+        r = _post_template(url, auth_header, conf['STACKN_SECURE'],
+                           template, image)
+    except (OSError, ValueError) as err:
+        print("Failed to load template.")
+        print(err)
+        return False
 
     if r:
         print("Created template.")
@@ -273,83 +421,104 @@ def create_template(template='template.json', image="image.png", studio_url=[],
         print(r.status_code)
         print(r.text)
         print(r.reason)
+    return bool(r)
 
 
-def create_templates(folder='.', studio_url=[], secure_mode=True):
-    subfolders = [f.path for f in os.scandir(folder) if f.is_dir()]
-    curr_dir = os.getcwd()
-    for folder in subfolders:
-        os.chdir(folder)
-        create_template(studio_url=studio_url, secure_mode=secure_mode)
-        os.chdir(curr_dir)
+def _subfolders(folder):
+    return sorted(f.path for f in os.scandir(folder) if f.is_dir())
 
 
-def create_apps(folder='.', studio_url=[], secure_mode=True):
-    subfolders = [f.path for f in os.scandir(folder) if f.is_dir()]
-    curr_dir = os.getcwd()
-    for folder in subfolders:
-        os.chdir(folder)
-        create_app(studio_url=studio_url, secure_mode=secure_mode)
-        os.chdir(curr_dir)
+def create_templates(folder='.', studio_url=[], secure_mode=True,
+                     workers=stackn.bulk.DEFAULT_WORKERS,
+                     retries=stackn.bulk.RETRIES):
+    """ Creates a project template from every subfolder of folder. """
+    conf, auth_header = _admin_call_setup(studio_url, secure_mode)
+    if not conf:
+        return False
 
+    url = get_endpoints(conf['STACKN_URL'])['project_templates']
 
-def create_app(settings="config.json",
-               chart_archive="chart",
-               logo="logo.png",
-               studio_url=[],
-               secure_mode=True):
+    def post(path):
+        return _post_template(url, auth_header, conf['STACKN_SECURE'],
+                              os.path.join(path, 'template.json'),
+                              os.path.join(path, 'image.png'))
 
-    conf = {
-        'STACKN_URL': studio_url,
-        'STACKN_SECURE': secure_mode
-    }
-    conf, status = stackn.auth.get_config(conf, required=['STACKN_URL'])
-    if not status:
-        print("Failed to get current STACKn configuration file.")
-        return False
+    results = stackn.bulk.run(post, _subfolders(folder),
+                              success='Created template from {}.',
+                              failure='Failed to create template from {}.',
+                              workers=workers, retries=retries,
+                              idempotent=False)
+    return all(result.ok for result in results)
 
-    auth_header, conf = get_auth_header(conf)
-    if not auth_header:
+
+def create_apps(folder='.', studio_url=[], secure_mode=True,
+                workers=stackn.bulk.DEFAULT_WORKERS,
+                retries=stackn.bulk.RETRIES):
+    """ Creates an app from every subfolder of folder. """
+    conf, auth_header = _admin_call_setup(studio_url, secure_mode)
+    if not conf:
         return False
 
-    chart_uid = str(uuid.uuid1().hex)
-    res = subprocess.run(
-        ['tar', '-C', chart_archive, '-czvf', chart_uid, '.'], stdout=subprocess.PIPE)
-    file_ob = {'chart': open(chart_uid, 'rb'), 'logo': open(logo, 'rb')}
-
-    ftable = open(settings, 'r')
-    config = json.load(ftable)
-    settings = config['settings']
-    table_field = config['table_field']
-    description = config['description']
-    name = config['name']
-    slug = config['slug']
-    category = config['category']
-    access = 'public'
-    if 'access' in config:
-        access = config['access']
-    priority = 100
-    if 'priority' in config:
-        priority = config['priority']
-    ftable.close()
+    url = get_endpoints(conf['STACKN_URL'])['admin']['apps']
+
+    def post(path):
+        _, r = _post_app(url, auth_header, conf['STACKN_SECURE'],
+                         os.path.join(path, 'config.json'),
+                         os.path.join(path, 'chart'),
+                         os.path.join(path, 'logo.png'))
+        return r
+
+    results = stackn.bulk.run(post, _subfolders(folder),
+                              success='Created app from {}.',
+                              failure='Failed to create app from {}.',
+                              workers=workers, retries=retries,
+                              idempotent=False)
+    return all(result.ok for result in results)
+
+
+def _post_app(url, auth_header, verify, settings, chart_archive, logo):
+    """ Posts the app described by settings, returns (name, response). """
+    with open(settings, 'r') as ftable:
+        config = json.load(ftable)
 
     payload = {
-        'name': name,
-        'slug': slug,
-        'cat': category,
-        'description': description,
-        'settings': json.dumps(settings),
-        'table_field': json.dumps(table_field),
-        'access': access,
-        'priority': priority
+        'name': config['name'],
+        'slug': config['slug'],
+        'cat': config['category'],
+        'description': config['description'],
+        'settings': json.dumps(config['settings']),
+        'table_field': json.dumps(config['table_field']),
+        'access': config.get('access', 'public'),
+        'priority': config.get('priority', 100)
     }
 
-    endpoints = get_endpoints(conf['STACKN_URL'])
-    url = endpoints['admin']['apps']  # .format(project[0]['id'])
-    r = requests.post(url, headers=auth_header, files=file_ob,
-                      data=payload, verify=conf['STACKN_SECURE'])
+    with stackn.package.TarGzStream(chart_archive) as chart, \
+            open(logo, 'rb') as logo_file:
+        file_ob = {'chart': (uuid.uuid1().hex, chart), 'logo': logo_file}
+        r = stackn.client.get_session().post(url, headers=auth_header,
+                                             files=file_ob, data=payload,
+                                             verify=verify)
+    return config['name'], r
 
-    os.system('rm {}'.format(chart_uid))
+
+def create_app(settings="config.json",
+               chart_archive="chart",
+               logo="logo.png",
+               studio_url=[],
+               secure_mode=True):
+
+    conf, auth_header = _admin_call_setup(studio_url, secure_mode)
+    if not conf:
+        return False
+
+    url = get_endpoints(conf['STACKN_URL'])['admin']['apps']
+    try:
+        name, r = _post_app(url, auth_header, conf['STACKN_SECURE'],
+                            settings, chart_archive, logo)
+    except (OSError, ValueError, KeyError) as err:
+        print("Failed to load app from {}.".format(settings))
+        print(err)
+        return False
 
     if r:
         print("Created app {}.".format(name))
@@ -358,6 +527,7 @@ def create_app(settings="config.json",
         print(r.status_code)
         print(r.text)
         print(r.reason)
+    return bool(r)
 
 
 def create_project(name,
@@ -386,8 +556,8 @@ def create_project(name,
     url = endpoints['projects']
     data = {'name': name, 'description': description,
             'repository': repository, 'template': template}
-    res = requests.post(url, headers=auth_header, json=data,
-                        verify=conf['STACKN_SECURE'])
+    res = stackn.client.get_session().post(url, headers=auth_header, json=data,
+                                           verify=conf['STACKN_SECURE'])
     if res:
         print('Created project: '+name)
         conf['STACKN_PROJECT'] = name
@@ -414,16 +584,10 @@ def create_meta_resource(filename, studio_url, project, secure):
     if not auth_header:
         return False
 
-    project = get_projects(conf=conf['STACKN_URL'], params={
-                           'name': conf['STACKN_PROJECT']}, auth_header=auth_header)
-    if len(project) > 1:
-        print('Found several matching projects.')
-        return
+    project, _ = get_project(conf, auth_header)
     if not project:
-        print("Project {} not found.".format(conf['STACKN_PROJECT']))
         return False
 
-    project = project[0]
     endpoints = get_endpoints(conf['STACKN_URL'])
     url = endpoints['resources'].format(project['id'])
     try:
@@ -432,8 +596,8 @@ def create_meta_resource(filename, studio_url, project, secure):
     except:
         print("Failed to load JSON data from file {}.".format(filename))
 
-    res = requests.post(url, headers=auth_header,
-                        json=app_data, verify=conf['STACKN_SECURE'])
+    res = stackn.client.get_session().post(url, headers=auth_header,
+                                           json=app_data, verify=conf['STACKN_SECURE'])
     if res:
         print('Created resource.')
     else:
@@ -453,8 +617,12 @@ def create_object(model_name,
                   model_card=None,
                   s3storage=None,
                   is_file=True,
+                  dedup=True,
                   secure_mode=True):
-    """ Publish an object to Studio. """
+    """
+    Publish an object to Studio. With dedup the artifact is stored under
+    its content hash and only chunks Studio does not know are uploaded.
+    """
     conf = {
         'STACKN_MODEL': model_name,
         'STACKN_URL': studio_url,
@@ -476,38 +644,44 @@ def create_object(model_name,
     if not auth_header:
         return False
 
-    project = get_projects(
-        conf=conf, params={'name': conf['STACKN_PROJECT']}, auth_header=auth_header)
-    if len(project) > 1:
-        print('Found several matching projects.')
-        return
+    # The S3 storage settings are not cached, fetch the project.
+    project, _ = get_project(conf, auth_header, refresh=True)
     if not project:
-        print("Project {} not found.".format(conf['STACKN_PROJECT']))
         return False
 
-    project = project[0]
     if s3storage == None:
         s3storage = project['s3storage']
         print("S3 storage set to: {}".format(s3storage))
     else:
         # TODO: Fetch S3 settings from Studio...
         print("Passing S3 storage as an option is not implemented yet.")
-        s3storage = None
+        return False
 
+    return _create_object(conf, auth_header, project, model_name,
+                          model_file=model_file,
+                          release_type=release_type,
+                          version=version,
+                          object_type=object_type,
+                          model_description=model_description,
+                          model_card=model_card,
+                          is_file=is_file,
+                          dedup=dedup)
+
+
+def _create_object(conf, auth_header, project, model_name, model_file='',
+                   release_type='minor', version='', object_type='model',
+                   model_description=None, model_card=None, is_file=True,
+                   dedup=True):
+    """
+    Uploads and registers an object in project (as returned by
+    get_project with refresh, it holds the S3 settings). Safe to call
+    from several threads.
+    """
+    s3storage = project['s3storage']
     if s3storage == None:
         print("S3 storage not set.")
         return False
-
-    model_uid = str(uuid.uuid1().hex)
-    building_from_current = False
-
-    if model_file == "":
-        building_from_current = True
-        model_file = '{}.tar.gz'.format(model_uid)
-        f = open(model_file, 'w')
-        f.close()
-        res = subprocess.run(['tar', '--exclude={}'.format(model_file),
-                             '-czvf', model_file, '.'], stdout=subprocess.PIPE)
+    secure_mode = conf['STACKN_SECURE']
 
     if model_card == "" or model_card == None:
         model_card_html_string = ""
@@ -515,12 +689,42 @@ def create_object(model_name,
         with open(model_card, 'r') as f:
             model_card_html_string = f.read()
 
-    status = stackn.s3.set_artifact(model_uid,
-                                    model_file,
-                                    'models',
-                                    s3storage,
-                                    is_file=is_file,
-                                    secure_mode=secure_mode)
+    endpoints = get_endpoints(conf['STACKN_URL'])
+    url = endpoints['models'].format(project['id'])
+
+    if model_file == "":
+        # Package the current directory while uploading it.
+        data = stackn.package.TarGzStream('.')
+    elif not is_file:
+        data = io.BytesIO(model_file)
+    elif os.path.isdir(model_file):
+        data = stackn.package.TarGzStream(model_file)
+    else:
+        data = open(model_file, 'rb')
+
+    manifest = None
+    with data:
+        if dedup:
+            known_objects, known_chunks = stackn.artifact.get_known(
+                url+'chunks/', auth_header, conf['STACKN_SECURE'], model_name)
+            result = stackn.s3.put_artifact(data,
+                                            'models',
+                                            s3storage,
+                                            known_objects,
+                                            known_chunks,
+                                            secure_mode=secure_mode)
+            status = bool(result)
+            if status:
+                model_uid, manifest, uploaded = result
+                print('Uploaded {} of {} MB, the rest was already stored.'.format(
+                    uploaded//(1024*1024), manifest['size']//(1024*1024)))
+        else:
+            model_uid = str(uuid.uuid1().hex)
+            status = stackn.s3.set_artifact(model_uid,
+                                            data,
+                                            'models',
+                                            s3storage,
+                                            secure_mode=secure_mode)
 
     if not status:
         print("Failed to upload model to S3 storage")
@@ -533,21 +737,19 @@ def create_object(model_name,
                   "description": model_description,
                   "model_card": model_card_html_string,
                   "object_type": object_type}
+    if manifest:
+        model_data['manifest'] = manifest
 
-    endpoints = get_endpoints(conf['STACKN_URL'])
-    url = endpoints['models'].format(project['id'])
-    r = requests.post(url, json=model_data,
-                      headers=auth_header, verify=secure_mode)
+    r = stackn.client.get_session().post(url, json=model_data,
+                                         headers=auth_header, verify=secure_mode)
 
     if not _check_status(r, error_msg="Failed to create model."):
-        # Delete model object from storage.
-        repo.delete_artifact(model_uid)
+        # Content addressed artifacts may be shared with other versions.
+        if not manifest:
+            # Delete model object from storage.
+            repo.delete_artifact(model_uid)
         return False
 
-    if building_from_current:
-        # Delete temporary archive file.
-        os.system('rm {}'.format(model_file))
-
     print('Released model: {}, release_type: {}'.format(model_name, release_type))
 
     return True
@@ -565,14 +767,160 @@ def create_appinstance(studio_url=[], project=[], data={}, secure_mode=True):
     if not conf or not auth_header or not url:
         print("Failed to set up project API endpoint call.")
         return False
-    res = requests.post(url, headers=auth_header, data=data,
-                        verify=conf['STACKN_SECURE'])
+    res = stackn.client.get_session().post(url, headers=auth_header, data=data,
+                                           verify=conf['STACKN_SECURE'])
+    if res.status_code == 404:
+        url = refresh_project_url(conf, auth_header, 'appinstances', url)
+        if url:
+            res = stackn.client.get_session().post(
+                url, headers=auth_header, data=data,
+                verify=conf['STACKN_SECURE'])
     print(res.text)
+    return bool(res)
+
+
+# Statuses an app does not leave by itself, waiting for another one fails.
+FAILED_STATUSES = ('Failed', 'FailedToDelete', 'Error')
+# Seconds a single wait request is held by Studio (it caps it as well).
+WAIT_POLL = 30
+# Seconds before asking again when Studio holds too many waits and does
+# not say when to retry.
+WAIT_RETRY = 5
+
+
+def _wait_appinstance(url, app, targets, timeout, auth_header, verify):
+    deadline = time.monotonic()+timeout
+    wait_url = '{}{}/wait/'.format(url, app['id'])
+    since = None
+    while True:
+        remaining = max(0, deadline-time.monotonic())
+        params = {'timeout': round(min(remaining, WAIT_POLL), 1)}
+        if since:
+            params['since'] = since
+        r = stackn.client.get_session().get(wait_url, headers=auth_header,
+                                            params=params, verify=verify,
+                                            timeout=params['timeout']+30)
+        if r.status_code == 429 and time.monotonic() < deadline:
+            # Studio holds too many waits, come back when it asks to.
+            delay = float(r.headers.get('Retry-After', WAIT_RETRY))
+            time.sleep(min(delay, max(0, deadline-time.monotonic())))
+            continue
+        if not _check_status(r, error_msg='Failed to get the status of app {}.'.format(app['name'])):
+            return False
+        status = r.json()['status']
+        if status != since:
+            print('{}: {}'.format(app['name'], status))
+        if status in targets:
+            return True
+        if status in FAILED_STATUSES:
+            print('App {} is {}.'.format(app['name'], status))
+            return False
+        if time.monotonic() >= deadline:
+            print('Timed out after {} s waiting for app {} to be {}.'.format(
+                timeout, app['name'], ' or '.join(targets)))
+            return False
+        since = status
+
+
+def wait_app(name, status='Running', timeout=300, studio_url=[], project=[],
+             secure=True):
+    """
+    Waits until app name (the newest if several share it) has one of the
+    comma separated statuses, at most timeout seconds. Studio holds each
+    request until the status changes, so nothing is polled. Returns True
+    once the status is reached.
+    """
+    conf = {
+        'STACKN_URL': studio_url,
+        'STACKN_PROJECT': project,
+        'STACKN_SECURE': secure
+    }
+    conf, auth_header, url = setup_project_endpoint_call(conf, 'appinstances')
+    if not conf or not auth_header or not url:
+        print("Failed to set up project API endpoint call.")
+        return False
+
+    params = {'name': name, 'fields': 'id,name'}
+    apps = _get_all(url, auth_header, params, conf['STACKN_SECURE'])
+    if apps is None:
+        fresh = refresh_project_url(conf, auth_header, 'appinstances', url)
+        if fresh:
+            url = fresh
+            apps = _get_all(url, auth_header, params, conf['STACKN_SECURE'])
+    if not apps:
+        print("App {} not found.".format(name))
+        return False
+    app = max(apps, key=lambda app: app['id'])
+    targets = [target.strip() for target in status.split(',')
+               if target.strip()]
+    return _wait_appinstance(url, app, targets, timeout, auth_header,
+                             conf['STACKN_SECURE'])
+
+
+def download_object(name, version=None, output=None, studio_url=[], project=[],
+                    secure=True, workers=stackn.download.WORKERS):
+    """
+    Downloads model object name, the latest version unless version is
+    given, to output ('<name>-<version>.tar.gz' by default). Artifacts
+    are cached by uid, see stackn.download.
+    """
+    conf = {
+        "STACKN_URL": studio_url,
+        "STACKN_PROJECT": project,
+        "STACKN_SECURE": secure
+    }
+
+    params = {'name': name,
+              'fields': 'uid,name,version,bucket,manifest,uploaded_at'}
+    if version:
+        params['version'] = version
+    objects = call_project_endpoint('models', conf=conf, params=params)
+    if objects == False:
+        return False
+    if not objects:
+        print("No model object {} found.".format(name))
+        return False
+
+    obj = max(objects, key=lambda obj: obj['uploaded_at'])
+    if not output:
+        output = '{}-{}.tar.gz'.format(obj['name'], obj['version'])
+
+    client = None
+    if not os.path.exists(stackn.download.cache_path(obj['uid'])):
+        conf, status = stackn.auth.get_config(conf)
+        auth_header, conf = get_auth_header(conf)
+        if not status or not auth_header:
+            return False
+        # The S3 storage settings are not cached, fetch the project.
+        proj, _ = get_project(conf, auth_header, refresh=True)
+        if not proj:
+            return False
+        if not proj.get('s3storage'):
+            print("S3 storage not set.")
+            return False
+        client = stackn.s3.create_client(proj['s3storage'], secure)
+
+    try:
+        path = stackn.download.fetch(client, obj.get('bucket') or 'models',
+                                     obj['uid'], obj['uid'],
+                                     manifest=obj.get('manifest'),
+                                     workers=workers)
+        shutil.copyfile(path, output)
+    except Exception as err:
+        print("Failed to download model object {}:{}.".format(
+            obj['name'], obj['version']))
+        print(err)
+        return False
+
+    print("Downloaded {}:{} to {}.".format(obj['name'], obj['version'],
+                                           output))
+    return output
 
 
 # Delete functions
 
-def delete_app(name, studio_url=[], project=[], secure=True):
+def delete_app(name, studio_url=[], project=[], secure=True,
+               workers=stackn.bulk.DEFAULT_WORKERS, retries=stackn.bulk.RETRIES):
 
     conf = {
         "STACKN_URL": studio_url,
@@ -580,41 +928,43 @@ def delete_app(name, studio_url=[], project=[], secure=True):
         "STACKN_SECURE": secure
     }
 
-    conf, auth_header, url = setup_project_endpoint_call(conf, 'appinstances')
-
-    if not conf or not auth_header or not url:
-        print("Failed to set up project API endpoint call.")
-        return False
-
     params = {
         "name": name
     }
 
+    # Listing first re-resolves the project if its cached id is stale.
     apps = call_project_endpoint('appinstances', conf, params=params)
 
     if not apps:
         return False
 
+    conf, auth_header, url = setup_project_endpoint_call(conf, 'appinstances')
+
+    if not conf or not auth_header or not url:
+        print("Failed to set up project API endpoint call.")
+        return False
+
     if len(apps) > 1:
         print("Found multiple apps with that name, deleting all...")
     elif len(apps) == 0:
         print("Found no app with that name, aborting...")
         return False
 
-    for app in apps:
-        ai_id = app['id']
-        tmp_url = url+str(ai_id)+'/'
-        res = requests.delete(tmp_url, headers=auth_header,
-                              verify=conf['STACKN_SECURE'])
-        if res:
-            print("Deleted app: {}".format(name))
-        else:
-            print("Failed to delete app.")
-            print('Status code: {}'.format(res.status_code))
-            print(res.text)
+    def delete(app):
+        return stackn.client.get_session().delete(
+            '{}{}/'.format(url, app['id']), headers=auth_header,
+            verify=conf['STACKN_SECURE'])
 
+    results = stackn.bulk.run(delete, apps,
+                              describe=lambda app: app.get('name', name),
+                              success='Deleted app: {}',
+                              failure='Failed to delete app: {}',
+                              workers=workers, retries=retries)
+    return all(result.ok for result in results)
 
-def delete_object(name, version=None, studio_url=[], project=[], secure=True):
+
+def delete_object(name, version=None, studio_url=[], project=[], secure=True,
+                  workers=stackn.bulk.DEFAULT_WORKERS, retries=stackn.bulk.RETRIES):
     if version:
         params = {'name': name, 'version': version}
     else:
@@ -626,12 +976,7 @@ def delete_object(name, version=None, studio_url=[], project=[], secure=True):
         "STACKN_SECURE": secure
     }
 
-    conf, auth_header, url = setup_project_endpoint_call(conf, 'models')
-
-    if not conf or not auth_header or not url:
-        print("Failed to setup project API endpoint.")
-        return False
-
+    # Listing first re-resolves the project if its cached id is stale.
     objects = call_project_endpoint('models', conf=conf, params=params)
 
     if objects == False:
@@ -639,16 +984,24 @@ def delete_object(name, version=None, studio_url=[], project=[], secure=True):
     elif len(objects) == 0:
         print("No model objects found with the given name and/or version.")
 
-    for obj in objects:
-        tmp_url = '{}{}/'.format(url, obj['id'])
-        res = requests.delete(tmp_url, headers=auth_header,
-                              verify=conf['STACKN_SECURE'])
-        if res:
-            print("Deleted model object: {}".format(name))
-        else:
-            print("Failed to delete model object.")
-            print('Status code: {}'.format(res.status_code))
-            print(res.text)
+    conf, auth_header, url = setup_project_endpoint_call(conf, 'models')
+
+    if not conf or not auth_header or not url:
+        print("Failed to setup project API endpoint.")
+        return False
+
+    def delete(obj):
+        return stackn.client.get_session().delete(
+            '{}{}/'.format(url, obj['id']), headers=auth_header,
+            verify=conf['STACKN_SECURE'])
+
+    results = stackn.bulk.run(delete, objects,
+                              describe=lambda obj: '{}:{}'.format(
+                                  obj['name'], obj['version']),
+                              success='Deleted model object: {}',
+                              failure='Failed to delete model object: {}',
+                              workers=workers, retries=retries)
+    return all(result.ok for result in results)
 
 
 def delete_project(name, studio_url=[], secure=True):
@@ -665,10 +1018,16 @@ def delete_project(name, studio_url=[], secure=True):
         print("Failed to set up project API endpoint")
         return False
 
-    res = requests.delete(url, headers=auth_header,
-                          verify=conf['STACKN_SECURE'])
+    res = stackn.client.get_session().delete(url, headers=auth_header,
+                                             verify=conf['STACKN_SECURE'])
+    if res.status_code == 404:
+        url = refresh_project_url(conf, auth_header, 'project_del', url)
+        if url:
+            res = stackn.client.get_session().delete(
+                url, headers=auth_header, verify=conf['STACKN_SECURE'])
 
     if res:
+        stackn.client.forget_project(conf)
         print("Deleted project: {}".format(name))
     else:
         print("Failed to delete project.")
@@ -684,16 +1043,11 @@ def delete_meta_resource(resource_type, name, project=[], studio_url=[], secure=
         "STACKN_SECURE": secure
     }
 
-    conf, auth_header, url = setup_project_endpoint_call(conf, resource_type)
-
-    if not conf or not auth_header or not url:
-        print("Failed to setup project API endpoint.")
-        return False
-
     params = {
         "name": name
     }
 
+    # Listing first re-resolves the project if its cached id is stale.
     prj_endpts = call_project_endpoint(resource_type, conf=conf, params=params)
 
     if prj_endpts == False:
@@ -708,13 +1062,19 @@ def delete_meta_resource(resource_type, name, project=[], studio_url=[], secure=
 
     endpt = prj_endpts[0]
 
+    conf, auth_header, url = setup_project_endpoint_call(conf, resource_type)
+
+    if not conf or not auth_header or not url:
+        print("Failed to setup project API endpoint.")
+        return False
+
     if resource_type == "mlflow" or resource_type == "s3":
         url = '{}{}/'.format(url, endpt['name'])
     else:
         url = '{}{}/'.format(url, endpt['id'])
 
-    res = requests.delete(url, headers=auth_header,
-                          verify=conf['STACKN_SECURE'])
+    res = stackn.client.get_session().delete(url, headers=auth_header,
+                                             verify=conf['STACKN_SECURE'])
     if res:
         print("Deleted {}: {}".format(resource_type, name))
     else:
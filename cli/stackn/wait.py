@@ -0,0 +1,24 @@
+import sys
+
+import click
+
+from .stackn import wait_app
+
+
+@click.group('wait')
+def wait():
+    pass
+
+
+@wait.command('app')
+@click.argument('name')
+@click.option('--for', 'status', required=False, default='Running', help="Status to wait for, several separated by commas")
+@click.option('--timeout', required=False, default=300, help="Seconds to wait at most")
+@click.option('-p', '--project', required=False, default=[])
+@click.option('-u', '--studio-url', required=False, default=[])
+@click.option('--secure/--insecure', default=True)
+def app(name, status, timeout, project, studio_url, secure):
+    """Wait until app NAME has a status, exit with 1 if it fails or times out."""
+    if not wait_app(name, status=status, timeout=timeout, studio_url=studio_url,
+                    project=project, secure=secure):
+        sys.exit(1)
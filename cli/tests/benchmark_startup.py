@@ -0,0 +1,69 @@
+"""
+Start up time of the CLI.
+
+Runs a few quick commands repeatedly in fresh interpreters and reports
+the median and 90th percentile wall time, followed by the slowest
+imports of one run (python -X importtime). Run from the cli directory:
+
+    python -m tests.benchmark_startup [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+COMMANDS = (['--help'], ['get', 'current'])
+TOP_IMPORTS = 15
+
+
+def _command(args):
+    return [sys.executable, '-c', 'from stackn.main import main; main()']+args
+
+
+def _env():
+    return dict(os.environ,
+                STACKN_CONFIG_PATH=os.path.dirname(os.path.realpath(__file__)),
+                STACKN_CONFIG_FILE='test_config.json')
+
+
+def timings(args, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(_command(args), env=_env(), stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter()-start)
+    return sorted(times)
+
+
+def slowest_imports(args, top=TOP_IMPORTS):
+    """ (cumulative microseconds, module) of the slowest imports. """
+    out = subprocess.run([sys.executable, '-X', 'importtime']+_command(args)[1:],
+                         env=_env(), stdout=subprocess.DEVNULL,
+                         stderr=subprocess.PIPE).stderr.decode()
+    imports = []
+    for line in out.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        # Only top level imports, nested ones are part of their parent.
+        if module.startswith('  '):
+            continue
+        imports.append((int(cumulative), module.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def main(runs=20):
+    for args in COMMANDS:
+        times = timings(args, runs)
+        p90 = times[min(len(times)-1, int(0.9*len(times)))]
+        print('stackn {:<12} median {:6.1f} ms  p90 {:6.1f} ms  ({} runs)'.format(
+            ' '.join(args), 1000*statistics.median(times), 1000*p90, runs))
+    print('\nSlowest imports of stackn {}:'.format(' '.join(COMMANDS[-1])))
+    for cumulative, module in slowest_imports(COMMANDS[-1]):
+        print('{:8.1f} ms  {}'.format(cumulative/1000, module))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
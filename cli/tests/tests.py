@@ -1,7 +1,33 @@
+import asyncio
+import hashlib
+import io
+import json
 import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import time
 from unittest import TestCase, mock
 
+import requests
+import urllib3
+from click.testing import CliRunner
+
+import stackn.artifact as artifact
 import stackn.auth as auth
+import stackn.batch as batch
+import stackn.bulk as bulk
+import stackn.client as client
+import stackn.download as download
+import stackn.get as get
+import stackn.output as output
+import stackn.package as package
+import stackn.s3 as s3
+import stackn.sdk as sdk
+import stackn.stackn as stackn
 
 
 class CLIAuthTests(TestCase):
@@ -74,3 +100,829 @@ class CLIAuthTests(TestCase):
         }
 
         self.assertEqual(config_for_url, expected_config)
+
+
+class CLIBatchTests(TestCase):
+
+    @mock.patch('stackn.stackn.setup_project_endpoint_call',
+                return_value=({'STACKN_SECURE': False,
+                               'STACKN_ACCESS_TOKEN': 'test_token'},
+                              {'Authorization': 'Token test_token'},
+                              'http://studio.test.domain/api/projects/1/metadata/'))
+    def test_buffered_logger_flushes_in_batches(self, _setup):
+        response = mock.Mock(status_code=200)
+        with mock.patch('requests.Session.post', return_value=response) as post:
+            with batch.metadata_logger(batch_size=2, flush_interval=3600) as log:
+                for i in range(5):
+                    log.add(run_id='run{}'.format(i), trained_model='m:1.0')
+                self.assertEqual(post.call_count, 2)
+            self.assertEqual(post.call_count, 3)
+
+        url = post.call_args[0][0]
+        self.assertEqual(
+            url, 'http://studio.test.domain/api/projects/1/metadata/bulk/')
+        body = post.call_args[1]['data'].decode('utf-8')
+        self.assertEqual(body, '{"run_id": "run4", "trained_model": "m:1.0"}')
+
+    @mock.patch('stackn.stackn.setup_project_endpoint_call',
+                return_value=({'STACKN_SECURE': False,
+                               'STACKN_ACCESS_TOKEN': 'test_token'},
+                              {'Authorization': 'Token test_token'},
+                              'http://studio.test.domain/api/projects/1/metadata/'))
+    def test_background_flush_does_not_block_add(self, _setup):
+        sending = threading.Event()
+        release = threading.Event()
+
+        def post(*args, **kwargs):
+            sending.set()
+            release.wait(5)
+            return mock.Mock(status_code=200)
+
+        with mock.patch('requests.Session.post', side_effect=post) as session_post:
+            with batch.metadata_logger(batch_size=2, background=True) as log:
+                log.add(run_id='run0', trained_model='m:1.0')
+                log.add(run_id='run1', trained_model='m:1.0')
+                self.assertTrue(sending.wait(5))
+                # The first batch is still being sent.
+                log.add(run_id='run2', trained_model='m:1.0')
+                release.set()
+        self.assertEqual(session_post.call_count, 2)
+
+    @mock.patch('stackn.stackn.setup_project_endpoint_call',
+                return_value=({'STACKN_SECURE': False,
+                               'STACKN_ACCESS_TOKEN': 'test_token'},
+                              {'Authorization': 'Token test_token'},
+                              'http://studio.test.domain/api/projects/1/metadata/'))
+    def test_retry_buffer_is_capped(self, _setup):
+        response = mock.Mock(status_code=503, text='unavailable')
+        with mock.patch('requests.Session.post', return_value=response):
+            log = batch.metadata_logger(batch_size=2, flush_interval=3600,
+                                        max_buffer=4)
+            for i in range(10):
+                log.add(run_id='run{}'.format(i), trained_model='m:1.0')
+        self.assertEqual([record['run_id'] for record in log._buffer],
+                         ['run6', 'run7', 'run8', 'run9'])
+        response.status_code = 200
+        with mock.patch('requests.Session.post', return_value=response):
+            log.close()
+        self.assertEqual(log._buffer, [])
+
+    @mock.patch('stackn.stackn.setup_project_endpoint_call',
+                return_value=({'STACKN_SECURE': False,
+                               'STACKN_ACCESS_TOKEN': 'test_token'},
+                              {'Authorization': 'Token test_token'},
+                              'http://studio.test.domain/api/projects/1/metadata/'))
+    @mock.patch('stackn.stackn.refresh_project_url',
+                return_value='http://studio.test.domain/api/projects/2/metadata/')
+    def test_stale_project_is_resolved_once(self, refresh, _setup):
+        gone = mock.Mock(status_code=404, text='not found')
+        sent = mock.Mock(status_code=200)
+        with mock.patch('requests.Session.post',
+                        side_effect=[gone, sent, gone]) as post:
+            log = batch.metadata_logger(batch_size=1, flush_interval=3600)
+            log.add(run_id='run0', trained_model='m:1.0')
+            log.add(run_id='run1', trained_model='m:1.0')
+        self.assertEqual(refresh.call_count, 1)
+        self.assertEqual(
+            post.call_args[0][0],
+            'http://studio.test.domain/api/projects/2/metadata/bulk/')
+        self.assertEqual(len(log._buffer), 1)
+        with mock.patch('requests.Session.post', return_value=sent):
+            log.close()
+
+
+class CLISDKTests(TestCase):
+
+    def setUp(self):
+        conf = {'STACKN_URL': 'https://studio.test', 'STACKN_PROJECT': 'demo',
+                'STACKN_SECURE': True, 'STACKN_ACCESS_TOKEN': 'tok'}
+        project = {'id': 7, 'name': 'demo', 's3storage': {'host': 'minio'}}
+        patchers = [
+            mock.patch('stackn.auth.get_config', return_value=(conf, True)),
+            mock.patch('stackn.stackn.get_project',
+                       return_value=(project, False)),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = sdk.Client()
+        self.addCleanup(self.client.close)
+
+    def test_log_metadata_in_batches(self):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'created': 2, 'updated': 0}
+        records = [{'run_id': 'run{}'.format(i), 'trained_model': 'm:1'}
+                   for i in range(4)]
+        with mock.patch('requests.Session.post', return_value=response) as post:
+            counts = self.client.log_metadata(records, batch_size=2)
+        self.assertEqual(counts, {'created': 4, 'updated': 0})
+        self.assertEqual(post.call_args[0][0],
+                         'https://studio.test/api/projects/7/metadata/bulk/')
+        self.assertEqual(post.call_args[1]['headers']['Authorization'],
+                         'Token tok')
+
+    @mock.patch('stackn.stackn.setup_project_endpoint_call')
+    def test_logger_reuses_client(self, setup):
+        response = mock.Mock(status_code=200)
+        with mock.patch('requests.Session.post', return_value=response) as post:
+            with self.client.metadata_logger(batch_size=2) as log:
+                log.add(run_id='run0', trained_model='m:1')
+        setup.assert_not_called()
+        self.assertIs(log.session, client.get_session())
+        self.assertEqual(post.call_args[0][0],
+                         'https://studio.test/api/projects/7/metadata/bulk/')
+        self.assertEqual(post.call_args[1]['headers']['Authorization'],
+                         'Token tok')
+
+    @mock.patch('stackn.stackn._create_object', side_effect=[True, False, True])
+    def test_create_objects_reuse_context(self, create):
+        results = self.client.create_objects(
+            [{'name': 'a'}, {'name': 'b'}, {'name': 'c'}])
+        self.assertEqual(sorted(results), [False, True, True])
+        self.assertEqual(create.call_count, 3)
+        self.assertTrue(all(call[0][2]['id'] == 7
+                            for call in create.call_args_list))
+
+    @mock.patch('stackn.stackn._create_object', return_value=True)
+    def test_async_client(self, create):
+        async def run():
+            studio = sdk.AsyncClient(client=self.client)
+            return await studio.create_objects([{'name': 'a'}, {'name': 'b'}])
+        results = asyncio.get_event_loop().run_until_complete(run())
+        self.assertEqual(results, [True, True])
+        self.assertEqual(create.call_count, 2)
+
+
+class CLIPaginationTests(TestCase):
+
+    def test_iter_pages_follows_cursor(self):
+        pages = [
+            {'next': 'http://test/api/items/?cursor=abc', 'results': [1, 2]},
+            {'next': None, 'results': [3]},
+        ]
+        responses = [mock.Mock(content=json.dumps(p).encode())
+                     for p in pages]
+        with mock.patch('requests.Session.get', side_effect=responses) as get:
+            items = stackn._get_all('http://test/api/items/', {},
+                                    params={'name': 'x'})
+        self.assertEqual(items, [1, 2, 3])
+        self.assertEqual(get.call_args_list[0][1]['params'],
+                         {'name': 'x', 'page_size': stackn.PAGE_SIZE})
+        self.assertEqual(get.call_args_list[1][0][0],
+                         'http://test/api/items/?cursor=abc')
+
+    def test_iter_pages_unpaginated_server(self):
+        response = mock.Mock(content=b'[1, 2, 3]')
+        with mock.patch('requests.Session.get', return_value=response):
+            self.assertEqual(stackn._get_all('http://test/', {}), [1, 2, 3])
+
+
+class CLISearchTests(TestCase):
+
+    @mock.patch('stackn.stackn.get_auth_header',
+                return_value=({'Authorization': 'Token t'},
+                              {'STACKN_URL': 'studio.test', 'STACKN_SECURE': True}))
+    def test_search_passes_query(self, _auth):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'models': []}
+        with mock.patch('requests.Session.get', return_value=response) as get:
+            self.assertEqual(stackn.search('sat img', types=['models']),
+                             {'models': []})
+        self.assertEqual(get.call_args[0][0],
+                         'https://studio.test/api/search/')
+        self.assertEqual(get.call_args[1]['params'],
+                         {'q': 'sat img', 'type': 'models'})
+
+
+class CLIOutputTests(TestCase):
+    rows = [[{'name': 'a', 'version': 1, 'extra': 'x'}],
+            [{'name': 'b,c', 'version': 2, 'extra': 'y'}]]
+
+    def write(self, fmt, pages=None):
+        out = io.StringIO()
+        ok = output.write_pages(pages or iter(self.rows), ['Name', 'Version'],
+                                ['name', 'version'], fmt, out=out)
+        return ok, out.getvalue()
+
+    def test_formats(self):
+        ok, text = self.write('json')
+        self.assertTrue(ok)
+        self.assertEqual(json.loads(text), [{'name': 'a', 'version': 1},
+                                            {'name': 'b,c', 'version': 2}])
+        ok, text = self.write('ndjson')
+        self.assertEqual([json.loads(line)['name'] for line in text.splitlines()],
+                         ['a', 'b,c'])
+        ok, text = self.write('csv')
+        self.assertEqual(text.splitlines(), ['name,version', 'a,1', '"b,c",2'])
+        self.assertEqual(json.loads(self.write('json', iter([[]]))[1]), [])
+
+    def test_rows_are_written_as_pages_arrive(self):
+        out = io.StringIO()
+
+        def pages():
+            yield self.rows[0]
+            self.assertEqual(out.getvalue(), '{"name": "a", "version": 1}\n')
+            yield None
+
+        self.assertFalse(output.write_pages(pages(), ['Name'], ['name', 'version'],
+                                            'ndjson', out=out))
+
+    @mock.patch('stackn.get.iter_project_endpoint')
+    def test_get_s3_requests_only_listed_columns(self, iter_endpoint):
+        iter_endpoint.return_value = iter(
+            [[{'name': 'minio', 'host': 'h', 'region': 'r'}]])
+        result = CliRunner().invoke(get.get, ['s3', '-o', 'csv'])
+        self.assertEqual(result.output.splitlines(),
+                         ['name,host,region', 'minio,h,r'])
+        self.assertEqual(iter_endpoint.call_args[1]['params'],
+                         {'fields': 'name,host,region'})
+
+
+class CLICacheTests(TestCase):
+
+    def setUp(self):
+        self.config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.config_dir)
+        shutil.copy(os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                                 'test_config.json'), self.config_dir)
+        patcher = mock.patch.dict(os.environ, {
+            'STACKN_CONFIG_PATH': self.config_dir,
+            'STACKN_CONFIG_FILE': 'test_config.json'
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        auth._forget_config()
+        self.addCleanup(auth._forget_config)
+        self.conf = {'STACKN_URL': 'http://studio.test.domain',
+                     'STACKN_USER': 'test_user',
+                     'STACKN_PROJECT': 'test_project'}
+
+    def test_config_file_parsed_once(self):
+        first = auth._load_config_file_full({})
+        with mock.patch('builtins.open') as open_:
+            second = auth._load_config_file_full({})
+        open_.assert_not_called()
+        self.assertEqual(first, second)
+        # Callers get their own copy.
+        second['current']['STACKN_PROJECT'] = 'changed'
+        self.assertEqual(auth._load_config_file_full({})[
+                         'current']['STACKN_PROJECT'], '')
+
+    def test_write_config_invalidates_cache(self):
+        auth._load_config_file_full({})
+        auth.write_config({'STACKN_URL': 'http://studio.new.domain',
+                           'STACKN_ACCESS_TOKEN': 'new_token'})
+        config = auth._load_config_file_full({})
+        self.assertIn('studio.new.domain', config)
+
+    def test_project_cache_skips_lookup(self):
+        project = {'id': 7, 'name': 'test_project', 'slug': 'test-project',
+                   's3storage': {'access_key': 'secret'}}
+        with mock.patch('stackn.stackn.get_projects',
+                        return_value=[project]) as get_projects:
+            self.assertEqual(stackn.get_project(self.conf, {}),
+                             (project, False))
+            cached, from_cache = stackn.get_project(self.conf, {})
+        self.assertEqual(get_projects.call_count, 1)
+        self.assertTrue(from_cache)
+        self.assertEqual(cached, {'id': 7, 'name': 'test_project',
+                                  'slug': 'test-project'})
+
+    def test_project_cache_disabled(self):
+        project = {'id': 7, 'name': 'test_project', 'slug': 'test-project'}
+        with mock.patch.dict(os.environ, {'STACKN_CACHE_TTL': '0'}):
+            with mock.patch('stackn.stackn.get_projects',
+                            return_value=[project]) as get_projects:
+                stackn.get_project(self.conf, {})
+                stackn.get_project(self.conf, {})
+        self.assertEqual(get_projects.call_count, 2)
+
+    def test_stale_project_refreshed(self):
+        client.cache_project(self.conf, {'id': 7, 'name': 'test_project',
+                                         'slug': 'test-project'})
+        fresh = {'id': 8, 'name': 'test_project', 'slug': 'test-project'}
+        conf = dict(self.conf, STACKN_SECURE=True)
+        with mock.patch('stackn.auth.get_config', return_value=(conf, True)), \
+                mock.patch('stackn.stackn.get_auth_header',
+                           return_value=({'Authorization': 'Token t'}, conf)), \
+                mock.patch('stackn.stackn.get_endpoints',
+                           return_value={'apps': 'http://test/{}/apps/'}), \
+                mock.patch('stackn.stackn.get_projects', return_value=[fresh]), \
+                mock.patch('stackn.stackn._get_all',
+                           side_effect=[None, ['app']]) as get_all:
+            apps = stackn.call_project_endpoint('apps')
+        self.assertEqual(apps, ['app'])
+        self.assertEqual(get_all.call_args[0][0], 'http://test/8/apps/')
+
+    def test_stale_project_refreshed_on_404(self):
+        client.cache_project(self.conf, {'id': 7, 'name': 'test_project',
+                                         'slug': 'test-project'})
+        fresh = {'id': 8, 'name': 'test_project', 'slug': 'test-project'}
+        conf = dict(self.conf, STACKN_SECURE=True)
+        gone = requests.Response()
+        gone.status_code = 404
+        created = requests.Response()
+        created.status_code = 201
+        with mock.patch('stackn.auth.get_config', return_value=(conf, True)), \
+                mock.patch('stackn.stackn.get_auth_header',
+                           return_value=({'Authorization': 'Token t'}, conf)), \
+                mock.patch('stackn.stackn.get_projects',
+                           return_value=[fresh]) as get_projects, \
+                mock.patch('requests.Session.post',
+                           side_effect=[gone, created]) as post:
+            # The cached id is used as is, without a lookup.
+            _, _, url = stackn.setup_project_endpoint_call({}, 'models')
+            self.assertEqual(
+                url, 'http://studio.test.domain/api/projects/7/models/')
+            self.assertEqual(get_projects.call_count, 0)
+            self.assertTrue(stackn.create_appinstance(data={}))
+        self.assertEqual(get_projects.call_count, 1)
+        self.assertEqual(
+            [call[0][0] for call in post.call_args_list],
+            ['http://studio.test.domain/api/projects/7/appinstances/',
+             'http://studio.test.domain/api/projects/8/appinstances/'])
+
+
+class CLITokenTests(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        patcher = mock.patch.dict(os.environ, {'STACKN_CONFIG_PATH': self.tmp,
+                                               'STACKN_CONFIG_FILE': 'stackn.json'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        auth._forget_config()
+        self.addCleanup(auth._forget_config)
+        self.path = os.path.join(self.tmp, 'stackn.json')
+        self.store({'STACKN_ACCESS_TOKEN': 'old',
+                    'STACKN_TOKEN_EXPIRES': time.time()+60})
+
+    def store(self, values):
+        with open(self.path, 'w') as f:
+            json.dump({'studio.test': dict(values, STACKN_URL='https://studio.test'),
+                       'current': {'STACKN_URL': 'https://studio.test',
+                                   'STACKN_PROJECT': '', 'STACKN_SECURE': True}}, f)
+        auth._forget_config()
+
+    def stored(self):
+        with open(self.path) as f:
+            return json.load(f)['studio.test']
+
+    def conf(self):
+        conf, status = auth.get_config()
+        self.assertTrue(status)
+        return conf
+
+    def test_valid_token_needs_no_request(self):
+        self.store({'STACKN_ACCESS_TOKEN': 'tok',
+                    'STACKN_TOKEN_EXPIRES': time.time()+3600})
+        with mock.patch('requests.Session.post') as post:
+            self.assertEqual(auth.get_access_token(self.conf()), 'tok')
+        post.assert_not_called()
+
+    def test_refresh_before_expiry(self):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'token': 'old', 'expires_in': 3600}
+        with mock.patch('requests.Session.post', return_value=response) as post:
+            conf = self.conf()
+            self.assertEqual(auth.get_access_token(conf), 'old')
+            self.assertEqual(auth.get_access_token(conf), 'old')
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(post.call_args[0][0],
+                         'https://studio.test/api/token-refresh/')
+        self.assertGreater(self.stored()['STACKN_TOKEN_EXPIRES'],
+                           time.time()+3000)
+
+    def test_token_refreshed_by_other_process(self):
+        conf = self.conf()
+        self.store({'STACKN_ACCESS_TOKEN': 'new',
+                    'STACKN_TOKEN_EXPIRES': time.time()+3600})
+        with mock.patch('requests.Session.post') as post:
+            self.assertEqual(auth.get_access_token(conf), 'new')
+        post.assert_not_called()
+
+    def test_login_again_after_expiry(self):
+        self.store({'STACKN_ACCESS_TOKEN': 'old', 'STACKN_TOKEN_EXPIRES': time.time()-1,
+                    'STACKN_USER': 'u', 'STACKN_PASS': 'p'})
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'token': 'new', 'expires_in': 3600}
+        with mock.patch('requests.Session.post', return_value=response) as post:
+            self.assertEqual(auth.get_access_token(self.conf()), 'new')
+        self.assertEqual(post.call_args[0][0],
+                         'https://studio.test/api/token-auth/')
+        self.assertEqual(self.stored()['STACKN_ACCESS_TOKEN'], 'new')
+
+    def test_concurrent_updates_are_not_lost(self):
+        script = ('import stackn.auth as auth\n'
+                  'def add(config):\n'
+                  '    config["count"] = config.get("count", 0)+1\n'
+                  'for _ in range(20):\n'
+                  '    auth._update_config(add)\n')
+        cwd = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+        processes = [subprocess.Popen([sys.executable, '-c', script], cwd=cwd)
+                     for _ in range(4)]
+        for process in processes:
+            self.assertEqual(process.wait(), 0)
+        with open(self.path) as f:
+            self.assertEqual(json.load(f)['count'], 80)
+
+
+class CLIBulkTests(TestCase):
+
+    def test_retries_transient_failures(self):
+        responses = {'a': [mock.Mock(status_code=503, text='busy',
+                                     __bool__=lambda self: False),
+                           mock.Mock(status_code=200)],
+                     'b': [mock.Mock(status_code=400, text='bad',
+                                     __bool__=lambda self: False)]}
+
+        def operation(item):
+            return responses[item].pop(0)
+
+        with mock.patch('time.sleep') as sleep:
+            results = bulk.run(operation, ['a', 'b'], backoff=0.1)
+        results = {result.item: result for result in results}
+        self.assertTrue(results['a'].ok)
+        self.assertEqual(results['a'].attempts, 2)
+        self.assertFalse(results['b'].ok)
+        self.assertEqual(results['b'].attempts, 1)
+        sleep.assert_called_once_with(0.1)
+
+    def test_gives_up_after_retries(self):
+        operation = mock.Mock(side_effect=requests.ConnectionError('down'))
+        with mock.patch('time.sleep'):
+            result, = bulk.run(operation, ['a'], retries=2)
+        self.assertFalse(result.ok)
+        self.assertEqual(operation.call_count, 3)
+        self.assertEqual(result.message, 'down')
+
+    def test_creates_retried_only_when_refused(self):
+        responses = {'a': [mock.Mock(status_code=502, text='bad gateway',
+                                     __bool__=lambda self: False)],
+                     'b': [mock.Mock(status_code=429, text='slow down',
+                                     __bool__=lambda self: False),
+                           mock.Mock(status_code=200)],
+                     'c': [requests.ReadTimeout('no answer')],
+                     'd': [requests.ConnectTimeout('no connection'),
+                           mock.Mock(status_code=200)]}
+
+        def operation(item):
+            response = responses[item].pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        with mock.patch('time.sleep'):
+            results = bulk.run(operation, ['a', 'b', 'c', 'd'],
+                               idempotent=False)
+        results = {result.item: (result.ok, result.attempts)
+                   for result in results}
+        self.assertEqual(results, {'a': (False, 1), 'b': (True, 2),
+                                   'c': (False, 1), 'd': (True, 2)})
+
+    def test_create_apps_without_chdir(self):
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        for name in ('app1', 'app2'):
+            os.makedirs(os.path.join(folder, name, 'chart', 'templates'))
+            with open(os.path.join(folder, name, 'chart', 'Chart.yaml'), 'w') as f:
+                f.write('name: {}\n'.format(name))
+            with open(os.path.join(folder, name, 'logo.png'), 'wb') as f:
+                f.write(b'png')
+            with open(os.path.join(folder, name, 'config.json'), 'w') as f:
+                json.dump({'name': name, 'slug': name, 'category': 'Serve',
+                           'description': '', 'settings': {},
+                           'table_field': {}}, f)
+
+        conf = {'STACKN_URL': 'studio.test', 'STACKN_SECURE': True}
+        charts = {}
+
+        def post(url, files, data, **kwargs):
+            with tarfile.open(fileobj=io.BytesIO(files['chart'][1].read())) as tar:
+                charts[data['slug']] = tar.extractfile(
+                    './Chart.yaml').read()
+            return mock.Mock(status_code=200)
+
+        cwd = os.getcwd()
+        with mock.patch('stackn.auth.get_config', return_value=(conf, True)), \
+                mock.patch('stackn.stackn.get_auth_header',
+                           return_value=({'Authorization': 'Token t'}, conf)), \
+                mock.patch('requests.Session.post', side_effect=post) as posted, \
+                mock.patch('os.chdir') as chdir:
+            self.assertTrue(stackn.create_apps(folder, workers=2))
+        chdir.assert_not_called()
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertEqual(posted.call_count, 2)
+        self.assertEqual(charts, {'app1': b'name: app1\n',
+                                  'app2': b'name: app2\n'})
+
+
+class CLIPackageTests(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        files = {'train.py': b'print(1)\n',
+                 'model/weights.bin': os.urandom(200000),
+                 'model/cache.pyc': b'',
+                 'data/raw/huge.csv': b'a,b\n',
+                 'data/keep.csv': b'c,d\n',
+                 'logs/run.log': b'',
+                 '.git/HEAD': b'ref\n'}
+        for name, content in files.items():
+            path = os.path.join(self.root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(content)
+        self.files = files
+
+    def members(self, archive):
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            return {member.name: tar.extractfile(member).read()
+                    for member in tar if member.isfile()}
+
+    def test_stacknignore(self):
+        with open(os.path.join(self.root, '.stacknignore'), 'w') as f:
+            f.write('# data sets\n/data/*\n!data/keep.csv\n*.log\n')
+        with package.TarGzStream(self.root) as archive:
+            members = self.members(archive.read())
+        self.assertEqual(sorted(members), ['./.stacknignore', './data/keep.csv',
+                                           './model/weights.bin', './train.py'])
+        self.assertEqual(members['./model/weights.bin'],
+                         self.files['model/weights.bin'])
+
+    def test_streams_in_blocks(self):
+        # Small blocks give many gzip members, read in odd sized pieces.
+        with package.TarGzStream(self.root, workers=3, block_size=4096) as archive:
+            pieces = []
+            while True:
+                piece = archive.read(10000)
+                if not piece:
+                    break
+                pieces.append(piece)
+        self.assertGreater(len(pieces), 2)
+        members = self.members(b''.join(pieces))
+        self.assertEqual(members['./model/weights.bin'],
+                         self.files['model/weights.bin'])
+        self.assertEqual(archive.files, len(members))
+
+    def test_close_before_end(self):
+        archive = package.TarGzStream(self.root, workers=1, block_size=512)
+        archive.read(100)
+        archive.close()
+
+    def test_failed_stream_upload(self):
+        def put_object(bucket, name, data, length, part_size):
+            data.read(100)
+            raise urllib3.exceptions.ProtocolError('Connection aborted.')
+
+        s3_client = mock.Mock(put_object=put_object)
+        archive = package.TarGzStream(self.root, workers=1, block_size=512)
+        with mock.patch('stackn.s3.create_client', return_value=s3_client), \
+                mock.patch('builtins.print') as print_:
+            self.assertFalse(s3.set_artifact('uid1', archive, 'models', {}))
+        self.assertIn('Connection aborted', print_.call_args[0][0])
+        self.assertTrue(archive._closed.is_set())
+
+
+class FakeS3:
+    """ The subset of the minio client used by stackn.artifact. """
+
+    def __init__(self):
+        self.objects = {}
+        self.put = []
+
+    def put_object(self, bucket, name, data, length):
+        self.put.append(name)
+        self.objects[(bucket, name)] = data.read()
+
+    def stat_object(self, bucket, name):
+        if (bucket, name) not in self.objects:
+            raise KeyError(name)
+
+    def compose_object(self, bucket, name, sources):
+        parts = []
+        for source in sources:
+            data = self.objects[(source.bucket_name, source.object_name)]
+            offset = source.offset or 0
+            length = source.length or len(data)-offset
+            parts.append(data[offset:offset+length])
+        self.objects[(bucket, name)] = b''.join(parts)
+
+    def remove_object(self, bucket, name):
+        del self.objects[(bucket, name)]
+
+
+class CLIArtifactTests(TestCase):
+
+    def known(self, name, manifest):
+        objects = {manifest['hash']: {'bucket': 'models', 'object': name}}
+        chunks = {chunk: {'bucket': 'models', 'object': name,
+                          'offset': i*manifest['chunk_size'],
+                          'length': min(manifest['chunk_size'],
+                                        manifest['size']-i*manifest['chunk_size'])}
+                  for i, chunk in enumerate(manifest['chunks'])}
+        return objects, chunks
+
+    def test_reuses_known_chunks(self):
+        s3 = FakeS3()
+        v1 = b'a'*10 + b'b'*10 + b'c'*5
+        name, manifest, uploaded = artifact.upload(
+            s3, 'models', io.BytesIO(v1), chunk_size=10)
+        self.assertEqual(name, 'sha256-'+hashlib.sha256(v1).hexdigest())
+        self.assertEqual(uploaded, 25)
+        self.assertEqual(s3.objects[('models', name)], v1)
+        self.assertEqual(len(manifest['chunks']), 3)
+
+        # Only the changed middle chunk is uploaded.
+        v2 = b'a'*10 + b'x'*10 + b'c'*5
+        s3.put.clear()
+        name2, _, uploaded = artifact.upload(
+            s3, 'models', io.BytesIO(v2), *self.known(name, manifest),
+            chunk_size=10)
+        self.assertEqual(uploaded, 10)
+        self.assertEqual(len(s3.put), 1)
+        self.assertEqual(s3.objects[('models', name2)], v2)
+        self.assertEqual(set(s3.objects),
+                         {('models', name), ('models', name2)})
+
+    def test_identical_release_uploads_nothing(self):
+        s3 = FakeS3()
+        data = os.urandom(35)
+        name, manifest, _ = artifact.upload(s3, 'models', io.BytesIO(data),
+                                            chunk_size=10)
+        s3.put.clear()
+        name2, manifest2, uploaded = artifact.upload(
+            s3, 'models', io.BytesIO(data), *self.known(name, manifest),
+            chunk_size=10)
+        self.assertEqual((name2, manifest2, uploaded), (name, manifest, 0))
+        self.assertEqual(s3.put, [])
+
+    def test_single_chunk_stored_directly(self):
+        s3 = FakeS3()
+        name, manifest, uploaded = artifact.upload(
+            s3, 'models', io.BytesIO(b'weights'), chunk_size=10)
+        self.assertEqual(s3.put, [name])
+        self.assertEqual(uploaded, 7)
+
+
+class FakeObject:
+
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        pass
+
+
+class CLIDownloadTests(TestCase):
+
+    def setUp(self):
+        cache = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache)
+        patcher = mock.patch.dict(os.environ, {'STACKN_CACHE_DIR': cache})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.data = os.urandom(1000)
+        self.client = mock.Mock()
+        self.client.stat_object.return_value = mock.Mock(
+            size=len(self.data), etag='"{}-3"'.format('0'*32))
+        self.failing = set()
+
+        def get_object(bucket, name, offset, length):
+            if offset in self.failing:
+                raise OSError('connection reset')
+            return FakeObject(self.data[offset:offset+length])
+        self.client.get_object.side_effect = get_object
+        self.manifest = {'algorithm': 'sha256', 'chunk_size': 300,
+                         'size': len(self.data),
+                         'hash': hashlib.sha256(self.data).hexdigest(),
+                         'chunks': [hashlib.sha256(self.data[i:i+300]).hexdigest()
+                                    for i in range(0, len(self.data), 300)]}
+
+    def fetch(self, manifest=None):
+        return download.fetch(self.client, 'models', 'uid1', 'uid1',
+                              manifest=manifest or self.manifest, workers=3)
+
+    def test_parallel_ranges_and_cache(self):
+        path = self.fetch()
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(self.client.get_object.call_count, 4)
+        self.assertEqual(self.fetch(), path)
+        self.assertEqual(self.client.get_object.call_count, 4)
+
+    def test_resume(self):
+        self.failing.add(600)
+        with mock.patch('time.sleep'):
+            with self.assertRaises(OSError):
+                self.fetch()
+        self.failing.clear()
+        self.client.get_object.reset_mock()
+        path = self.fetch()
+        self.assertEqual(
+            [c[0][2] for c in self.client.get_object.call_args_list], [600])
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_checksum_mismatch(self):
+        manifest = dict(self.manifest, chunks=['0'*64]*4)
+        with self.assertRaises(download.DownloadError):
+            self.fetch(manifest)
+        self.assertFalse(os.path.exists(download.cache_path('uid1')))
+
+    def test_unverifiable_download_warns(self):
+        with mock.patch('builtins.print') as print_:
+            path = download.fetch(self.client, 'models', 'uid1', 'uid1')
+        self.assertIn('could not be verified', print_.call_args[0][0])
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+
+class CLIWaitTests(TestCase):
+    url = 'https://studio.test/api/projects/1/appinstances/'
+
+    def setUp(self):
+        patcher = mock.patch('stackn.stackn.setup_project_endpoint_call',
+                             return_value=({'STACKN_SECURE': True},
+                                           {'Authorization': 'Token t'}, self.url))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def responses(self, *statuses):
+        listing = mock.Mock(status_code=200, content=json.dumps(
+            [{'id': 3, 'name': 'lab'}, {'id': 5, 'name': 'lab'}]).encode())
+        waits = []
+        for status in statuses:
+            response = mock.Mock(status_code=200)
+            response.json.return_value = {'id': 5, 'name': 'lab',
+                                          'status': status}
+            waits.append(response)
+        return [listing]+waits
+
+    def test_waits_for_status_changes(self):
+        with mock.patch('requests.Session.get',
+                        side_effect=self.responses('Created', 'Pending', 'Running')) as get:
+            self.assertTrue(stackn.wait_app('lab', timeout=60))
+        calls = get.call_args_list[1:]
+        self.assertEqual(calls[0][0][0], self.url+'5/wait/')
+        self.assertEqual([call[1]['params'].get('since') for call in calls],
+                         [None, 'Created', 'Pending'])
+
+    def test_failed_status_and_timeout(self):
+        with mock.patch('requests.Session.get',
+                        side_effect=self.responses('Pending', 'Failed')):
+            self.assertFalse(stackn.wait_app('lab', timeout=60))
+        with mock.patch('requests.Session.get',
+                        side_effect=self.responses('Pending', 'Pending')):
+            self.assertFalse(stackn.wait_app('lab', status='Running,Succeeded',
+                                             timeout=0))
+
+    @mock.patch('time.sleep')
+    def test_retries_when_studio_is_busy(self, sleep):
+        busy = mock.Mock(status_code=429, headers={'Retry-After': '2'})
+        listing, running = self.responses('Running')
+        with mock.patch('requests.Session.get',
+                        side_effect=[listing, busy, running]):
+            self.assertTrue(stackn.wait_app('lab', timeout=60))
+        sleep.assert_called_once_with(2.0)
+
+
+class CLIStartupTests(TestCase):
+    # Libraries that only commands talking to Studio or S3 should load.
+    HEAVY = ('requests', 'urllib3', 'minio', 'prettytable', 'pkg_resources')
+
+    def run_cli(self, *args):
+        script = ('import sys\n'
+                  'from stackn.main import main\n'
+                  'try:\n'
+                  '    main({!r})\n'
+                  'except SystemExit:\n'
+                  '    pass\n'
+                  'print(sorted(m for m in {!r} if m in sys.modules))\n').format(
+                      list(args), self.HEAVY)
+        config_path = os.path.dirname(os.path.realpath(__file__))
+        env = dict(os.environ,
+                   STACKN_CONFIG_PATH=config_path,
+                   STACKN_CONFIG_FILE='test_config.json')
+        out = subprocess.run([sys.executable, '-c', script], env=env,
+                             stdout=subprocess.PIPE, check=True,
+                             cwd=os.path.dirname(os.path.dirname(
+                                 os.path.realpath(__file__))))
+        return out.stdout.decode().strip().splitlines()
+
+    def test_help_is_lazy(self):
+        out = self.run_cli('--help')
+        self.assertEqual(out[-1], '[]')
+        for command in ('create', 'delete', 'get', 'login', 'search', 'set', 'wait'):
+            self.assertTrue(any(line.split()[:1] == [command] for line in out))
+
+    def test_get_current_is_lazy(self):
+        self.assertEqual(self.run_cli('get', 'current')[-1], '[]')
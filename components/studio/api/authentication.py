@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+
+def token_expires_in(token):
+    """
+    Seconds until token expires, None if tokens do not expire
+    (settings.API_TOKEN_TTL is None).
+    """
+    if settings.API_TOKEN_TTL is None:
+        return None
+    expires = token.created+timedelta(seconds=settings.API_TOKEN_TTL)
+    return max(0, int((expires-timezone.now()).total_seconds()))
+
+
+def token_expired(token):
+    return token_expires_in(token) == 0
+
+
+class ExpiringTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that rejects tokens issued or refreshed more
+    than settings.API_TOKEN_TTL seconds ago.
+    """
+
+    def authenticate_credentials(self, key):
+        user, token = super().authenticate_credentials(key)
+        if token_expired(token):
+            raise AuthenticationFailed('Token has expired.')
+        return user, token
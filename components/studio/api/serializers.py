@@ -7,20 +7,35 @@ from projects.models import (S3, Environment, Flavor, MLFlow, Project,
                              ProjectTemplate, ReleaseName)
 
 
-class MLModelSerializer(ModelSerializer):
+class ProjectionModelSerializer(ModelSerializer):
+    """
+    Takes an optional fields argument and drops every field that is not in it.
+    Unknown field names are ignored.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class MLModelSerializer(ProjectionModelSerializer):
     class Meta:
         model = Model
         fields = (
-            'id', 'uid', 'name', 'description', 'model_card', 'resource', 'url', 'uploaded_at', 'project', 'status', 'version', 'object_type')
+            'id', 'uid', 'name', 'description', 'model_card', 'resource', 'url', 'uploaded_at', 'project', 'status', 'version', 'object_type',
+            'bucket', 'content_hash', 'manifest')
 
 
-class ObjectTypeSerializer(ModelSerializer):
+class ObjectTypeSerializer(ProjectionModelSerializer):
     class Meta:
         model = ObjectType
         fields = ('id', 'name', 'slug')
 
 
-class ModelLogSerializer(ModelSerializer):
+class ModelLogSerializer(ProjectionModelSerializer):
     class Meta:
         model = ModelLog
         fields = (
@@ -28,20 +43,20 @@ class ModelLogSerializer(ModelSerializer):
             'current_git_repo', 'latest_git_commit', 'system_details', 'cpu_details', 'training_status')
 
 
-class MetadataSerializer(ModelSerializer):
+class MetadataSerializer(ProjectionModelSerializer):
     class Meta:
         model = Metadata
         fields = (
             'id', 'run_id', 'trained_model', 'project', 'model_details', 'parameters', 'metrics')
 
 
-class S3serializer(ModelSerializer):
+class S3serializer(ProjectionModelSerializer):
     class Meta:
         model = S3
         fields = ('name', 'access_key', 'secret_key', 'host', 'region')
 
 
-class MLflowSerializer(ModelSerializer):
+class MLflowSerializer(ProjectionModelSerializer):
     s3 = S3serializer()
 
     class Meta:
@@ -49,7 +64,7 @@ class MLflowSerializer(ModelSerializer):
         fields = ('name', 'mlflow_url', 's3')
 
 
-class ProjectSerializer(ModelSerializer):
+class ProjectSerializer(ProjectionModelSerializer):
     s3storage = S3serializer()
 
     class Meta:
@@ -66,7 +81,7 @@ class AppCategorySerializer(ModelSerializer):
         fields = ('name', )
 
 
-class AppSerializer(ModelSerializer):
+class AppSerializer(ProjectionModelSerializer):
     category = AppCategorySerializer()
 
     class Meta:
@@ -80,7 +95,7 @@ class AppStatusSerializer(ModelSerializer):
         fields = ('id', 'status_type')
 
 
-class AppInstanceSerializer(ModelSerializer):
+class AppInstanceSerializer(ProjectionModelSerializer):
     app = AppSerializer()
     status = AppStatusSerializer(many=True)
 
@@ -89,19 +104,19 @@ class AppInstanceSerializer(ModelSerializer):
         fields = ('id', 'name', 'app', 'table_field', 'state', 'status')
 
 
-class UserSerializer(ModelSerializer):
+class UserSerializer(ProjectionModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username']
 
 
-class FlavorsSerializer(ModelSerializer):
+class FlavorsSerializer(ProjectionModelSerializer):
     class Meta:
         model = Flavor
         fields = '__all__'
 
 
-class EnvironmentSerializer(ModelSerializer):
+class EnvironmentSerializer(ProjectionModelSerializer):
     app = AppSerializer()
 
     class Meta:
@@ -109,7 +124,7 @@ class EnvironmentSerializer(ModelSerializer):
         fields = '__all__'
 
 
-class ReleaseNameSerializer(ModelSerializer):
+class ReleaseNameSerializer(ProjectionModelSerializer):
     app = AppInstanceSerializer()
 
     class Meta:
@@ -117,7 +132,7 @@ class ReleaseNameSerializer(ModelSerializer):
         fields = '__all__'
 
 
-class ProjectTemplateSerializer(ModelSerializer):
+class ProjectTemplateSerializer(ProjectionModelSerializer):
     class Meta:
         model = ProjectTemplate
         fields = '__all__'
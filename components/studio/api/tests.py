@@ -1,3 +1,359 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from apps.models import AppInstance, Apps, AppStatus
+from models.models import Metadata, MetricValue, Model, ModelLog
+from projects.models import Flavor, Project
+
+
+class BulkIngestionTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('foo', 'foo@test.com', 'bar')
+        self.project = Project.objects.create_project(
+            name='test-bulk',
+            owner=user,
+            description='',
+            repository=''
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+
+    def test_metadata_bulk_json_list(self):
+        """
+        Test that a JSON list is written in one request and upserted on rerun
+        """
+        url = reverse('api:metadata-bulk',
+                      kwargs={'project_pk': self.project.pk})
+        records = [{'run_id': 'run{}'.format(i),
+                    'trained_model': 'mnist:1.0',
+                    'parameters': "{'epochs': 5}",
+                    'metrics': {'accuracy': i/10}}
+                   for i in range(10)]
+        response = self.client.post(url, records, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'created': 10, 'updated': 0})
+        self.assertEqual(Metadata.objects.filter(
+            project='test-bulk').count(), 10)
+        self.assertEqual(MetricValue.objects.filter(
+            key='accuracy').count(), 10)
+
+        records[0]['metrics'] = {'accuracy': 1.0}
+        response = self.client.post(url, records[:1], format='json')
+        self.assertEqual(response.json(), {'created': 0, 'updated': 1})
+        self.assertEqual(MetricValue.objects.get(run_id='run0').value, 1.0)
+
+    def test_modellog_bulk_ndjson(self):
+        """
+        Test that NDJSON bodies are accepted and malformed records rejected
+        """
+        url = reverse('api:modellog-bulk',
+                      kwargs={'project_pk': self.project.pk})
+        lines = [json.dumps({'run_id': 'run{}'.format(i),
+                             'trained_model': 'mnist:1.0',
+                             'training_status': 'DO'})
+                 for i in range(3)]
+        response = self.client.post(url, '\n'.join(lines) + '\n',
+                                    content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ModelLog.objects.filter(
+            project='test-bulk', training_status='DO').count(), 3)
+
+        response = self.client.post(url, [{'run_id': 'run9'}], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_does_not_touch_other_projects(self):
+        """
+        Test that keys of another project are rejected, not overwritten
+        """
+        Metadata.objects.create(run_id='run0', trained_model='mnist:1.0',
+                                project='other', metrics='{}')
+        url = reverse('api:metadata-bulk',
+                      kwargs={'project_pk': self.project.pk})
+        records = [{'run_id': 'run0', 'trained_model': 'mnist:1.0',
+                    'metrics': {'accuracy': 0.5}}]
+        response = self.client.post(url, records, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Metadata.objects.get(run_id='run0').metrics, '{}')
+
+        records = [{'run_id': 'r' * 33, 'trained_model': 'mnist:1.0'}]
+        response = self.client.post(url, records, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_rejects_values_that_do_not_fit(self):
+        """
+        Test that oversized or unknown values answer 400 and write nothing
+        """
+        url = reverse('api:modellog-bulk',
+                      kwargs={'project_pk': self.project.pk})
+        for extra in [{'trained_model': 'm' * 33},
+                      {'training_status': 'XX'},
+                      {'execution_time': 't' * 256}]:
+            record = {'run_id': 'run0', 'trained_model': 'mnist:1.0'}
+            record.update(extra)
+            response = self.client.post(url, [record], format='json')
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(ModelLog.objects.exists())
+
+    def test_bulk_counts_rows_inserted_concurrently(self):
+        """
+        Test that rows a concurrent request inserted are updated, not created
+        """
+        url = reverse('api:modellog-bulk',
+                      kwargs={'project_pk': self.project.pk})
+        bulk_create = ModelLog.objects.bulk_create
+
+        def racing_bulk_create(objs, **kwargs):
+            ModelLog.objects.create(run_id='run0', trained_model='mnist:1.0',
+                                    project='test-bulk', training_status='ST')
+            return bulk_create(objs, **kwargs)
+
+        records = [{'run_id': 'run{}'.format(i), 'trained_model': 'mnist:1.0',
+                    'training_status': 'DO'} for i in range(2)]
+        with mock.patch.object(ModelLog.objects, 'bulk_create',
+                               side_effect=racing_bulk_create):
+            response = self.client.post(url, records, format='json')
+        self.assertEqual(response.json(), {'created': 1, 'updated': 1})
+        self.assertEqual(ModelLog.objects.filter(
+            project='test-bulk', training_status='DO').count(), 2)
+
+
+class PaginationTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('foo', 'foo@test.com', 'bar')
+        self.project = Project.objects.create_project(
+            name='test-pages',
+            owner=user,
+            description='',
+            repository=''
+        )
+        ModelLog.objects.bulk_create([
+            ModelLog(run_id='run{}'.format(i), trained_model='m:1.0',
+                     project=self.project.name)
+            for i in range(25)])
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+        self.url = reverse('api:modellog-list',
+                           kwargs={'project_pk': self.project.pk})
+
+    def test_plain_list_without_page_size(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 25)
+
+    def test_cursor_pages_with_projection(self):
+        """
+        Test that following next links visits every row once, in pk order
+        """
+        run_ids = []
+        url = self.url
+        params = {'page_size': 10, 'fields': 'id,run_id'}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            for item in page['results']:
+                self.assertEqual(set(item), {'id', 'run_id'})
+                run_ids.append(item['run_id'])
+            url, params = page['next'], None
+        self.assertEqual(run_ids, ['run{}'.format(i) for i in range(25)])
+
+
+class ConditionalListTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('foo', 'foo@test.com', 'bar')
+        self.project = Project.objects.create_project(
+            name='test-etag',
+            owner=user,
+            description='',
+            repository=''
+        )
+        self.flavor = Flavor.objects.create(name='small', project=self.project)
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+        self.url = reverse('api:flavors-list',
+                           kwargs={'project_pk': self.project.pk})
+
+    def test_list_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # A different query is a different representation.
+        response = self.client.get(
+            self.url, {'name': 'small'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        self.flavor.cpu_req = '500m'
+        self.flavor.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_project_list_not_modified(self):
+        url = reverse('api:project-list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['name'] for p in response.json()], ['test-etag'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+class SearchTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('foo', 'foo@test.com', 'bar')
+        other = User.objects.create_user('member', 'foo@test.com', 'bar')
+        project = Project.objects.create_project(
+            name='test-search',
+            owner=user,
+            description='Segmentation of satellite images',
+            repository=''
+        )
+        hidden = Project.objects.create_project(
+            name='test-hidden',
+            owner=other,
+            description='',
+            repository=''
+        )
+        Model.objects.create(uid='a', name='satellite-unet', project=project,
+                             description='Segments images')
+        Model.objects.create(uid='b', name='resnet', project=project,
+                             description='Classifies satellite images')
+        Model.objects.create(uid='c', name='satellite-private',
+                             project=hidden, access='PR')
+        app = Apps.objects.create(name='Jupyter', slug='jupyter',
+                                  description='Notebooks')
+        instance = AppInstance.objects.create(
+            name='lab', app=app, project=project, owner=user, access='project')
+        instance.tags.add('satellites')
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+        self.url = reverse('api:search-list')
+
+    def test_ranked_prefix_search(self):
+        response = self.client.get(self.url, {'q': 'satel'})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        # Name hits rank above description hits, other projects are hidden.
+        self.assertEqual([m['name'] for m in results['models']],
+                         ['satellite-unet', 'resnet'])
+        self.assertEqual([a['name'] for a in results['appinstances']],
+                         ['lab'])
+        self.assertEqual([p['name'] for p in results['projects']],
+                         ['test-search'])
+        self.assertEqual(results['apps'], [])
+
+    def test_index_follows_updates(self):
+        model = Model.objects.get(name='resnet')
+        model.description = 'Detects clouds'
+        model.save()
+        response = self.client.get(self.url, {'q': 'cloud', 'type': 'models'})
+        self.assertEqual([m['name'] for m in response.json()['models']],
+                         ['resnet'])
+        self.assertEqual(list(response.json()), ['models'])
+
+    def test_query_is_required(self):
+        response = self.client.get(self.url, {'q': '&|!'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(API_TOKEN_TTL=3600)
+class TokenExpiryTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('foo', 'foo@test.com', 'bar')
+        self.token = Token.objects.get(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token '+self.token.key)
+
+    def age(self, seconds):
+        Token.objects.filter(pk=self.token.pk).update(
+            created=timezone.now()-timedelta(seconds=seconds))
+
+    def test_login_reports_expiry(self):
+        response = APIClient().post(reverse('api:api_token_auth'),
+                                    {'username': 'foo', 'password': 'bar'})
+        self.assertEqual(response.json()['token'], self.token.key)
+        self.assertAlmostEqual(response.json()['expires_in'], 3600, delta=5)
+
+    def test_expired_token_is_rejected_and_replaced_on_login(self):
+        self.age(3601)
+        response = self.client.get(reverse('api:project-list'))
+        self.assertEqual(response.status_code, 401)
+        response = APIClient().post(reverse('api:api_token_auth'),
+                                    {'username': 'foo', 'password': 'bar'})
+        self.assertNotEqual(response.json()['token'], self.token.key)
+        self.assertFalse(Token.objects.filter(pk=self.token.pk).exists())
+
+    def test_refresh_keeps_key(self):
+        self.age(3000)
+        response = self.client.post(reverse('api:api_token_refresh'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['token'], self.token.key)
+        self.assertAlmostEqual(response.json()['expires_in'], 3600, delta=5)
+        self.age(3601)
+        response = self.client.post(reverse('api:api_token_refresh'))
+        self.assertEqual(response.status_code, 401)
+
+
+class AppStatusWaitTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('foo', 'foo@test.com', 'bar')
+        project = Project.objects.create_project(
+            name='test-wait', owner=user, description='', repository='')
+        app = Apps.objects.create(name='Jupyter', slug='jupyter')
+        self.instance = AppInstance.objects.create(
+            name='lab', app=app, project=project, owner=user,
+            state='Created')
+        self.url = reverse('api:appinstances-wait',
+                           kwargs={'project_pk': project.pk,
+                                   'pk': self.instance.pk})
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+
+    def test_current_status_without_since(self):
+        AppStatus.objects.create(appinstance=self.instance,
+                                 status_type='Pending')
+        response = self.client.get(self.url)
+        self.assertEqual(response.json(), {'id': self.instance.pk,
+                                           'name': 'lab',
+                                           'status': 'Pending'})
+
+    def test_answers_at_once_after_a_change(self):
+        AppStatus.objects.create(appinstance=self.instance,
+                                 status_type='Running')
+        response = self.client.get(self.url,
+                                   {'since': 'Pending', 'timeout': 30})
+        self.assertEqual(response.json()['status'], 'Running')
+
+    def test_times_out_with_unchanged_status(self):
+        response = self.client.get(self.url,
+                                   {'since': 'Created', 'timeout': 0.2})
+        self.assertEqual(response.json()['status'], 'Created')
+        response = self.client.get(self.url, {'timeout': 'soon'})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(APP_STATUS_WAITERS_MAX=0)
+    def test_waiters_are_capped(self):
+        response = self.client.get(self.url,
+                                   {'since': 'Created', 'timeout': 5})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '5')
+        # Reading the current status does not wait and is always served.
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_requires_project_access(self):
+        other = User.objects.create_user('baz', 'baz@test.com', 'bar')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
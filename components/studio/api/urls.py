@@ -8,7 +8,8 @@ from .public_views import get_studio_settings
 from .views import (AppInstanceList, AppList, CustomAuthToken, EnvironmentList,
                     FlavorsList, MembersList, MetadataList, MLflowList,
                     ModelList, ModelLogList, ObjectTypeList, ProjectList,
-                    ProjectTemplateList, ReleaseNameList, ResourceList, S3List)
+                    ProjectTemplateList, ReleaseNameList, ResourceList, S3List,
+                    SearchList, TokenRefresh, app_status_wait)
 
 app_name = 'api'
 
@@ -18,6 +19,7 @@ router.register(r'projects', ProjectList, basename='project')
 router.register(r'apps', AppList, basename='apps')
 router.register(r'projecttemplates', ProjectTemplateList,
                 basename='projecttemplates')
+router.register(r'search', SearchList, basename='search')
 
 models_router = routers.NestedSimpleRouter(
     router, r'projects', lookup='project')
@@ -39,9 +41,12 @@ models_router.register(r'metadata', MetadataList, basename='metadata')
 models_router.register(r'apps', AppList, basename='apps')
 
 urlpatterns = [
+    path('projects/<project_pk>/appinstances/<pk>/wait/', app_status_wait,
+         name='appinstances-wait'),
     path('', include(router_drf.urls)),
     path('', include(router.urls)),
     path('', include(models_router.urls)),
     path('token-auth/', CustomAuthToken.as_view(), name='api_token_auth'),
+    path('token-refresh/', TokenRefresh.as_view(), name='api_token_refresh'),
     path('settings/', get_studio_settings)
 ]
@@ -2,31 +2,43 @@ import json
 import random
 import uuid
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.files import File
+from django.db import transaction
 from django.db.models import Q
-from django.http import HttpRequest, HttpResponse
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.utils import timezone
 from django.utils.text import slugify
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics
 from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.decorators import action
 from rest_framework.mixins import (CreateModelMixin, ListModelMixin,
                                    RetrieveModelMixin, UpdateModelMixin)
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
 
+from apps.helpers import status_group_name, wait_for_status
 from apps.models import AppCategories, AppInstance, Apps
 from apps.tasks import delete_resource
-from models.models import ObjectType
+from common import search
+from common.helpers import (conditional_response, queryset_validators,
+                            set_validators)
+from models.models import ObjectType, index_metadata_metrics
 from portal.models import PublishedModel
 from projects.models import (S3, Environment, Flavor, MLFlow, ProjectLog,
                              ProjectTemplate, ReleaseName)
 from projects.tasks import create_resources_from_template, delete_project_apps
 
 from .APIpermissions import AdminPermission, ProjectPermission
+from .authentication import token_expired, token_expires_in
+from .parsers import NDJSONParser
 from .serializers import (AppInstanceSerializer, AppSerializer,
                           EnvironmentSerializer, FlavorsSerializer, Metadata,
                           MetadataSerializer, MLflowSerializer,
@@ -36,6 +48,159 @@ from .serializers import (AppInstanceSerializer, AppSerializer,
                           ReleaseNameSerializer, S3serializer, UserSerializer)
 
 
+class FieldsProjectionMixin:
+    """
+    Lets clients ask for a subset of the serialized fields on reads
+    with ?fields=name,version.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.request.query_params.get('fields')
+        if fields and self.request.method == 'GET':
+            kwargs['fields'] = [f.strip()
+                                for f in fields.split(',') if f.strip()]
+        return super().get_serializer(*args, **kwargs)
+
+
+class ConditionalListMixin:
+    """
+    Answers list requests with ETag/Last-Modified and 304 Not Modified when
+    nothing in the filtered queryset changed. Views opt in by naming the
+    timestamp fields (possibly across relations) that cover what their
+    serializer renders.
+    """
+    last_modified_fields = None
+
+    def list(self, request, *args, **kwargs):
+        if not self.last_modified_fields:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        etag, last_modified = queryset_validators(
+            queryset, self.last_modified_fields,
+            request.get_full_path(), request.user.pk)
+        not_modified = conditional_response(request, etag, last_modified)
+        if not_modified:
+            return set_validators(not_modified, etag, last_modified)
+
+        response = super().list(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
+
+
+# Upper limit on records accepted by a single bulk request.
+BULK_MAX_RECORDS = 5000
+
+
+def _check_bulk_value(model_class, i, field, value):
+    """
+    Raises ValueError if value does not fit the column, the database would
+    otherwise reject the whole batch with a DataError.
+    """
+    model_field = model_class._meta.get_field(field)
+    if model_field.max_length and len(value) > model_field.max_length:
+        raise ValueError('Record {} has a {} longer than {} characters.'
+                         .format(i, field, model_field.max_length))
+    if model_field.choices and value not in dict(model_field.choices):
+        raise ValueError('Record {} has an invalid {} {!r}.'.format(
+            i, field, value))
+
+
+def _bulk_upsert_runs(model_class, project_name, records, fields):
+    """
+    Writes a batch of per-run records keyed on (run_id, trained_model).
+
+    New rows are inserted with bulk_create, rows that already exist are
+    updated in place with the fields present in the record. Duplicates
+    within the batch are collapsed, the last record wins. (run_id,
+    trained_model) is unique across projects, keys that belong to
+    another project are rejected rather than updated.
+    Returns (created, updated) or raises ValueError on malformed input.
+    """
+    if not isinstance(records, list):
+        raise ValueError('Expected a list of records.')
+    if len(records) > BULK_MAX_RECORDS:
+        raise ValueError('Too many records, at most {} per request.'.format(
+            BULK_MAX_RECORDS))
+
+    batch = dict()
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            raise ValueError('Record {} is not an object.'.format(i))
+        try:
+            key = (str(record['run_id']), str(record['trained_model']))
+        except KeyError:
+            raise ValueError(
+                'Record {} is missing run_id or trained_model.'.format(i))
+        # All per-run fields are text columns, structured values such as
+        # metric dicts are stored in their repr form like the single endpoints.
+        values = {f: record[f] if isinstance(record[f], str) else str(record[f])
+                  for f in fields if f in record}
+        _check_bulk_value(model_class, i, 'run_id', key[0])
+        _check_bulk_value(model_class, i, 'trained_model', key[1])
+        for field, value in values.items():
+            _check_bulk_value(model_class, i, field, value)
+        batch.setdefault(key, dict()).update(values)
+
+    if not batch:
+        return [], []
+
+    run_ids = {run_id for run_id, _ in batch}
+    trained_models = {trained_model for _, trained_model in batch}
+
+    def _lock_rows(keys):
+        if not keys:
+            return dict()
+        rows = model_class.objects.select_for_update().filter(
+            project=project_name, run_id__in={run_id for run_id, _ in keys},
+            trained_model__in={trained_model for _, trained_model in keys})
+        return {(obj.run_id, obj.trained_model): obj for obj in rows
+                if (obj.run_id, obj.trained_model) in keys}
+
+    with transaction.atomic():
+        others = model_class.objects.filter(
+            run_id__in=run_ids, trained_model__in=trained_models).exclude(
+            project=project_name)
+        taken = sorted(key for key in others.values_list('run_id', 'trained_model')
+                       if key in batch)
+        if taken:
+            raise ValueError('run_id {} of {} is used by another project.'.format(
+                *taken[0]))
+        existing = _lock_rows(batch)
+
+        to_update = []
+        update_fields = set()
+        for key, obj in existing.items():
+            for field, value in batch[key].items():
+                setattr(obj, field, value)
+                update_fields.add(field)
+            to_update.append(obj)
+
+        new_keys = {key for key in batch if key not in existing}
+        # ignore_conflicts covers rows inserted concurrently by another
+        # request, which are dropped silently. The rows are read back so
+        # only those that exist are reported, and rows that a concurrent
+        # request inserted with other values are updated like the rest.
+        model_class.objects.bulk_create(
+            [model_class(run_id=key[0], trained_model=key[1],
+                         project=project_name, **batch[key])
+             for key in new_keys],
+            batch_size=500, ignore_conflicts=True)
+        created = []
+        for key, obj in _lock_rows(new_keys).items():
+            changed = [field for field, value in batch[key].items()
+                       if getattr(obj, field) != value]
+            for field in changed:
+                setattr(obj, field, batch[key][field])
+            update_fields.update(changed)
+            (to_update if changed else created).append(obj)
+
+        if to_update and update_fields:
+            model_class.objects.bulk_update(
+                to_update, sorted(update_fields), batch_size=500)
+
+    return created, to_update
+
+
 # A customized version of the obtain_auth_token view
 # It will either create or fetch the user token
 # https://www.django-rest-framework.org/api-guide/authentication/#tokenauthentication
@@ -47,14 +212,41 @@ class CustomAuthToken(ObtainAuthToken):
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
         token, created = Token.objects.get_or_create(user=user)
+        if token_expired(token):
+            # Concurrent logins may replace the expired token at the same
+            # time, the one that loses the race gets the winner's token.
+            with transaction.atomic():
+                Token.objects.filter(pk=token.pk).delete()
+                token, created = Token.objects.get_or_create(user=user)
         return Response({
             'token': token.key,
             'user_id': user.pk,
-            'email': user.email
+            'email': user.email,
+            'expires_in': token_expires_in(token)
+        })
+
+
+class TokenRefresh(APIView):
+    """
+    Extends the lifetime of the token the request is authenticated with
+    (see settings.API_TOKEN_TTL). The key does not change, so clients
+    that share it keep working.
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        if not isinstance(request.auth, Token):
+            return Response({'detail': 'Only API tokens can be refreshed.'},
+                            status=400)
+        Token.objects.filter(pk=request.auth.pk).update(created=timezone.now())
+        token = Token.objects.get(pk=request.auth.pk)
+        return Response({
+            'token': token.key,
+            'expires_in': token_expires_in(token)
         })
 
 
-class ObjectTypeList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin):
+class ObjectTypeList(FieldsProjectionMixin, GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin):
     permission_classes = (IsAuthenticated, ProjectPermission,)
     serializer_class = ObjectTypeSerializer
     filter_backends = [DjangoFilterBackend]
@@ -64,7 +256,7 @@ class ObjectTypeList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, Updat
         return ObjectType.objects.all()
 
 
-class ModelList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin):
+class ModelList(FieldsProjectionMixin, GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin):
     permission_classes = (IsAuthenticated, ProjectPermission,)
     serializer_class = MLModelSerializer
     filter_backends = [DjangoFilterBackend]
@@ -75,7 +267,7 @@ class ModelList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateMode
         This view should return a list of all the models
         for the currently authenticated user.
         """
-        return Model.objects.filter(project__pk=self.kwargs['project_pk'])
+        return Model.objects.filter(project__pk=self.kwargs['project_pk']).prefetch_related('object_type')
 
     def destroy(self, request, *args, **kwargs):
         project = Project.objects.get(id=self.kwargs['project_pk'])
@@ -108,6 +300,13 @@ class ModelList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateMode
             model_card = request.data['model_card']
             model_uid = request.data['uid']
             object_type_slug = request.data['object_type']
+            manifest = request.data.get('manifest')
+            if manifest:
+                from models.helpers import content_key, validate_manifest
+                validate_manifest(manifest)
+                # Content addressed uids are shared, they must name the bytes.
+                if model_uid != content_key(manifest['hash']):
+                    raise ValueError('uid does not match the manifest hash.')
             # if 'image' not in request.FILES:
             #     img = settings.STATIC_ROOT+'images/patterns/image-{}.png'.format(random.randrange(8,13))
             #     img_file = open(img, 'rb')
@@ -117,7 +316,7 @@ class ModelList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateMode
             object_type = ObjectType.objects.get(slug=object_type_slug)
         except Exception as err:
             print(err)
-            return HttpResponse('Failed to create object: incorrect input data.', 400)
+            return HttpResponse('Failed to create object: incorrect input data.', status=400)
 
         try:
             new_model = Model(uid=model_uid,
@@ -128,7 +327,9 @@ class ModelList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateMode
                               model_card=model_card,
                               project=project,
                               s3=project.s3storage,
-                              access=access)
+                              access=access,
+                              content_hash=manifest['hash'] if manifest else '',
+                              manifest=manifest or None)
             new_model.save()
             img_uid = str(uuid.uuid1().hex)
             # new_model.model_card_headline.save(img_uid, image)
@@ -148,17 +349,34 @@ class ModelList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateMode
             return HttpResponse('Failed to create object: failed to save object.', 400)
         return HttpResponse('ok', 200)
 
+    @action(detail=False, methods=['get'])
+    def chunks(self, request, *args, **kwargs):
+        """
+        The artifacts and chunks already stored for models of the project
+        (of the model ?name= only, if given), so that clients upload only
+        what is missing. See models.helpers.known_artifacts.
+        """
+        from models.helpers import known_artifacts
+        project = Project.objects.get(id=self.kwargs['project_pk'])
+        models = Model.objects.filter(project=project, s3=project.s3storage,
+                                      manifest__isnull=False)
+        if request.query_params.get('name'):
+            models = models.filter(name=request.query_params['name'])
+        objects, chunks = known_artifacts(
+            models.only('uid', 'bucket', 'manifest').order_by('-pk'))
+        return Response({'objects': objects, 'chunks': chunks})
 
-class ModelLogList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin):
+
+class ModelLogList(FieldsProjectionMixin, GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin):
     permission_classes = (IsAuthenticated, ProjectPermission,)
     serializer_class = ModelLogSerializer
     filter_backends = [DjangoFilterBackend]
     #filterset_fields = ['id','name', 'version']
 
-    # Not sure if this kind of function is needed for ModelLog?
     def get_queryset(self):
-
-        return ModelLog.objects.filter(project__pk=self.kwargs['project_pk'])
+        # ModelLog stores the project name, not a foreign key.
+        project = Project.objects.filter(pk=self.kwargs['project_pk'])
+        return ModelLog.objects.filter(project__in=project.values('name'))
 
     def create(self, request, *args, **kwargs):
         project = Project.objects.get(id=self.kwargs['project_pk'])
@@ -183,13 +401,34 @@ class ModelLogList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateM
         new_log.save()
         return HttpResponse('ok', 200)
 
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request, *args, **kwargs):
+        """
+        Creates or updates many training session logs in one request.
+        Accepts a JSON list or NDJSON (application/x-ndjson).
+        """
+        project = Project.objects.only('name').get(
+            id=self.kwargs['project_pk'])
+        fields = ['training_started_at', 'execution_time', 'code_version', 'current_git_repo',
+                  'latest_git_commit', 'system_details', 'cpu_details', 'training_status']
+        try:
+            created, updated = _bulk_upsert_runs(
+                ModelLog, project.name, request.data, fields)
+        except ValueError as err:
+            return Response({'detail': str(err)}, status=400)
+        return Response({'created': len(created), 'updated': len(updated)})
+
 
-class MetadataList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin):
+class MetadataList(FieldsProjectionMixin, GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin):
     permission_classes = (IsAuthenticated, ProjectPermission,)
     serializer_class = MetadataSerializer
     filter_backends = [DjangoFilterBackend]
     #filterset_fields = ['id','name', 'version']
 
+    def get_queryset(self):
+        project = Project.objects.filter(pk=self.kwargs['project_pk'])
+        return Metadata.objects.filter(project__in=project.values('name'))
+
     def create(self, request, *args, **kwargs):
         project = Project.objects.get(id=self.kwargs['project_pk'])
 
@@ -207,8 +446,28 @@ class MetadataList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateM
         new_md.save()
         return HttpResponse('ok', 200)
 
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request, *args, **kwargs):
+        """
+        Creates or updates many metadata records in one request.
+        Accepts a JSON list or NDJSON (application/x-ndjson).
+        """
+        project = Project.objects.only('name').get(
+            id=self.kwargs['project_pk'])
+        fields = ['model_details', 'parameters', 'metrics']
+        try:
+            created, updated = _bulk_upsert_runs(
+                Metadata, project.name, request.data, fields)
+        except ValueError as err:
+            return Response({'detail': str(err)}, status=400)
+
+        # bulk_create and bulk_update bypass the post_save signal, so the
+        # metric rows are rebuilt here.
+        index_metadata_metrics(created + updated)
+        return Response({'created': len(created), 'updated': len(updated)})
+
 
-class MembersList(generics.ListAPIView, GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin,
+class MembersList(FieldsProjectionMixin, generics.ListAPIView, GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin,
                   ListModelMixin):
     permission_classes = (IsAuthenticated, ProjectPermission, )
     serializer_class = UserSerializer
@@ -219,20 +478,9 @@ class MembersList(generics.ListAPIView, GenericViewSet, CreateModelMixin, Retrie
         This view should return a list of all the members
         of the project
         """
-        proj = Project.objects.filter(pk=self.kwargs['project_pk'])
-        owner = proj[0].owner
-        auth_users = proj[0].authorized.all()
-        print(owner)
-        print(auth_users)
-        ids = set()
-        ids.add(owner.pk)
-        for user in auth_users:
-            ids.add(user.pk)
-        # return [owner, authorized]
-        print(ids)
-        users = User.objects.filter(pk__in=ids)
-        print(users)
-        return users
+        project = Project.objects.filter(pk=self.kwargs['project_pk'])
+        return User.objects.filter(Q(pk__in=project.values('owner')) |
+                                   Q(pk__in=project.values('authorized')))
 
     def create(self, request, *args, **kwargs):
         project = Project.objects.get(id=self.kwargs['project_pk'])
@@ -255,6 +503,8 @@ class MembersList(generics.ListAPIView, GenericViewSet, CreateModelMixin, Retrie
         if user.username != project.owner.username:
             print('username'+user.username)
             project.authorized.remove(user)
+            # Bump updated_at so cached project listings are revalidated.
+            project.save()
             for role in settings.PROJECT_ROLES:
                 return HttpResponse('Successfully removed members.', status=200)
         else:
@@ -262,12 +512,15 @@ class MembersList(generics.ListAPIView, GenericViewSet, CreateModelMixin, Retrie
         return HttpResponse('Failed to remove user.', status=400)
 
 
-class ProjectList(generics.ListAPIView, GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin,
+class ProjectList(ConditionalListMixin, FieldsProjectionMixin, generics.ListAPIView, GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin,
                   ListModelMixin):
     permission_classes = (IsAuthenticated,)
     serializer_class = ProjectSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['name', 'slug']
+    last_modified_fields = ('updated_at', 's3storage__updated_at')
+    # distinct('name') below requires the ordering to start with name.
+    cursor_ordering = 'name'
 
     def get_queryset(self):
         """
@@ -275,7 +528,7 @@ class ProjectList(generics.ListAPIView, GenericViewSet, CreateModelMixin, Retrie
         for the currently authenticated user.
         """
         current_user = self.request.user
-        return Project.objects.filter(Q(owner__username=current_user) | Q(authorized__pk__exact=current_user.pk), ~Q(status='archived')).distinct('name')
+        return Project.objects.filter(Q(owner__username=current_user) | Q(authorized__pk__exact=current_user.pk), ~Q(status='archived')).distinct('name').select_related('s3storage').prefetch_related('authorized')
 
     def destroy(self, request, *args, **kwargs):
         project = self.get_object()
@@ -343,14 +596,16 @@ class ProjectList(generics.ListAPIView, GenericViewSet, CreateModelMixin, Retrie
             return HttpResponse(project.slug, status=200)
 
 
-class ResourceList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin):
+class ResourceList(ConditionalListMixin, FieldsProjectionMixin, GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin):
     permission_classes = (IsAuthenticated, ProjectPermission,)
     serializer_class = AppInstanceSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['id', 'name', 'app__category']
+    last_modified_fields = ('updated_on', 'status__time', 'app__updated_on')
 
-    # def get_queryset(self):
-    #     return AppInstance.objects.filter(~Q(state="Deleted"), project__pk=self.kwargs['project_pk'])
+    def get_queryset(self):
+        return AppInstance.objects.filter(~Q(state="Deleted"), project__pk=self.kwargs['project_pk']).select_related(
+            'app__category').prefetch_related('status')
 
     def create(self, request, *args, **kwargs):
         template = request.data
@@ -364,14 +619,16 @@ class ResourceList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateM
         return HttpResponse("Submitted request to create app.", status=200)
 
 
-class AppInstanceList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin):
+class AppInstanceList(ConditionalListMixin, FieldsProjectionMixin, GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin):
     permission_classes = (IsAuthenticated, ProjectPermission,)
     serializer_class = AppInstanceSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['id', 'name', 'app__category']
+    last_modified_fields = ('updated_on', 'status__time', 'app__updated_on')
 
     def get_queryset(self):
-        return AppInstance.objects.filter(~Q(state="Deleted"), project__pk=self.kwargs['project_pk'])
+        return AppInstance.objects.filter(~Q(state="Deleted"), project__pk=self.kwargs['project_pk']).select_related(
+            'app__category').prefetch_related('status')
 
     def create(self, request, *args, **kwargs):
         project = Project.objects.get(id=self.kwargs['project_pk'])
@@ -409,11 +666,74 @@ class AppInstanceList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, Upda
         return HttpResponse("Deleted app.", status=200)
 
 
-class FlavorsList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin):
+# App status waits in progress in this process, see app_status_wait.
+_status_waiters = 0
+
+
+def _get_wait_target(request, project_pk, pk):
+    """
+    Authenticates request and looks up the app instance with the
+    permission checks of the AppInstanceList routes. Returns the app
+    instance and its status group, or an error response.
+    """
+    view = AppInstanceList(action_map={'get': 'wait'}, args=(),
+                           kwargs={'project_pk': project_pk, 'pk': pk})
+    view.request = request = view.initialize_request(request)
+    view.headers = view.default_response_headers
+    try:
+        view.initial(request, project_pk=project_pk, pk=pk)
+        appinstance = view.get_object()
+    except Exception as exc:
+        response = view.finalize_response(request, view.handle_exception(exc))
+        return None, None, response.render()
+    return appinstance, status_group_name(appinstance.project.slug), None
+
+
+async def app_status_wait(request, project_pk, pk):
+    """
+    Long poll for the status of an app, GET appinstances/<id>/wait/.
+    Answers as soon as the status differs from ?since= (at once without
+    it), otherwise with the current status after ?timeout= seconds, at
+    most settings.APP_STATUS_WAIT_MAX.
+
+    The view is async so a waiting client holds no worker thread when
+    Studio is served by its ASGI application. At most
+    settings.APP_STATUS_WAITERS_MAX waits run per process, further
+    requests are answered with 429 and Retry-After.
+    """
+    global _status_waiters
+
+    appinstance, group, response = await sync_to_async(_get_wait_target)(
+        request, project_pk, pk)
+    if response is not None:
+        return response
+    try:
+        timeout = float(request.GET.get('timeout',
+                                        settings.APP_STATUS_WAIT_MAX))
+    except ValueError:
+        return JsonResponse({'detail': 'timeout must be a number.'}, status=400)
+    timeout = max(0, min(timeout, settings.APP_STATUS_WAIT_MAX))
+    since = request.GET.get('since')
+
+    waits = since is not None and timeout > 0
+    if waits and _status_waiters >= settings.APP_STATUS_WAITERS_MAX:
+        return JsonResponse({'detail': 'Too many status waits, retry later.'},
+                            status=429, headers={'Retry-After': '5'})
+    _status_waiters += 1
+    try:
+        status = await wait_for_status(appinstance, group, since, timeout)
+    finally:
+        _status_waiters -= 1
+    return JsonResponse({'id': appinstance.pk, 'name': appinstance.name,
+                         'status': status})
+
+
+class FlavorsList(ConditionalListMixin, FieldsProjectionMixin, GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin):
     permission_classes = (IsAuthenticated, ProjectPermission,)
     serializer_class = FlavorsSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['id', 'name']
+    last_modified_fields = ('updated_at',)
 
     def get_queryset(self):
         return Flavor.objects.filter(project__pk=self.kwargs['project_pk'])
@@ -427,14 +747,15 @@ class FlavorsList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateMo
         return HttpResponse("Deleted object.", status=200)
 
 
-class EnvironmentList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin):
+class EnvironmentList(ConditionalListMixin, FieldsProjectionMixin, GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin):
     permission_classes = (IsAuthenticated, ProjectPermission,)
     serializer_class = EnvironmentSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['id', 'name']
+    last_modified_fields = ('updated_at', 'app__updated_on')
 
     def get_queryset(self):
-        return Environment.objects.filter(project__pk=self.kwargs['project_pk'])
+        return Environment.objects.filter(project__pk=self.kwargs['project_pk']).select_related('app__category')
 
     def destroy(self, request, *args, **kwargs):
         try:
@@ -445,11 +766,12 @@ class EnvironmentList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, Upda
         return HttpResponse("Deleted object.", status=200)
 
 
-class S3List(GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin):
+class S3List(ConditionalListMixin, FieldsProjectionMixin, GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin):
     permission_classes = (IsAuthenticated, ProjectPermission,)
     serializer_class = S3serializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['id', 'name', 'host', 'region']
+    last_modified_fields = ('updated_at',)
 
     def get_queryset(self):
         return S3.objects.filter(project__pk=self.kwargs['project_pk'])
@@ -463,14 +785,15 @@ class S3List(GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMi
         return HttpResponse("Deleted object.", status=200)
 
 
-class MLflowList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin):
+class MLflowList(ConditionalListMixin, FieldsProjectionMixin, GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin):
     permission_classes = (IsAuthenticated, ProjectPermission,)
     serializer_class = MLflowSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['id', 'name']
+    last_modified_fields = ('updated_at', 's3__updated_at')
 
     def get_queryset(self):
-        return MLFlow.objects.filter(project__pk=self.kwargs['project_pk'])
+        return MLFlow.objects.filter(project__pk=self.kwargs['project_pk']).select_related('s3')
 
     def destroy(self, request, *args, **kwargs):
         try:
@@ -481,14 +804,15 @@ class MLflowList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateMod
         return HttpResponse("Deleted object.", status=200)
 
 
-class ReleaseNameList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin):
+class ReleaseNameList(FieldsProjectionMixin, GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, ListModelMixin):
     permission_classes = (IsAuthenticated, ProjectPermission,)
     serializer_class = ReleaseNameSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['id', 'name', 'project']
 
     def get_queryset(self):
-        return ReleaseName.objects.filter(project__pk=self.kwargs['project_pk'])
+        return ReleaseName.objects.filter(project__pk=self.kwargs['project_pk']).select_related(
+            'app__app__category').prefetch_related('app__status')
 
     def create(self, request, *args, **kwargs):
         name = slugify(request.data['name'])
@@ -520,15 +844,16 @@ class ReleaseNameList(GenericViewSet, CreateModelMixin, RetrieveModelMixin, Upda
 #         return HttpResponse("Admin endpoints.", status=200)
 
 
-class AppList(generics.ListAPIView, GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin,
+class AppList(ConditionalListMixin, FieldsProjectionMixin, generics.ListAPIView, GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin,
               ListModelMixin):
     permission_classes = (IsAuthenticated, AdminPermission,)
     serializer_class = AppSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['id', 'name', 'slug', 'category']
+    last_modified_fields = ('updated_on',)
 
     def get_queryset(self):
-        return Apps.objects.all()
+        return Apps.objects.all().select_related('category')
 
     def create(self, request, *args, **kwargs):
         print("IN CREATE")
@@ -598,7 +923,7 @@ class AppList(generics.ListAPIView, GenericViewSet, CreateModelMixin, RetrieveMo
         return HttpResponse("Deleted object.", status=200)
 
 
-class ProjectTemplateList(generics.ListAPIView, GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin,
+class ProjectTemplateList(FieldsProjectionMixin, generics.ListAPIView, GenericViewSet, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin,
                           ListModelMixin):
     permission_classes = (IsAuthenticated, AdminPermission,)
     serializer_class = ProjectTemplateSerializer
@@ -639,3 +964,51 @@ class ProjectTemplateList(generics.ListAPIView, GenericViewSet, CreateModelMixin
         except Exception as err:
             print(err)
         return HttpResponse("Created new template: {}.".format(name), status=200)
+
+
+class SearchList(GenericViewSet):
+    """
+    Full-text search over models, app instances, apps and projects visible
+    to the user. ?q= is matched word by word as prefixes, ?type= limits the
+    result groups (comma separated) and ?limit= the hits per group.
+    """
+    permission_classes = (IsAuthenticated,)
+    search_types = ('models', 'appinstances', 'apps', 'projects')
+
+    def list(self, request):
+        query = search.search_query(request.query_params.get('q'))
+        if query is None:
+            return Response({'error': 'Parameter q is required.'}, status=400)
+        try:
+            limit = min(int(request.query_params.get('limit', search.SEARCH_LIMIT)),
+                        search.SEARCH_MAX_LIMIT)
+        except ValueError:
+            return Response({'error': 'limit must be an integer.'}, status=400)
+        types = request.query_params.get('type')
+        types = types.split(',') if types else self.search_types
+
+        user = request.user
+        projects = Project.objects.filter(
+            Q(owner=user) | Q(authorized=user), ~Q(status='archived')).values('pk')
+        querysets = {
+            'models': Model.objects.filter(
+                Q(project__in=projects) | Q(access='PU')).values(
+                'id', 'name', 'version', 'description', 'project__slug'),
+            'appinstances': AppInstance.objects.filter(
+                ~Q(state='Deleted'),
+                Q(access='public') | Q(project__in=projects) & (
+                    Q(owner=user) | ~Q(access='private'))).values(
+                'id', 'name', 'app__name', 'project__slug'),
+            'apps': Apps.objects.filter(user_can_create=True).values(
+                'id', 'name', 'slug', 'revision', 'description'),
+            'projects': Project.objects.filter(pk__in=projects).values(
+                'id', 'name', 'slug', 'description'),
+        }
+
+        results = dict()
+        for search_type in types:
+            if search_type not in querysets:
+                return Response({'error': 'Unknown type {}.'.format(search_type)}, status=400)
+            results[search_type] = list(search.ranked(
+                querysets[search_type], query, max(limit, 1)))
+        return Response(results)
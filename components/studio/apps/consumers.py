@@ -0,0 +1,131 @@
+import asyncio
+import json
+import logging
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from projects.models import Project
+
+from . import loki
+from .helpers import status_badge, status_group_name
+from .models import AppInstance
+
+logger = logging.getLogger(__name__)
+
+
+class AppStatusConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Pushes app status changes of one project to the browser, replacing the
+    get_status polling loop. On connect the current status of every app in
+    the project is sent, after that one message per new AppStatus.
+    """
+
+    async def connect(self):
+        self.project_slug = self.scope['url_route']['kwargs']['project']
+        snapshot = await self.get_snapshot(self.scope['user'], self.project_slug)
+        if snapshot is None:
+            await self.close()
+            return
+        self.group_name = status_group_name(self.project_slug)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        for message in snapshot:
+            await self.send_json(message)
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def app_status(self, event):
+        await self.send_json({
+            'pk': event['pk'],
+            'name': event['name'],
+            'status': event['status'],
+            'html': event['html'],
+        })
+
+    @database_sync_to_async
+    def get_snapshot(self, user, project_slug):
+        if not user.is_authenticated:
+            return None
+        project = Project.objects.filter(slug=project_slug).first()
+        if project is None or not user.has_perm('can_view_project', project):
+            return None
+        snapshot = []
+        appinstances = AppInstance.objects.filter(
+            project=project).exclude(state='Deleted').prefetch_related('status')
+        for instance in appinstances:
+            statuses = list(instance.status.all())
+            if statuses:
+                status = max(statuses, key=lambda s: s.time).status_type
+            else:
+                status = instance.state
+            snapshot.append({'pk': instance.pk,
+                             'name': instance.name,
+                             'status': status,
+                             'html': status_badge(status)})
+        return snapshot
+
+
+class AppLogsConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Streams new log lines of an app container by proxying Loki's tail
+    websocket. Lines are forwarded one message at a time as
+    {"ts": ..., "line": ...}, nothing is buffered in Studio.
+    Query parameters: container (required) and q (text filter).
+    """
+
+    async def connect(self):
+        kwargs = self.scope['url_route']['kwargs']
+        params = parse_qs(self.scope.get('query_string', b'').decode())
+        container = params.get('container', [None])[0]
+        text = params.get('q', [None])[0]
+        query = await self.get_query(self.scope['user'], kwargs['project'],
+                                     kwargs['ai_id'], container, text)
+        if query is None:
+            await self.close()
+            return
+        await self.accept()
+        self.tail_task = asyncio.ensure_future(self.tail(query))
+
+    async def disconnect(self, code):
+        if hasattr(self, 'tail_task'):
+            self.tail_task.cancel()
+
+    async def tail(self, query):
+        import aiohttp
+
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.ws_connect(loki.tail_url(query),
+                                              heartbeat=30) as ws:
+                    async for msg in ws:
+                        if msg.type != aiohttp.WSMsgType.TEXT:
+                            break
+                        data = json.loads(msg.data)
+                        for stream in data.get('streams', []):
+                            for ts, line in stream['values']:
+                                await self.send_json({'ts': ts, 'line': line})
+                        if data.get('dropped_entries'):
+                            await self.send_json(
+                                {'dropped': len(data['dropped_entries'])})
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            logger.warning('Log tail failed: %s', err)
+            await self.send_json({'error': 'Log stream interrupted.'})
+        await self.close()
+
+    @database_sync_to_async
+    def get_query(self, user, project_slug, ai_id, container, text):
+        from .views import get_log_query
+
+        if not user.is_authenticated or not container:
+            return None
+        app = AppInstance.objects.filter(
+            pk=ai_id, project__slug=project_slug).select_related('app', 'project').first()
+        if app is None or not user.has_perm('can_view_project', app.project):
+            return None
+        return get_log_query(app, container, text)
@@ -1,6 +1,17 @@
+import asyncio
+import logging
+import time
 import uuid
+from collections import defaultdict
 
+from django.apps import apps
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Subquery
+
+from common.cache import cached_fragment
+
+logger = logging.getLogger(__name__)
 
 
 def create_instance_params(instance, action="create"):
@@ -48,3 +59,134 @@ def create_instance_params(instance, action="create"):
 
     instance.parameters['project'].update(
         {'name': instance.project.name, 'slug': instance.project.slug})
+
+
+def status_group_name(project_slug):
+    """ Channel layer group receiving status updates for a project. """
+    return 'app-status-{}'.format(project_slug)
+
+
+def status_badge(status):
+    """ Renders the status badge shown in the app tables. """
+    if status in settings.APPS_STATUS_SUCCESS:
+        span_class = 'bg-success'
+    elif status in settings.APPS_STATUS_WARNING:
+        span_class = 'bg-warning'
+    else:
+        span_class = 'bg-danger'
+    return '<span class="badge {}">{}</span>'.format(span_class, status)
+
+
+def publish_status(appinstance, status):
+    """
+    Pushes a status change to the websocket clients watching the project.
+    Failures are logged and swallowed, clients fall back to polling.
+    """
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            status_group_name(appinstance.project.slug),
+            {
+                'type': 'app.status',
+                'pk': appinstance.pk,
+                'name': appinstance.name,
+                'status': status,
+                'html': status_badge(status),
+            })
+    except Exception as err:
+        logger.warning('Failed to publish status for app %s: %s',
+                       appinstance.pk, err)
+
+
+def latest_status(appinstance):
+    """ The newest status of appinstance, its state if it has none. """
+    AppStatus = apps.get_model(app_label='apps', model_name='AppStatus')
+    status = AppStatus.objects.filter(appinstance=appinstance).order_by(
+        '-time').values_list('status_type', flat=True).first()
+    return status or appinstance.state
+
+
+# Seconds between reads of the status when no channel layer pushes changes.
+STATUS_POLL_INTERVAL = 1
+
+
+async def wait_for_status(appinstance, group, since=None, timeout=0):
+    """
+    Coroutine returning the status of appinstance as soon as it differs
+    from since, or the current status after timeout seconds. Changes are
+    received from the channel layer group publish_status sends to, the
+    database is polled instead when the channel layer is not available.
+    """
+    from asgiref.sync import sync_to_async
+    from channels.layers import get_channel_layer
+
+    read_status = sync_to_async(latest_status)
+    deadline = time.monotonic()+timeout
+    status = await read_status(appinstance)
+    if status != since or timeout <= 0:
+        return status
+
+    async def listen(channel_layer):
+        channel = await channel_layer.new_channel()
+        await channel_layer.group_add(group, channel)
+        try:
+            # Catches a change between the first read and subscribing.
+            status = await read_status(appinstance)
+            while status == since:
+                remaining = deadline-time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(
+                        channel_layer.receive(channel), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if event.get('pk') == appinstance.pk:
+                    status = event['status']
+            return status
+        finally:
+            await channel_layer.group_discard(group, channel)
+
+    channel_layer = get_channel_layer()
+    if channel_layer is not None:
+        try:
+            return await listen(channel_layer)
+        except Exception as err:
+            logger.warning('Failed to listen for status of app %s: %s',
+                           appinstance.pk, err)
+    while status == since:
+        remaining = deadline-time.monotonic()
+        if remaining <= 0:
+            break
+        await asyncio.sleep(min(STATUS_POLL_INTERVAL, remaining))
+        status = await read_status(appinstance)
+    return status
+
+
+@cached_fragment('app_menu')
+def get_app_menu(project):
+    """
+    The app categories in menu order and, keyed by category slug, the
+    newest revision of every app the project can create.
+    """
+    Apps = apps.get_model(app_label=settings.APPS_MODEL)
+    AppCategories = apps.get_model(app_label=settings.APPCATEGORIES_MODEL)
+    latest = Apps.objects.filter(
+        Q(access='public') | Q(projects=project), user_can_create=True
+    ).order_by('slug', '-revision').distinct('slug').values('pk')
+    by_category = defaultdict(list)
+    for app in Apps.objects.filter(pk__in=Subquery(latest)).order_by('-priority'):
+        by_category[app.category_id].append(app)
+    return {
+        'categories': list(AppCategories.objects.all().order_by('-priority')),
+        'apps': dict(by_category),
+    }
+
+
+def invalidate_app_menu():
+    transaction.on_commit(get_app_menu.invalidate_all)
@@ -0,0 +1,69 @@
+"""
+Helpers for reading app logs from Loki: LogQL construction, backward
+paginated history and the tail websocket URL.
+
+Timestamps are Loki's nanosecond epoch strings throughout; the oldest
+timestamp of a history page is the cursor for the next (older) page.
+"""
+import json
+import time
+from urllib.parse import urlencode
+
+import requests
+from django.conf import settings
+
+from common.instrumentation import external_call
+
+HISTORY_LIMIT = 100
+HISTORY_MAX_LIMIT = 1000
+
+
+def build_query(release, container, text=None):
+    """ LogQL selector for one container of a release, optionally filtered on text. """
+    query = '{{container={},release={}}}'.format(json.dumps(container),
+                                                 json.dumps(release))
+    if text:
+        # JSON string escaping is valid LogQL string escaping.
+        query += ' |= {}'.format(json.dumps(text))
+    return query
+
+
+def query_history(query, cursor=None, limit=HISTORY_LIMIT):
+    """
+    Returns (lines, next_cursor) with up to limit lines older than cursor,
+    newest first. next_cursor is None once the history is exhausted.
+    Raises requests.RequestException if Loki cannot be reached.
+    """
+    end = int(cursor) if cursor else time.time_ns()
+    start = end - settings.LOKI_MAX_LOOKBACK * 10**9
+    with external_call('loki'):
+        response = requests.get(settings.LOKI_SVC+'/loki/api/v1/query_range',
+                                params={'query': query,
+                                        'start': start,
+                                        'end': end,
+                                        'limit': limit,
+                                        'direction': 'backward'},
+                                timeout=settings.LOKI_TIMEOUT)
+    response.raise_for_status()
+
+    lines = []
+    for stream in response.json()['data']['result']:
+        for ts, line in stream['values']:
+            lines.append({'ts': ts, 'line': line})
+    lines.sort(key=lambda entry: int(entry['ts']), reverse=True)
+    lines = lines[:limit]
+
+    next_cursor = None
+    if len(lines) == limit:
+        next_cursor = lines[-1]['ts']
+    return lines, next_cursor
+
+
+def tail_url(query, start=None):
+    """ Loki tail websocket URL for a query, starting at start (ns). """
+    params = {'query': query}
+    if start:
+        params['start'] = start
+    base = settings.LOKI_SVC.replace('https://', 'wss://', 1).replace(
+        'http://', 'ws://', 1)
+    return base+'/loki/api/v1/tail?'+urlencode(params)
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.11 on 2026-10-19 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0008_apps_user_can_create'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='resourcedata',
+            index=models.Index(fields=['time', 'appinstance'], name='resourcedata_time_idx'),
+        ),
+    ]
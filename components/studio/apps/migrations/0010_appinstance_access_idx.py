@@ -0,0 +1,17 @@
+# Generated by Django 3.2.11 on 2026-10-19 16:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0009_resourcedata_time_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appinstance',
+            index=models.Index(fields=['access', 'state'], name='appinstance_access_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.11 on 2026-10-19 16:32
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0010_appinstance_access_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appinstance',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='apps',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='appinstance',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='appinstance_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='apps',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='apps_search_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import Value
+
+
+def backfill_search_vector(apps, schema_editor):
+    Apps = apps.get_model('apps', 'Apps')
+    AppInstance = apps.get_model('apps', 'AppInstance')
+    config = settings.SEARCH_CONFIG
+
+    Apps.objects.update(search_vector=SearchVector('name', weight='A', config=config) +
+                        SearchVector('description', weight='B', config=config))
+
+    instances = AppInstance.objects.annotate(
+        tag_names=StringAgg('tags__name', ' ')).values_list('pk', 'tag_names')
+    for pk, tag_names in instances.iterator():
+        AppInstance.objects.filter(pk=pk).update(
+            search_vector=SearchVector('name', weight='A', config=config) +
+            SearchVector(Value(tag_names or ''), weight='B', config=config))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apps', '0011_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_vector,
+                             migrations.RunPython.noop),
+    ]
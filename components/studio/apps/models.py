@@ -1,10 +1,18 @@
 from django.contrib.auth.models import User
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
 from tagulous.models import TagField
 
+from common.search import tag_text, update_search_vector
 from models.models import Model
+from projects.helpers import invalidate_project_summary
 from projects.models import Project
 
+from .helpers import invalidate_app_menu, publish_status
+
 
 class AppPermission(models.Model):
     appinstance = models.OneToOneField(
@@ -48,9 +56,13 @@ class Apps(models.Model):
     slug = models.CharField(max_length=512, blank=True, null=True)
     table_field = models.JSONField(blank=True, null=True)
     updated_on = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         unique_together = ('slug', 'revision',)
+        indexes = [
+            GinIndex(fields=['search_vector'], name='apps_search_idx'),
+        ]
 
     def __str__(self):
         return str(self.name)+'({})'.format(self.revision)
@@ -76,11 +88,60 @@ class AppInstance(models.Model):
     table_field = models.JSONField(blank=True, null=True)
     tags = TagField()
     updated_on = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['access', 'state'],
+                         name='appinstance_access_idx'),
+            GinIndex(fields=['search_vector'],
+                     name='appinstance_search_idx'),
+        ]
 
     def __str__(self):
         return str(self.name)+' ({})-{}-{}-{}'.format(self.state, self.owner, self.app.name, self.project)
 
 
+@receiver([post_save, post_delete], sender=Apps, dispatch_uid='apps_menu_signal')
+@receiver([post_save, post_delete], sender=AppCategories, dispatch_uid='app_categories_menu_signal')
+@receiver(m2m_changed, sender=Apps.projects.through, dispatch_uid='apps_projects_menu_signal')
+def app_menu_changed(sender, **kwargs):
+    invalidate_app_menu()
+
+
+@receiver(post_save, sender=Apps, dispatch_uid='apps_search_signal')
+def update_apps_search(sender, instance, **kwargs):
+    update_search_vector(instance, [('name', 'A'), ('description', 'B')])
+
+
+def update_app_instance_search(instance):
+    update_search_vector(instance, [('name', 'A'), (tag_text(instance), 'B')])
+
+
+@receiver(post_save, sender=AppInstance, dispatch_uid='app_instance_search_signal')
+def app_instance_saved(sender, instance, **kwargs):
+    update_app_instance_search(instance)
+
+
+@receiver(m2m_changed, sender=AppInstance.tags.through, dispatch_uid='app_instance_tags_search_signal')
+def app_instance_tags_changed(sender, instance, action, reverse, **kwargs):
+    # Renaming or deleting a tag from the tag side is rare, those
+    # instances are picked up on their next save.
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        update_app_instance_search(instance)
+
+
+@receiver([post_save, post_delete], sender=AppInstance, dispatch_uid='app_instance_summary_signal')
+def app_instance_changed(sender, instance, **kwargs):
+    invalidate_project_summary(instance.project_id)
+
+
+@receiver(post_save, sender=AppPermission, dispatch_uid='app_permission_summary_signal')
+def app_permission_changed(sender, instance, **kwargs):
+    if instance.appinstance_id:
+        invalidate_project_summary(instance.appinstance.project_id)
+
+
 class AppStatus(models.Model):
     appinstance = models.ForeignKey(
         'AppInstance', on_delete=models.CASCADE, related_name="status")
@@ -95,6 +156,16 @@ class AppStatus(models.Model):
         return str(self.appinstance.name)+"({})".format(self.time)
 
 
+@receiver(post_save, sender=AppStatus, dispatch_uid='app_status_post_save_signal')
+def post_save_app_status(sender, instance, created, **kwargs):
+    if created:
+        invalidate_project_summary(instance.appinstance.project_id)
+        # Deploy tasks create statuses inside a transaction, only announce
+        # them once they are visible to readers.
+        transaction.on_commit(lambda: publish_status(
+            instance.appinstance, instance.status_type))
+
+
 class ResourceData(models.Model):
     appinstance = models.ForeignKey(
         'AppInstance', on_delete=models.CASCADE, related_name="resourcedata")
@@ -102,3 +173,9 @@ class ResourceData(models.Model):
     gpu = models.IntegerField()
     mem = models.IntegerField()
     time = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['time', 'appinstance'],
+                         name='resourcedata_time_idx'),
+        ]
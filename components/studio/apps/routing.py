@@ -0,0 +1,9 @@
+from django.urls import path
+
+from .consumers import AppLogsConsumer, AppStatusConsumer
+
+websocket_urlpatterns = [
+    path('ws/<user>/<project>/apps/status', AppStatusConsumer.as_asgi()),
+    path('ws/<user>/<project>/apps/<int:ai_id>/logs',
+         AppLogsConsumer.as_asgi()),
+]
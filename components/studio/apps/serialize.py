@@ -1,4 +1,5 @@
 import json
+import logging
 
 import flatten_json
 import requests
@@ -15,6 +16,8 @@ from projects.models import S3, Environment, Flavor, Project
 
 from .models import AppCategories, AppInstance, AppPermission, Apps
 
+logger = logging.getLogger(__name__)
+
 key_words = ['appobj',
              'model',
              'flavor',
@@ -32,7 +35,7 @@ key_words = ['appobj',
 
 
 def serialize_model(form_selection):
-    print("SERIALIZING MODEL")
+    logger.debug("Serializing model")
     model_json = dict()
     obj = []
     if 'model' in form_selection:
@@ -40,16 +43,13 @@ def serialize_model(form_selection):
         if type(model_id) == str:
             model_id = int(model_id)
         obj = Model.objects.filter(pk=model_id)
-        print("Fetching selected model:")
 
         # model_json['model'] = dict()
         keys = get_minio_keys(obj[0].project)
         object_type = obj[0].object_type.all()
-        if len(object_type) == 1:
-            print("OK")
-        else:
-            print("Currently only supports one object type per model")
-            print("Will assume first in list.")
+        if len(object_type) != 1:
+            logger.warning("Model %s has %d object types, using the first",
+                           obj[0].pk, len(object_type))
         model_json = {
             "model": {
                 "name": obj[0].name,
@@ -73,7 +73,7 @@ def serialize_model(form_selection):
 
 
 def serialize_S3(form_selection, project):
-    print("SERIALIZING S3")
+    logger.debug("Serializing S3")
     s3_json = dict()
     if "S3" in form_selection:
 
@@ -99,7 +99,7 @@ def serialize_S3(form_selection, project):
 
 
 def serialize_flavor(form_selection, project):
-    print("SERIALIZING FLAVOR")
+    logger.debug("Serializing flavor")
     flavor_json = dict()
     if 'flavor' in form_selection:
         flavor_id = form_selection.get('flavor', None)
@@ -108,6 +108,7 @@ def serialize_flavor(form_selection, project):
         except:
             flavor = Flavor.objects.get(name=flavor_id, project=project)
         flavor_json['flavor'] = {
+            "name": flavor.name,
             "requests": {
                 "cpu": flavor.cpu_req,
                 "memory": flavor.mem_req,
@@ -131,7 +132,7 @@ def serialize_flavor(form_selection, project):
 
 
 def serialize_environment(form_selection, project):
-    print("SERIALIZING ENVIRONMENT")
+    logger.debug("Serializing environment")
     environment_json = dict()
     if 'environment' in form_selection:
         environment_id = form_selection.get('environment', None)
@@ -155,7 +156,7 @@ def serialize_environment(form_selection, project):
 
 
 def serialize_apps(form_selection, project):
-    print("SERIALIZING DEPENDENT APPS")
+    logger.debug("Serializing dependent apps")
     parameters = dict()
     parameters['apps'] = dict()
     app_deps = []
@@ -169,16 +170,14 @@ def serialize_apps(form_selection, project):
                 if not app:
                     app = Apps.objects.filter(
                         slug=app_name).order_by('-revision').first()
-            except Exception as err:
-                print("Failed to fetch app: {}".format(app_name))
-                print(err)
+            except Exception:
+                logger.exception("Failed to fetch app: %s", app_name)
                 raise
             if not app:
-                print("App not found: {}".format(app_name))
+                logger.warning("App not found: %s", app_name)
 
             parameters['apps'][app.slug] = dict()
-            print(app_name)
-            print('id: '+str(form_selection[key]))
+            logger.debug("Dependent app %s: %s", app_name, form_selection[key])
             try:
                 objs = AppInstance.objects.filter(
                     pk__in=form_selection.getlist(key))
@@ -195,7 +194,7 @@ def serialize_apps(form_selection, project):
 
 
 def serialize_primitives(form_selection):
-    print("SERIALIZING PRIMITIVES")
+    logger.debug("Serializing primitives")
     parameters = dict()
     keys = form_selection.keys()
     for key in keys:
@@ -205,12 +204,11 @@ def serialize_primitives(form_selection):
                 parameters[key] = False
             elif parameters[key] == "True":
                 parameters[key] = True
-    print(parameters)
     return flatten_json.unflatten(parameters, '.')
 
 
 def serialize_permissions(form_selection):
-    print("SERIALIZING PERMISSIONS")
+    logger.debug("Serializing permissions")
     parameters = dict()
     parameters['permissions'] = {
         "public": False,
@@ -220,12 +218,11 @@ def serialize_permissions(form_selection):
 
     permission = form_selection.get('permission', None)
     parameters['permissions'][permission] = True
-    print(parameters)
     return parameters
 
 
 def serialize_appobjs(form_selection):
-    print("SERIALIZING APPOBJS")
+    logger.debug("Serializing appobjs")
     parameters = dict()
     appobjs = []
     if 'appobj' in form_selection:
@@ -234,7 +231,6 @@ def serialize_appobjs(form_selection):
         for obj in appobjs:
             app = Apps.objects.get(pk=obj)
             parameters['appobj'][app.slug] = True
-    print(parameters)
     return parameters
 
 
@@ -242,7 +238,6 @@ def serialize_default_values(aset):
     parameters = []
     if 'default_values' in aset:
         parameters = dict()
-        print(aset['default_values'])
         parameters['default_values'] = aset['default_values']
         for key in parameters['default_values'].keys():
             if parameters['default_values'][key] == "False":
@@ -290,18 +285,15 @@ def serialize_cli(username, project, aset):
 
 
 def serialize_env_variables(username, project, aset):
-    print("SERIALIZING ENV VARIABLES")
+    logger.debug("Serializing env variables")
     parameters = dict()
     parameters['app_env'] = dict()
-    print("fetching apps")
     try:
         apps = AppInstance.objects.filter(Q(owner__username=username) | Q(
             permission__projects__slug=project.slug) | Q(permission__public=True), ~Q(state="Deleted"), project=project)
-    except Exception as err:
-        print(err)
-    print("Creating template engine")
+    except Exception:
+        logger.exception("Failed to fetch apps for env variables")
     django_engine = engines['django']
-    print(apps)
     for app in apps:
         params = app.parameters
         appsettings = app.app.settings
@@ -311,13 +303,12 @@ def serialize_env_variables(username, project, aset):
                 django_engine.from_string(tmp).render(params))
             for key in env_vars.keys():
                 parameters['app_env'][slugify(key)] = env_vars[key]
-    print(parameters)
 
     return parameters
 
 
 def serialize_app(form_selection, project, aset, username):
-    print("SERIALIZING APP")
+    logger.debug("Serializing app")
     parameters = dict()
 
     model_params, model_deps = serialize_model(form_selection)
@@ -1,5 +1,6 @@
 
 import json
+import logging
 import os
 import subprocess
 import time
@@ -14,12 +15,15 @@ from django.db import transaction
 from django.db.models import Q
 
 import chartcontroller.controller as controller
+from common import instrumentation
 from models.models import Model, ObjectType
 from projects.models import S3, BasicAuth, Environment, MLFlow, Project
 from studio.celery import app
 
 from .models import AppInstance, Apps, AppStatus, ResourceData
 
+logger = logging.getLogger(__name__)
+
 
 def get_URI(parameters):
     URI = 'https://'+parameters['release']+'.'+parameters['global']['domain']
@@ -35,7 +39,7 @@ def process_helm_result(results):
 
 
 def post_create_hooks(instance):
-    print("TASK - POST CREATE HOOK...")
+    logger.debug("Running post create hooks for app %s", instance.pk)
     # hard coded hooks for now, we can make this dynamic and loaded from the app specs
     if instance.app.slug == 'minio':
         client_id = instance.parameters['release']
@@ -51,11 +55,11 @@ def post_create_hooks(instance):
             ' -o jsonpath="{.spec.clusterIP"}'
         minio_host_url = ''
         try:
-            result = subprocess.run(cmd, shell=True, capture_output=True)
+            result = instrumentation.run(cmd, shell=True, capture_output=True)
             minio_host_url = result.stdout.decode('utf-8')
             minio_host_url += ':9000'
         except subprocess.CalledProcessError:
-            print('Oops, something went wrong running the command: {}'.format(cmd))
+            logger.warning('Failed to run command: %s', cmd)
 
         try:
             s3obj = instance.s3obj
@@ -107,12 +111,12 @@ def post_create_hooks(instance):
             ' -o jsonpath="{.spec.clusterIP"}'
         mlflow_host_ip = ''
         try:
-            result = subprocess.run(cmd, shell=True, capture_output=True)
+            result = instrumentation.run(cmd, shell=True, capture_output=True)
             mlflow_host_ip = result.stdout.decode('utf-8')
             mlflow_host_ip += ':{}'.format(
                 instance.parameters['service']["port"])
         except subprocess.CalledProcessError:
-            print('Oops, something went wrong running the command: {}'.format(cmd))
+            logger.warning('Failed to run command: %s', cmd)
 
         s3 = S3.objects.get(pk=instance.parameters['s3']['pk'])
         basic_auth = BasicAuth(owner=instance.owner,
@@ -135,7 +139,7 @@ def post_create_hooks(instance):
 
 def post_delete_hooks(instance):
     # Free up release name (if reserved)
-    print("TASK - POST DELETE HOOK...")
+    logger.debug("Running post delete hooks for app %s", instance.pk)
     rel_names = instance.releasename_set.all()
     project = instance.project
     for rel_name in rel_names:
@@ -151,7 +155,6 @@ def post_delete_hooks(instance):
 @shared_task
 @transaction.atomic
 def deploy_resource(instance_pk, action='create'):
-    print("TASK - DEPLOY RESOURCE...")
     app_instance = AppInstance.objects.select_for_update().get(pk=instance_pk)
     status = AppStatus(appinstance=app_instance)
 
@@ -166,20 +169,18 @@ def deploy_resource(instance_pk, action='create'):
         if 'ingress' not in parameters:
             parameters['ingress'] = dict()
         try:
-            print("Ingress v1beta1: {}".format(settings.INGRESS_V1BETA1))
             parameters['ingress']['v1beta1'] = settings.INGRESS_V1BETA1
         except:
             pass
 
         app_instance.parameters = parameters
-        print("App Instance paramenters: {}".format(app_instance))
         app_instance.save()
 
     results = controller.deploy(app_instance.parameters)
     stdout, stderr = process_helm_result(results)
 
     if results.returncode == 0:
-        print("Helm install succeeded")
+        logger.info("Helm install of app %s succeeded", app_instance.pk)
         status.status_type = "Installed"
         app_instance.state = "Running"
         helm_info = {
@@ -190,7 +191,8 @@ def deploy_resource(instance_pk, action='create'):
             }
         }
     else:
-        print("Helm install failed")
+        logger.warning("Helm install of app %s failed: %s",
+                       app_instance.pk, stderr)
         status.status_type = "Failed"
         app_instance.state = "Failed"
         helm_info = {
@@ -205,9 +207,7 @@ def deploy_resource(instance_pk, action='create'):
     app_instance.save()
     status.save()
 
-    if results.returncode != 0:
-        print(app_instance.info["helm"])
-    else:
+    if results.returncode == 0:
         post_create_hooks(app_instance)
 
 
@@ -237,7 +237,6 @@ def delete_resource(pk):
             status = AppStatus(appinstance=appinstance)
             status.status_type = "Terminated"
             status.save()
-            print("CALLING POST DELETE HOOKS")
             post_delete_hooks(appinstance)
         else:
             status = AppStatus(appinstance=appinstance)
@@ -263,7 +262,7 @@ def check_status():
     args = ['kubectl', '--kubeconfig', settings.KUBECONFIG, '-n',
             settings.NAMESPACE, 'get', 'po', '-l', 'type=app', '-o', 'json']
     # print(args)
-    results = subprocess.run(args, capture_output=True)
+    results = instrumentation.run(args, capture_output=True)
     # print(results)
     res_json = json.loads(results.stdout.decode('utf-8'))
     app_statuses = dict()
@@ -281,7 +280,7 @@ def check_status():
         try:
             num_containers = len(item['status']['containerStatuses'])
         except:
-            print("Failed to get number of containers.")
+            logger.debug("Failed to get number of containers of %s.", release)
             pass
         num_cont_ready = 0
         if 'containerStatuses' in item['status']:
@@ -310,9 +309,8 @@ def check_status():
             except:
                 latest_status = "Unknown"
             if current_status != latest_status:
-                print("New status for release {}".format(release))
-                print("Current status: {}".format(current_status))
-                print("Previous status: {}".format(latest_status))
+                logger.info("New status for release %s: %s (was %s)",
+                            release, current_status, latest_status)
                 status = AppStatus(appinstance=instance)
                 # if app_statuses[release]['deletion_status']:
                 #     status.status_type = "Terminated"
@@ -344,37 +342,35 @@ def check_status():
             cmd = 'kubectl --kubeconfig ' + settings.KUBECONFIG + ' get po -l release=' + app_release
             try:
                 # returns a byte-like object
-                result = subprocess.run(cmd, shell=True, capture_output=True)
+                result = instrumentation.run(cmd, shell=True,
+                                             capture_output=True)
                 result_stdout = result.stdout.decode('utf-8')
                 result_stderr = result.stderr.decode('utf-8')
             except subprocess.CalledProcessError:
-                print('Oops, something went wrong running the command: {}'.format(cmd))
+                logger.warning('Failed to run command: %s', cmd)
 
             if result_stdout != '' and 'No resources found in default namespace.' not in result_stderr:
                 # Extract the the status of the related release pod
                 cmd = 'kubectl --kubeconfig ' + settings.KUBECONFIG + ' get po -l release=' + app_release + \
                     ' -o jsonpath="{.items[0].status.phase}"'
                 try:
-                    result = subprocess.run(
+                    result = instrumentation.run(
                         cmd, shell=True, capture_output=True)
                     pod_status = result.stdout.decode('utf-8')
-                    print(pod_status)
                 except subprocess.CalledProcessError:
-                    print(
-                        'Oops, something went wrong running the command: {}'.format(cmd))
+                    logger.warning('Failed to run command: %s', cmd)
 
                 if pod_status == 'Running' and instance.state == 'Deleted':
-                    print(
-                        "INFO: Found Running pod associated to an app instance marked as Deleted")
-                    print("INFO: DELETE RESOURCE with release: {}".format(app_release))
+                    logger.info("Found running pod of deleted app instance, "
+                                "deleting release %s", app_release)
                     cmd = 'helm --kubeconfig ' + settings.KUBECONFIG + ' delete ' + app_release
                     try:
-                        result = subprocess.run(
+                        result = instrumentation.run(
                             cmd, shell=True, capture_output=True)
-                        print(result)
+                        logger.debug("Helm delete of %s returned %s",
+                                     app_release, result.returncode)
                     except subprocess.CalledProcessError:
-                        print(
-                            'Oops, something went wrong running the command: {}'.format(cmd))
+                        logger.warning('Failed to run command: %s', cmd)
 
 
 @app.task
@@ -384,7 +380,7 @@ def get_resource_usage():
 
     args = ['kubectl', '--kubeconfig', settings.KUBECONFIG, 'get',
             '--raw', '/apis/metrics.k8s.io/v1beta1/pods']
-    results = subprocess.run(args, capture_output=True)
+    results = instrumentation.run(args, capture_output=True)
 
     pods = []
     try:
@@ -397,7 +393,7 @@ def get_resource_usage():
 
     args_pod = ['kubectl', '--kubeconfig',
                 settings.KUBECONFIG, 'get', 'po', '-o', 'json']
-    results_pod = subprocess.run(args_pod, capture_output=True)
+    results_pod = instrumentation.run(args_pod, capture_output=True)
     results_pod_json = json.loads(results_pod.stdout.decode('utf-8'))
     try:
         for pod in results_pod_json['items']:
@@ -428,8 +424,7 @@ def get_resource_usage():
                     try:
                         cpu += int(cpun.replace('n', ''))/1e6
                     except:
-                        print("Failed to parse CPU usage:")
-                        print(cpun)
+                        logger.debug("Failed to parse CPU usage: %s", cpun)
                     if 'Ki' in memki:
                         mem += int(memki.replace('Ki', ''))/1000
                     elif 'Mi' in memki:
@@ -456,7 +451,7 @@ def get_resource_usage():
                 appinstance=appinstance, cpu=entry['cpu'], mem=entry['memory'], gpu=entry['gpu'], time=timestamp)
             datapoint.save()
         except:
-            print("Didn't find corresponding AppInstance: {}".format(key))
+            logger.debug("Didn't find corresponding AppInstance: %s", key)
 
     # print(timestamp)
     # print(json.dumps(resources, indent=2))
@@ -475,14 +470,13 @@ def sync_mlflow_models():
         )
         res = False
         try:
-            res = requests.get(url)
+            with instrumentation.external_call('mlflow'):
+                res = requests.get(url)
         except Exception as err:
-            print("Call to MLFlow Server failed.")
-            print(err, flush=True)
+            logger.warning("Call to MLFlow Server failed: %s", err)
 
         if res:
             models = res.json()
-            print(models)
             if len(models) > 0:
                 for item in models['model_versions']:
                     # print(item)
@@ -519,7 +513,7 @@ def sync_mlflow_models():
                             stackn_model.status = "CR"
                             stackn_model.save()
         else:
-            print("WARNING: Failed to fetch info from MLflow Server: {}".format(url))
+            logger.warning("Failed to fetch info from MLflow Server: %s", url)
 
 
 @app.task
@@ -532,18 +526,15 @@ def clean_resource_usage():
 @app.task
 def remove_deleted_app_instances():
     apps = AppInstance.objects.filter(state="Deleted")
-    print("NUMBER OF APPS TO DELETE: {}".format(len(apps)))
-    print(len(apps))
+    logger.info("Number of apps to delete: %d", len(apps))
     # apps.delete()
     for app in apps:
         try:
             name = app.name
-            print("Deleting app instance: {}".format(name))
             app.delete()
-            print("Deleted app instance: {}".format(name))
-        except Exception as err:
-            print("Failed to delete app instances.")
-            print(err)
+            logger.info("Deleted app instance: %s", name)
+        except Exception:
+            logger.exception("Failed to delete app instance %s.", app.pk)
 
 
 @app.task
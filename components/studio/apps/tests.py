@@ -1,12 +1,20 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from django.urls import reverse
 from guardian.shortcuts import assign_perm, remove_perm
 
 from projects.models import Project
 
-from .models import AppInstance, Apps
+from . import loki
+from .models import AppInstance, Apps, AppStatus
+from .routing import websocket_urlpatterns
 
 
 class AppsViewForbidden(TestCase):
@@ -233,3 +241,165 @@ class AppsViewForbidden(TestCase):
         )
         self.assertTemplateUsed(response, '403.html')
         self.assertEqual(response.status_code, 403)
+
+
+class AppStatusTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('foo', 'foo@test.com', 'bar')
+        project = Project.objects.create_project(
+            name='test-status',
+            owner=user,
+            description='',
+            repository=''
+        )
+        app = Apps.objects.create(name='Jupyter', slug='jupyter')
+        self.instance = AppInstance.objects.create(
+            name='lab', app=app, project=project, owner=user)
+        AppStatus.objects.create(
+            appinstance=self.instance, status_type='Installed')
+        self.url = reverse('apps:get_status',
+                           kwargs={'user': 'foo', 'project': project.slug})
+
+    def test_get_status_not_modified(self):
+        """
+        Test that get_status answers 304 until a new status is added
+        """
+        params = {'pk': str(self.instance.pk)}
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Installed', response.json()[
+                      'status-{}'.format(self.instance.pk)])
+        etag = response['ETag']
+
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        AppStatus.objects.create(
+            appinstance=self.instance, status_type='Running')
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Running', response.json()[
+                      'status-{}'.format(self.instance.pk)])
+
+
+class AppStatusConsumerTestCase(TransactionTestCase):
+    # database_sync_to_async closes the connection, which TestCase's
+    # wrapping transaction does not survive.
+    def setUp(self):
+        self.user = User.objects.create_user('foo', 'foo@test.com', 'bar')
+        self.project = Project.objects.create_project(
+            name='test-push',
+            owner=self.user,
+            description='',
+            repository=''
+        )
+        app = Apps.objects.create(name='Jupyter', slug='jupyter')
+        self.instance = AppInstance.objects.create(
+            name='lab', app=app, project=self.project, owner=self.user)
+
+    def _communicator(self, user):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns),
+            '/ws/foo/{}/apps/status'.format(self.project.slug))
+        communicator.scope['user'] = user
+        return communicator
+
+    def test_status_is_pushed(self):
+        """
+        Test that members get a snapshot on connect and new statuses after
+        """
+        create_status = database_sync_to_async(AppStatus.objects.create)
+
+        async def session():
+            communicator = self._communicator(self.user)
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            snapshot = await communicator.receive_json_from()
+            await create_status(appinstance=self.instance,
+                                status_type='Running')
+            message = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return snapshot, message
+
+        snapshot, message = async_to_sync(session)()
+        self.assertEqual(snapshot['pk'], self.instance.pk)
+        self.assertEqual(message['status'], 'Running')
+        self.assertIn('bg-success', message['html'])
+
+    def test_non_member_is_rejected(self):
+        other = User.objects.create_user('member', 'foo@test.com', 'bar')
+
+        async def connect():
+            # The communicator schedules the application on creation, so
+            # it has to be built inside the running loop.
+            communicator = self._communicator(other)
+            connected, _ = await communicator.connect()
+            return connected
+
+        self.assertFalse(async_to_sync(connect)())
+
+    def test_foreign_origin_is_rejected(self):
+        from studio.asgi import application
+        validator = application.application_mapping['websocket']
+
+        async def connect():
+            communicator = WebsocketCommunicator(
+                application,
+                '/ws/foo/{}/apps/status'.format(self.project.slug),
+                headers=[(b'origin', b'https://evil.example.com')])
+            communicator.scope['user'] = self.user
+            connected, _ = await communicator.connect()
+            return connected
+
+        with mock.patch.object(validator, 'allowed_origins',
+                               ['studio.example.com']):
+            self.assertFalse(async_to_sync(connect)())
+
+
+class AppLogsTestCase(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user(
+            'foo', 'foo@test.com', 'bar'))
+        project = Project.objects.create_project(
+            name='test-logs',
+            owner=User.objects.get(username='foo'),
+            description='',
+            repository=''
+        )
+        app = Apps.objects.create(name='Jupyter', slug='jupyter',
+                                  settings={'logs': ['lab']})
+        instance = AppInstance.objects.create(
+            name='lab', app=app, project=project, owner=project.owner,
+            parameters={'release': 'r1'})
+        self.url = reverse('apps:logs_history', kwargs={
+            'user': 'foo', 'project': project.slug, 'ai_id': instance.pk})
+
+    def test_build_query_escapes_text(self):
+        query = loki.build_query('r1', 'lab', 'say "hi"')
+        self.assertEqual(
+            query, '{container="lab",release="r1"} |= "say \\"hi\\""')
+
+    @mock.patch('apps.loki.requests.get')
+    def test_history_page(self, get):
+        get.return_value.json.return_value = {'data': {'result': [
+            {'values': [['30', 'c'], ['10', 'a']]},
+            {'values': [['20', 'b']]},
+        ]}}
+        response = self.client.get(
+            self.url, {'container': 'lab', 'q': 'x', 'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry['line'] for entry in response.json()['lines']],
+                         ['c', 'b'])
+        self.assertEqual(response.json()['next_cursor'], '20')
+        params = get.call_args[1]['params']
+        self.assertEqual(params['direction'], 'backward')
+        self.assertEqual(params['query'],
+                         '{container="lab",release="r1"} |= "x"')
+
+        response = self.client.get(
+            self.url, {'container': 'lab', 'cursor': '20'})
+        self.assertEqual(get.call_args[1]['params']['end'], 20)
+
+    def test_unknown_container(self):
+        response = self.client.get(self.url, {'container': 'other'})
+        self.assertEqual(response.status_code, 400)
@@ -10,6 +10,7 @@ urlpatterns = [
     path('<category>', views.filtered, name='filtered'),
     path('create/<app_slug>', views.create, name='create'),
     path('logs/<ai_id>', views.logs, name='logs'),
+    path('logs/<ai_id>/history', views.logs_history, name='logs_history'),
     path('settings/<ai_id>', views.appsettings, name='appsettings'),
     path('settings/<ai_id>/add_tag', views.add_tag, name='add_tag'),
     path('settings/<ai_id>/remove_tag', views.remove_tag, name='remove_tag'),
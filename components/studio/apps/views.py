@@ -1,25 +1,33 @@
+import logging
 import time
 from datetime import datetime, timedelta
 
 import requests
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Q, Subquery
+from django.db.models import Q
 from django.http import JsonResponse
-from django.shortcuts import HttpResponseRedirect, redirect, render, reverse
+from django.shortcuts import (HttpResponseRedirect, get_object_or_404,
+                              redirect, render, reverse)
 from django.template import engines
 from django.utils.text import slugify
 from django.views.decorators.csrf import csrf_exempt
 from guardian.decorators import permission_required_or_403
 
+from common.helpers import (conditional_response, queryset_validators,
+                            set_validators)
+from projects.helpers import get_sidebar_projects
 from projects.models import Environment, Flavor, Project, ReleaseName
 
+from . import loki
 from .generate_form import generate_form
-from .helpers import create_instance_params
+from .helpers import create_instance_params, get_app_menu, status_badge
 from .models import AppCategories, AppInstance, AppPermission, Apps, AppStatus
 from .serialize import serialize_app
 from .tasks import delete_resource, deploy_resource
 
+logger = logging.getLogger(__name__)
+
 
 def get_status_defs():
     status_success = settings.APPS_STATUS_SUCCESS
@@ -32,7 +40,6 @@ def get_status_defs():
 @permission_required_or_403('can_view_project',
                             (Project, 'slug', 'project'))
 def index(request, user, project):
-    print("hello")
     category = 'store'
     template = 'index_apps.html'
 
@@ -45,78 +52,78 @@ def index(request, user, project):
     return render(request, template, locals())
 
 
+def get_log_query(app, container, text=None):
+    """ LogQL query for an app container, None if the container is not logged. """
+    containers = (app.app.settings or {}).get('logs', [])
+    if container not in containers or not app.parameters or 'release' not in app.parameters:
+        return None
+    return loki.build_query(app.parameters['release'], container, text)
+
+
 @permission_required_or_403('can_view_project',
                             (Project, 'slug', 'project'))
 def logs(request, user, project, ai_id):
     template = "logs.html"
-    app = AppInstance.objects.get(pk=ai_id)
     project = Project.objects.get(slug=project)
-    app_settings = app.app.settings
-    containers = []
-    logs = []
-    if 'logs' in app_settings:
-        containers = app_settings['logs']
-        container = containers[0]
-        print("default container: "+container)
-        if 'container' in request.GET:
-            container = request.GET.get('container')
-            print("Got container in request: "+container)
-
-        try:
-            url = settings.LOKI_SVC+'/loki/api/v1/query_range'
-            app_params = app.parameters
-            print('{container="'+container +
-                  '",release="'+app_params['release']+'"}')
-            query = {
-                'query': '{container="'+container+'",release="'+app_params['release']+'"}',
-                'limit': 50,
-                'start': 0,
-            }
-            res = requests.get(url, params=query)
-            res_json = res.json()['data']['result']
-
-            for item in res_json:
-                logs.append('----------BEGIN CONTAINER------------')
-                logline = ''
-                for iline in item['values']:
-                    logs.append(iline[1])
-                logs.append('----------END CONTAINER------------')
-
-        except Exception as e:
-            print(e)
+    app = get_object_or_404(AppInstance, pk=ai_id, project=project)
+    app_settings = app.app.settings or {}
+    containers = app_settings.get('logs', [])
+    container = request.GET.get(
+        'container', containers[0] if containers else '')
+    text = request.GET.get('q', '')
 
     return render(request, template, locals())
 
 
+@permission_required_or_403('can_view_project',
+                            (Project, 'slug', 'project'))
+def logs_history(request, user, project, ai_id):
+    """
+    One page of log history, newest first. Pass the returned next_cursor as
+    ?cursor= to get the page before it.
+    """
+    app = get_object_or_404(AppInstance, pk=ai_id, project__slug=project)
+    query = get_log_query(app, request.GET.get('container'),
+                          request.GET.get('q'))
+    if not query:
+        return JsonResponse({'error': 'Unknown container.'}, status=400)
+    try:
+        limit = min(int(request.GET.get('limit', loki.HISTORY_LIMIT)),
+                    loki.HISTORY_MAX_LIMIT)
+        cursor = request.GET.get('cursor') or None
+        if cursor:
+            int(cursor)
+    except ValueError:
+        return JsonResponse({'error': 'limit and cursor must be integers.'}, status=400)
+
+    try:
+        lines, next_cursor = loki.query_history(query, cursor, max(limit, 1))
+    except (requests.RequestException, ValueError, KeyError) as err:
+        logger.warning('Failed to fetch logs for app %s: %s', app.pk, err)
+        return JsonResponse({'error': 'Failed to fetch logs.'}, status=502)
+    return JsonResponse({'lines': lines, 'next_cursor': next_cursor})
+
+
 @permission_required_or_403('can_view_project',
                             (Project, 'slug', 'project'))
 def filtered(request, user, project, category):
     # template = 'index_apps.html'
-    projects = Project.objects.filter(Q(owner=request.user) | Q(
-        authorized=request.user), status='active')
+    projects = get_sidebar_projects(request.user)
     status_success, status_warning = get_status_defs()
     menu = dict()
 
     template = 'new.html'
-    import django.core.exceptions as ex
-    try:
-        cat_obj = AppCategories.objects.get(slug=category)
-    except ex.ObjectDoesNotExist:
-        print("No apps are loaded.")
-        cat_obj = []
     menu[category] = 'active'
     media_url = settings.MEDIA_URL
     project = Project.objects.get(slug=project)
-    try:
-        apps = Apps.objects.filter(pk__in=Subquery(
-            Apps.objects.filter((Q(access="public") | Q(projects__in=[project])), category=cat_obj, user_can_create=True).order_by(
-                'slug', '-revision').distinct('slug').values('pk')
-        )).order_by('-priority')
-    except Exception as err:
-        print(err)
+    app_menu = get_app_menu(project)
+    cat_obj = next(
+        (cat for cat in app_menu['categories'] if cat.slug == category), [])
+    if not cat_obj:
+        logger.debug("No apps are loaded for category %s.", category)
+    apps = app_menu['apps'].get(category, [])
 
     time_threshold = datetime.now() - timedelta(minutes=5)
-    print(time_threshold)
     appinstances = AppInstance.objects.filter(
         Q(owner=request.user) | Q(permission__projects__slug=project.slug) | Q(
             permission__public=True),
@@ -137,34 +144,31 @@ def filtered(request, user, project, category):
 
 @csrf_exempt
 def get_status(request, user, project):
-    status_success, status_warning = get_status_defs()
-    print("GET_STATUS")
-    print(request.POST)
-    pk = request.POST.get('pk')
-    # print(pk)
-    pk = pk.split(',')
-    print(pk)
+    # GET is preferred since it can be answered with 304 Not Modified,
+    # POST is kept for older pages.
+    data = request.GET if request.method == 'GET' else request.POST
+    pk = data.get('pk', '')
+    pk = [p for p in pk.split(',') if p]
     res = {}
-    if len(pk) > 0 and not (len(pk) == 1 and pk[0] == ''):
-        appinstances = AppInstance.objects.filter(pk__in=pk)
-        print(appinstances)
-        res = dict()
-        for instance in appinstances:
-            try:
-                status = instance.status.latest().status_type
+    if len(pk) > 0:
+        appinstances = AppInstance.objects.filter(
+            pk__in=pk, project__slug=project)
+        # Status changes add AppStatus rows, other changes bump updated_on.
+        etag, last_modified = queryset_validators(
+            appinstances, ['updated_on', 'status__time'], sorted(pk))
+        not_modified = conditional_response(request, etag, last_modified)
+        if not_modified:
+            return set_validators(not_modified, etag, last_modified)
 
-            except:
-                status = instance.state
-            if status in status_success:
-                span_class = 'bg-success'
-            elif status in status_warning:
-                span_class = 'bg-warning'
+        res = dict()
+        for instance in appinstances.prefetch_related('status'):
+            statuses = list(instance.status.all())
+            if statuses:
+                status = max(statuses, key=lambda s: s.time).status_type
             else:
-                span_class = 'bg-danger'
-            res['status-{}'.format(instance.pk)
-                ] = '<span class="badge {}">{}</span>'.format(span_class, status)
-            print(status)
-        print(pk)
+                status = instance.state
+            res['status-{}'.format(instance.pk)] = status_badge(status)
+        return set_validators(JsonResponse(res), etag, last_modified)
     return JsonResponse(res)
     # if 'pk' in request.POST:
     #     pk = request.POST['pk']
@@ -200,7 +204,6 @@ def add_tag(request, user, project, ai_id):
     appinstance = AppInstance.objects.get(pk=ai_id)
     if request.method == 'POST':
         new_tag = request.POST.get('tag', '')
-        print("New Tag: ", new_tag)
         appinstance.tags.add(new_tag)
         appinstance.save()
 
@@ -212,9 +215,7 @@ def add_tag(request, user, project, ai_id):
 def remove_tag(request, user, project, ai_id):
     appinstance = AppInstance.objects.get(pk=ai_id)
     if request.method == 'POST':
-        print(request.POST)
         new_tag = request.POST.get('tag', '')
-        print("Remove Tag: ", new_tag)
         appinstance.tags.remove(new_tag)
         appinstance.save()
 
@@ -242,10 +243,7 @@ def create(request, user, project, app_slug, data=[], wait=False, call=False):
     app_sett = app.settings
 
     # Set up form
-    print(f"CREATING APP: {app.name}")
-    print("GENERATING FORM")
     form = generate_form(app_sett, project, app, user, [])
-    print("FORM GENERATED: {}".format(form))
     if data or request.method == "POST":
         if not data:
             data = request.POST
@@ -260,8 +258,8 @@ def create(request, user, project, app_slug, data=[], wait=False, call=False):
             app_instance = AppInstance.objects.get(pk=data.get('app_id'))
             permission = app_instance.permission
         else:
-            print("No action set, aborting...")
-            print(data.get('app_action'))
+            logger.warning("No app action set, aborting: %s",
+                           data.get('app_action'))
             return JsonResponse({'status': 'failed', 'reason': 'app_action not set.'})
         permission.public = False
         permission.projects.set([])
@@ -273,7 +271,6 @@ def create(request, user, project, app_slug, data=[], wait=False, call=False):
             permission.public = True
             access = "public"
         elif parameters_out['permissions']['project']:
-            print("PROJECT PERMISSIONS")
             client_id = project.slug
             access = "project"
 
@@ -307,8 +304,8 @@ def create(request, user, project, app_slug, data=[], wait=False, call=False):
                     rel_name_obj.save()
                     app_instance.parameters['release'] = submitted_rn
                 except Exception as e:
-                    print("Error: Submitted release name is not owned by project.")
-                    print(e)
+                    logger.warning("Submitted release name %s is not owned by project %s: %s",
+                                   submitted_rn, project.slug, e)
                     return HttpResponseRedirect(
                         reverse('projects:details', kwargs={'user': request.user, 'project_slug': str(project.slug)}))
 
@@ -346,7 +343,7 @@ def create(request, user, project, app_slug, data=[], wait=False, call=False):
 
             # End of Create action
         elif data.get('app_action') == "Settings":
-            print("UPDATING APP DEPLOYMENT")
+            logger.info("Updating app deployment %s", app_instance.pk)
             app_instance.name = app_name
             app_instance.parameters.update(parameters_out)
             app_instance.save()
@@ -379,19 +376,14 @@ def create(request, user, project, app_slug, data=[], wait=False, call=False):
 @permission_required_or_403('can_view_project',
                             (Project, 'slug', 'project'))
 def publish(request, user, project, category, ai_id):
-    print("Publish app {}".format(ai_id))
-    print(project)
     try:
         app = AppInstance.objects.get(pk=ai_id)
-        print(app)
         # TODO: Check that user is allowed to publish this app.
-        print("setting public")
         app.access = 'public'
-        print("saving")
         app.save()
-        print("done")
-    except Exception as err:
-        print(err)
+        logger.info("Published app %s in project %s", ai_id, project)
+    except Exception:
+        logger.exception("Failed to publish app %s", ai_id)
 
     return HttpResponseRedirect(
         reverse('apps:filtered', kwargs={'user': request.user, 'project': str(project), 'category': category}))
@@ -400,8 +392,6 @@ def publish(request, user, project, category, ai_id):
 @permission_required_or_403('can_view_project',
                             (Project, 'slug', 'project'))
 def delete(request, user, project, category, ai_id):
-    print("PK="+str(ai_id))
-
     if 'from' in request.GET:
         from_page = request.GET.get('from')
     else:
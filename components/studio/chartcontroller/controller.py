@@ -1,6 +1,5 @@
 import json
 import os
-import subprocess
 import tarfile
 import uuid
 from datetime import datetime
@@ -9,6 +8,7 @@ import yaml
 from django.conf import settings
 
 from apps.models import Apps
+from common import instrumentation
 
 KUBEPATH = settings.KUBECONFIG
 
@@ -18,7 +18,7 @@ def delete(options):
     # building args for the equivalent of helm uninstall command
     args = ['helm', '--kubeconfig',
             str(KUBEPATH), '-n', options['namespace'], 'delete', options['release']]
-    result = subprocess.run(args, capture_output=True)
+    result = instrumentation.run(args, capture_output=True)
     return result
 
 
@@ -57,5 +57,5 @@ def deploy(options):
     args = ['helm', 'upgrade', '--install', '--kubeconfig',
             str(KUBEPATH), '-n', options['namespace'], options['release'], chart, '-f', unique_filename]
     print("CONTROLLER: RUNNING HELM COMMAND... ")
-    result = subprocess.run(args, capture_output=True)
+    result = instrumentation.run(args, capture_output=True)
     return result
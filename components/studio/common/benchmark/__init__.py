@@ -0,0 +1,9 @@
+"""
+Benchmarks of Studio's hot endpoints and periodic tasks.
+
+factories generates a synthetic dataset, scenarios drives the endpoints
+and tasks against it with helm, kubectl and Prometheus stubbed out, and
+runner measures latency percentiles and query counts and compares them
+to a stored baseline. Run them with `python manage.py benchmark`, which
+works on a throwaway database like the test runner.
+"""
@@ -0,0 +1,121 @@
+"""
+Bulk factories for benchmark data. Rows are inserted with bulk_create, so
+signal receivers (search vectors, cache invalidation) do not run, which
+keeps generating thousands of rows fast.
+"""
+import uuid
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
+from guardian.shortcuts import assign_perm
+from rest_framework.authtoken.models import Token
+
+from apps.models import (AppCategories, AppInstance, AppPermission, Apps,
+                         AppStatus)
+from models.models import Model, ObjectType
+from projects.models import Project
+
+SCALES = {
+    'small': dict(projects=20, instances=10, models=10, statuses=5, apps=10),
+    'medium': dict(projects=200, instances=20, models=20, statuses=5, apps=20),
+    'large': dict(projects=2000, instances=20, models=20, statuses=10, apps=40),
+}
+
+CATEGORIES = ['compute', 'serve', 'store']
+STATUS_TYPES = ['Created', 'Installed', 'Pending', 'Running']
+BATCH_SIZE = 1000
+# Share of the projects owned by the benchmark user, the others belong to
+# other users and are only partly visible to it.
+OWNED_PROJECTS = 0.1
+
+
+def _bulk(model, objs):
+    return model.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+
+
+def release_name(project_index, instance_index):
+    return 'bench{}x{}'.format(project_index, instance_index)
+
+
+def build_dataset(projects, instances, models, statuses, apps,
+                  username='benchmark'):
+    """
+    Creates a user with an API token and projects, apps, app instances
+    (with permissions and status histories) and model objects.
+
+    The user owns every tenth project and is authorized in every fifth of
+    the others. Returns a namespace with the user, token, the projects of
+    the user and the first of them, which the scenarios drive.
+    """
+    user = User.objects.create_user(username, username+'@example.com',
+                                    username)
+    others = [User.objects.create_user('{}-{}'.format(username, i),
+                                       'other@example.com', username)
+              for i in range(3)]
+    token = Token.objects.get_or_create(user=user)[0]
+
+    categories = _bulk(AppCategories, [
+        AppCategories(name=slug.capitalize(), slug=slug, priority=100-i)
+        for i, slug in enumerate(CATEGORIES)])
+    app_objs = _bulk(Apps, [
+        Apps(name='App {}'.format(i), slug='app-{}'.format(i),
+             category=categories[i % len(categories)], priority=i,
+             settings={}, table_field={})
+        for i in range(apps)])
+    object_type, _ = ObjectType.objects.get_or_create(
+        slug='model', defaults={'name': 'Model', 'app_slug': 'app-0'})
+
+    owned_every = max(int(1/OWNED_PROJECTS), 1)
+    project_objs = _bulk(Project, [
+        Project(name='Project {}'.format(i), slug='bench-project-{}'.format(i),
+                owner=others[i % len(others)] if i % owned_every else user,
+                project_key='a2V5', project_secret='c2VjcmV0',
+                description='Benchmark project {}'.format(i))
+        for i in range(projects)])
+    visible = [project for i, project in enumerate(project_objs)
+               if project.owner_id == user.pk or i % 5 == 0]
+    Project.authorized.through.objects.bulk_create([
+        Project.authorized.through(project_id=project.pk, user_id=user.pk)
+        for project in visible if project.owner_id != user.pk],
+        batch_size=BATCH_SIZE)
+    assign_perm('can_view_project', user,
+                Project.objects.filter(pk__in=[p.pk for p in visible]))
+
+    instance_objs = _bulk(AppInstance, [
+        AppInstance(name='instance-{}'.format(j),
+                    app=app_objs[j % len(app_objs)], project=project,
+                    owner=project.owner, access='project', state='Running',
+                    parameters={'release': release_name(i, j),
+                                'namespace': 'default'},
+                    table_field={'url': 'https://{}.example.com'.format(
+                        release_name(i, j))},
+                    info={})
+        for i, project in enumerate(project_objs)
+        for j in range(instances)])
+    permissions = _bulk(AppPermission, [
+        AppPermission(appinstance=instance, name=instance.name)
+        for instance in instance_objs])
+    AppPermission.projects.through.objects.bulk_create([
+        AppPermission.projects.through(apppermission_id=permission.pk,
+                                       project_id=instance.project_id)
+        for permission, instance in zip(permissions, instance_objs)],
+        batch_size=BATCH_SIZE)
+    _bulk(AppStatus, [
+        AppStatus(appinstance=instance,
+                  status_type=STATUS_TYPES[min(k, len(STATUS_TYPES)-1)])
+        for instance in instance_objs
+        for k in range(statuses)])
+
+    model_objs = _bulk(Model, [
+        Model(uid=uuid.uuid4().hex, name='model-{}'.format(j), version='1.0',
+              project=project, description='Benchmark model {}'.format(j))
+        for project in project_objs
+        for j in range(models)])
+    Model.object_type.through.objects.bulk_create([
+        Model.object_type.through(model_id=model.pk,
+                                  objecttype_id=object_type.pk)
+        for model in model_objs], batch_size=BATCH_SIZE)
+
+    return SimpleNamespace(user=user, password=username, token=token.key,
+                           projects=visible, project=visible[0],
+                           instances_per_project=instances)
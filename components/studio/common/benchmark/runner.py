@@ -0,0 +1,83 @@
+import json
+import time
+
+from .. import instrumentation
+
+PERCENTILES = [50, 90, 95, 99]
+
+
+def percentile(values, p):
+    """ p-th percentile of sorted values, interpolated linearly. """
+    if not values:
+        return 0.0
+    k = (len(values)-1) * p / 100
+    low = int(k)
+    high = min(low+1, len(values)-1)
+    return values[low] + (values[high]-values[low]) * (k-low)
+
+
+def measure(iteration, iterations, warmup=0):
+    """
+    Runs iteration warmup times unmeasured and then iterations times.
+    Returns the latency percentiles in milliseconds and the median and
+    maximum number of database queries of an iteration.
+    """
+    for _ in range(warmup):
+        iteration()
+    durations = []
+    queries = []
+    for _ in range(iterations):
+        recorder = instrumentation.start('benchmark')
+        try:
+            iteration()
+        finally:
+            instrumentation.stop(recorder)
+        durations.append((time.perf_counter()-recorder.start)*1000)
+        queries.append(recorder.queries)
+    durations.sort()
+    queries.sort()
+    result = {'iterations': iterations,
+              'mean_ms': sum(durations)/len(durations),
+              'max_ms': durations[-1],
+              'queries': int(percentile(queries, 50)),
+              'max_queries': queries[-1]}
+    for p in PERCENTILES:
+        result['p{}_ms'.format(p)] = percentile(durations, p)
+    return result
+
+
+def run(scenarios, dataset, iterations, warmup=0):
+    """ Measures every scenario in scenarios, a dict of name to scenario. """
+    return {name: measure(scenario(dataset), iterations, warmup)
+            for name, scenario in scenarios.items()}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Regressions of results against baseline: more queries than the
+    baseline, or a p95 latency more than tolerance (a fraction) above it.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['queries'] > base['queries']:
+            regressions.append('{}: {} queries, baseline {}'.format(
+                name, result['queries'], base['queries']))
+        if result['p95_ms'] > base['p95_ms'] * (1+tolerance):
+            regressions.append('{}: p95 {:.1f} ms, baseline {:.1f} ms'.format(
+                name, result['p95_ms'], base['p95_ms']))
+    return regressions
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path, scale, results):
+    with open(path, 'w') as f:
+        json.dump({'scale': scale, 'results': results}, f, indent=2,
+                  sort_keys=True)
+        f.write('\n')
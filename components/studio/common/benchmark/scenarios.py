@@ -0,0 +1,131 @@
+"""
+Benchmark scenarios. Each scenario takes the dataset and returns a
+function that performs one iteration, raising AssertionError if a
+response is not the expected one.
+"""
+import json
+import subprocess
+from contextlib import contextmanager
+from unittest import mock
+
+from django.test import Client
+from django.urls import reverse
+
+from apps.models import AppInstance
+
+from .factories import CATEGORIES
+
+
+def _client(dataset):
+    client = Client()
+    client.force_login(dataset.user)
+    return client
+
+
+def _get(client, url, expected=200, **kwargs):
+    def iteration():
+        response = client.get(url, **kwargs)
+        assert response.status_code == expected, \
+            '{} returned {}'.format(url, response.status_code)
+    return iteration
+
+
+def _project_instances(dataset):
+    return list(AppInstance.objects.filter(
+        project=dataset.project).order_by('pk'))
+
+
+def auth(dataset):
+    instance = _project_instances(dataset)[0]
+    return _get(Client(), '/auth/',
+                data={'release': instance.parameters['release']},
+                HTTP_AUTHORIZATION='Token '+dataset.token)
+
+
+def get_status(dataset):
+    pks = ','.join(str(instance.pk)
+                   for instance in _project_instances(dataset))
+    url = reverse('apps:get_status', kwargs={
+        'user': dataset.user.username, 'project': dataset.project.slug})
+    return _get(_client(dataset), url, data={'pk': pks})
+
+
+def project_details(dataset):
+    url = reverse('projects:details', kwargs={
+        'user': dataset.user.username, 'project_slug': dataset.project.slug})
+    return _get(_client(dataset), url)
+
+
+def apps_filtered(dataset):
+    url = reverse('apps:filtered', kwargs={
+        'user': dataset.user.username, 'project': dataset.project.slug,
+        'category': CATEGORIES[0]})
+    return _get(_client(dataset), url)
+
+
+def api_models(dataset):
+    url = '/api/projects/{}/models/'.format(dataset.project.pk)
+    return _get(Client(), url, HTTP_AUTHORIZATION='Token '+dataset.token)
+
+
+def _pods(releases):
+    return {'items': [{
+        'metadata': {'name': release+'-pod',
+                     'labels': {'release': release, 'project': 'bench',
+                                'type': 'app'}},
+        'status': {'phase': 'Running',
+                   'containerStatuses': [{'ready': True}]},
+    } for release in releases]}
+
+
+def _pod_metrics(releases):
+    return {'items': [{
+        'metadata': {'name': release+'-pod'},
+        'containers': [{'usage': {'cpu': '1500000n', 'memory': '20480Ki'}}],
+    } for release in releases]}
+
+
+@contextmanager
+def stubbed_externals():
+    """
+    Answers helm and kubectl with canned output for every app instance in
+    the database and Prometheus with empty results.
+    """
+    releases = [parameters['release'] for parameters in
+                AppInstance.objects.values_list('parameters', flat=True)]
+    pods = json.dumps(_pods(releases)).encode('utf-8')
+    metrics = json.dumps(_pod_metrics(releases)).encode('utf-8')
+
+    def run(args, **kwargs):
+        command = args if isinstance(args, str) else ' '.join(args)
+        stdout = b''
+        if 'metrics.k8s.io' in command:
+            stdout = metrics
+        elif ' get po' in command and '-o json' in command:
+            stdout = pods
+        return subprocess.CompletedProcess(args, 0, stdout, b'')
+
+    with mock.patch('common.instrumentation.run', run), \
+            mock.patch('monitor.prometheus._get', return_value=[]):
+        yield
+
+
+def check_status(dataset):
+    from apps.tasks import check_status
+    return check_status
+
+
+def get_resource_usage(dataset):
+    from apps.tasks import get_resource_usage
+    return get_resource_usage
+
+
+SCENARIOS = {
+    'auth': auth,
+    'get_status': get_status,
+    'projects:details': project_details,
+    'apps:filtered': apps_filtered,
+    'api:models': api_models,
+    'task:check_status': check_status,
+    'task:get_resource_usage': get_resource_usage,
+}
@@ -0,0 +1,56 @@
+"""
+Fragment caching for data that is rendered on most pages, such as the
+sidebar project list and the app menus.
+
+A function decorated with cached_fragment caches its result per
+argument (model instances are keyed by pk). Entries are dropped with
+func.invalidate(*args) for one set of arguments or func.invalidate_all()
+for every entry, the latter bumps a version that is part of the key.
+"""
+import functools
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _arg_key(arg):
+    return str(getattr(arg, 'pk', arg))
+
+
+def cached_fragment(name, timeout=None):
+    timeout = settings.FRAGMENT_CACHE_TTL if timeout is None else timeout
+    version_key = 'fragment_version_{}'.format(name)
+
+    def key(version, args):
+        return 'fragment_{}_{}_{}'.format(
+            name, version, '_'.join(_arg_key(arg) for arg in args))
+
+    def version():
+        # Seeded from the clock so that a version key lost to eviction does
+        # not resurrect entries written under an earlier seed.
+        return cache.get_or_set(version_key, time.time_ns, None)
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            cache_key = key(version(), args)
+            value = cache.get(cache_key)
+            if value is None:
+                value = func(*args)
+                cache.set(cache_key, value, timeout)
+            return value
+
+        def invalidate(*args):
+            cache.delete(key(version(), args))
+
+        def invalidate_all():
+            try:
+                cache.incr(version_key)
+            except ValueError:
+                cache.set(version_key, time.time_ns(), None)
+
+        wrapper.invalidate = invalidate
+        wrapper.invalidate_all = invalidate_all
+        return wrapper
+    return decorator
@@ -0,0 +1,96 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def lttb(points, threshold):
+    """
+    Downsamples a sequence of (x, y, ...) tuples to at most threshold points
+    using Largest-Triangle-Three-Buckets, which keeps the visual shape
+    (peaks and dips) of a series instead of dropping every n:th point.
+    Extra tuple members are carried along untouched.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average point of the next bucket
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_range = points[avg_start:avg_end]
+        avg_x = sum(p[0] for p in avg_range) / len(avg_range)
+        avg_y = sum(p[1] for p in avg_range) / len(avg_range)
+
+        # Pick the point in the current bucket forming the largest triangle
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        ax, ay = points[a][0], points[a][1]
+        max_area = -1
+        next_a = range_start
+        for j in range(range_start, range_end):
+            area = abs((ax - avg_x) * (points[j][1] - ay) -
+                       (ax - points[j][0]) * (avg_y - ay))
+            if area > max_area:
+                max_area = area
+                next_a = j
+        sampled.append(points[next_a])
+        a = next_a
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def queryset_validators(queryset, fields, *extra):
+    """
+    Returns (etag, last_modified) describing the current state of a queryset
+    without fetching its rows: one aggregate over the row count, the highest
+    pk and the latest value of each of the given timestamp fields (which may
+    span relations, e.g. 'status__time'). Anything else that changes the
+    rendered response, such as query parameters, goes in extra.
+    """
+    if queryset.query.distinct_fields:
+        # Aggregates cannot be combined with DISTINCT ON.
+        queryset = queryset.model.objects.filter(
+            pk__in=queryset.order_by(*queryset.query.distinct_fields).values('pk'))
+    aggregates = {'_count': Count('pk', distinct=True), '_max_pk': Max('pk')}
+    for i, field in enumerate(fields):
+        aggregates['_max_{}'.format(i)] = Max(field)
+    state = queryset.order_by().aggregate(**aggregates)
+
+    timestamps = [state['_max_{}'.format(i)] for i in range(len(fields))]
+    timestamps = [ts for ts in timestamps if ts is not None]
+    last_modified = max(timestamps) if timestamps else None
+
+    seed = [state['_count'], state['_max_pk']] + \
+        [state['_max_{}'.format(i)] for i in range(len(fields))] + list(extra)
+    etag = hashlib.md5(repr(seed).encode('utf-8')).hexdigest()
+    return etag, last_modified
+
+
+def conditional_response(request, etag, last_modified):
+    """
+    Returns a 304 Not Modified response if the request carries validators
+    matching etag/last_modified, otherwise None.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request,
+                                    etag=quote_etag(etag),
+                                    last_modified=timestamp)
+
+
+def set_validators(response, etag, last_modified):
+    """
+    Adds ETag/Last-Modified to a response and asks clients to revalidate
+    on every use instead of caching blindly.
+    """
+    response['ETag'] = quote_etag(etag)
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,287 @@
+"""
+Opt-in request, task and external call instrumentation.
+
+With settings.INSTRUMENTATION on, InstrumentationMiddleware and the Celery
+task hooks in common/models.py time every view and task, count its
+database queries and collect spans for external calls (helm and kubectl
+subprocesses, Prometheus, Loki and MLflow requests).
+
+Every view or task call is measured by a Recorder that is flushed once
+when the call ends. Totals are kept in a Redis hash shared by all web and
+worker processes (a process local dict when the cache is not Redis, e.g.
+under test) and rendered in the Prometheus text format by render().
+"""
+import contextvars
+import logging
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+                    10, 30, 60)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+METRICS = {
+    'studio_view_duration_seconds': (
+        'histogram', 'Time spent handling requests, per view.'),
+    'studio_view_queries': (
+        'histogram', 'Database queries per request, per view.'),
+    'studio_view_query_duration_seconds_total': (
+        'counter', 'Time spent in database queries, per view.'),
+    'studio_task_duration_seconds': (
+        'histogram', 'Time spent running Celery tasks, per task.'),
+    'studio_task_queries': (
+        'histogram', 'Database queries per task run, per task.'),
+    'studio_task_query_duration_seconds_total': (
+        'counter', 'Time spent in database queries, per task.'),
+    'studio_slow_queries_total': (
+        'counter', 'Queries slower than SLOW_QUERY_THRESHOLD, per view or task.'),
+    'studio_external_call_duration_seconds': (
+        'histogram', 'Time spent in external calls, per kind and view or task.'),
+}
+
+REDIS_KEY = 'studio:metrics'
+
+_LE = re.compile(r'le="([^"]*)",?')
+
+_current = contextvars.ContextVar('instrumentation_recorder', default=None)
+
+
+def enabled():
+    return settings.INSTRUMENTATION
+
+
+def _labels(labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join('{}="{}"'.format(key, escape(labels[key]))
+                    for key in sorted(labels))
+
+
+def _sample(name, labels):
+    return '{}{{{}}}'.format(name, _labels(labels))
+
+
+def _observe(samples, name, value, buckets, labels):
+    """ Appends the histogram samples of one observation to samples. """
+    for bound in buckets:
+        if value <= bound:
+            samples.append((_sample(name+'_bucket',
+                                    dict(labels, le=str(bound))), 1))
+    samples.append((_sample(name+'_bucket', dict(labels, le='+Inf')), 1))
+    samples.append((_sample(name+'_sum', labels), value))
+    samples.append((_sample(name+'_count', labels), 1))
+
+
+class LocalStore:
+    """ Metric totals of this process only. """
+
+    def __init__(self):
+        self.values = defaultdict(float)
+        self.lock = threading.Lock()
+
+    def add(self, samples):
+        with self.lock:
+            for sample, amount in samples:
+                self.values[sample] += amount
+
+    def read(self):
+        with self.lock:
+            return dict(self.values)
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+
+class RedisStore:
+    """ Metric totals shared by every process using the Redis cache. """
+
+    def connection(self):
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+
+    def add(self, samples):
+        import redis
+        try:
+            pipe = self.connection().pipeline(transaction=False)
+            for sample, amount in samples:
+                pipe.hincrbyfloat(REDIS_KEY, sample, amount)
+            pipe.execute()
+        except redis.RedisError as err:
+            logger.warning('Failed to record metrics: %s', err)
+
+    def read(self):
+        return {sample.decode('utf-8'): float(value)
+                for sample, value in self.connection().hgetall(REDIS_KEY).items()}
+
+    def clear(self):
+        self.connection().delete(REDIS_KEY)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                backend = settings.CACHES['default']['BACKEND']
+                _store = RedisStore() if backend.startswith(
+                    'django_redis.') else LocalStore()
+    return _store
+
+
+class Recorder:
+    """
+    Measurements of one view or task call. Installed as a database
+    execute wrapper, it counts queries and their time, external_call adds
+    spans to the recorder of the current context.
+    """
+
+    def __init__(self, name=''):
+        self.name = name
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.query_time = 0.0
+        self.slow_queries = 0
+        self.external = []
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries += 1
+            self.query_time += duration
+            if duration >= settings.SLOW_QUERY_THRESHOLD:
+                self.slow_queries += 1
+                logger.warning('Slow query in %s (%.3fs): %s',
+                               self.name or 'unknown', duration, sql[:1000])
+
+    def add_external(self, kind, duration):
+        with self.lock:
+            self.external.append((kind, duration))
+
+    @property
+    def external_time(self):
+        with self.lock:
+            return sum(duration for _, duration in self.external)
+
+    def flush(self, prefix, labels):
+        """
+        Records the call in the store. prefix is 'view' or 'task', labels
+        identify the call and must include prefix itself.
+        """
+        duration = time.perf_counter() - self.start
+        source = {prefix: labels[prefix]}
+        samples = []
+        _observe(samples, 'studio_{}_duration_seconds'.format(prefix),
+                 duration, DURATION_BUCKETS, labels)
+        _observe(samples, 'studio_{}_queries'.format(prefix),
+                 self.queries, QUERY_BUCKETS, source)
+        samples.append((_sample('studio_{}_query_duration_seconds_total'.format(prefix),
+                                source), self.query_time))
+        if self.slow_queries:
+            samples.append((_sample('studio_slow_queries_total', source),
+                            self.slow_queries))
+        with self.lock:
+            external = list(self.external)
+        for kind, span in external:
+            _observe(samples, 'studio_external_call_duration_seconds', span,
+                     DURATION_BUCKETS, dict(source, kind=kind))
+        get_store().add(samples)
+        return duration
+
+
+def start(name=''):
+    """ Starts measuring a call in the current context, returns its Recorder. """
+    recorder = Recorder(name)
+    recorder.token = _current.set(recorder)
+    connection.execute_wrappers.append(recorder)
+    return recorder
+
+
+def stop(recorder):
+    """ Stops measuring the call of recorder, flush it afterwards. """
+    if recorder in connection.execute_wrappers:
+        connection.execute_wrappers.remove(recorder)
+    _current.reset(recorder.token)
+
+
+@contextmanager
+def external_call(kind):
+    """
+    Times the enclosed external call. The span is added to the view or
+    task being measured, or recorded on its own outside of one.
+    """
+    if not enabled():
+        yield
+        return
+    recorder = _current.get()
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start_time
+        if recorder is not None:
+            recorder.add_external(kind, duration)
+        else:
+            samples = []
+            _observe(samples, 'studio_external_call_duration_seconds',
+                     duration, DURATION_BUCKETS, {'kind': kind})
+            get_store().add(samples)
+
+
+def run(args, **kwargs):
+    """ subprocess.run, timed as an external call named after the command. """
+    command = args.split()[0] if isinstance(args, str) else args[0]
+    with external_call(os.path.basename(command)):
+        return subprocess.run(args, **kwargs)
+
+
+def _sort_key(sample):
+    # Histogram buckets in increasing le order, as the format requires.
+    match = _LE.search(sample)
+    if match is None:
+        return (sample, 0.0)
+    return (sample[:match.start()] + sample[match.end():],
+            float(match.group(1)))
+
+
+def _metric_name(sample):
+    name = sample.split('{', 1)[0]
+    for suffix in ('_bucket', '_sum', '_count'):
+        if name.endswith(suffix) and name[:-len(suffix)] in METRICS:
+            return name[:-len(suffix)]
+    return name
+
+
+def render():
+    """ All recorded metrics in the Prometheus text exposition format. """
+    values = get_store().read()
+    lines = []
+    current = None
+    for sample in sorted(values, key=_sort_key):
+        name = _metric_name(sample)
+        if name != current:
+            current = name
+            if name in METRICS:
+                metric_type, help_text = METRICS[name]
+                lines.append('# HELP {} {}'.format(name, help_text))
+                lines.append('# TYPE {} {}'.format(name, metric_type))
+        lines.append('{} {}'.format(sample, repr(values[sample])))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,17 @@
+import json
+import logging
+
+
+class JSONFormatter(logging.Formatter):
+    """ Formats a log record as one JSON object, for log collectors such as Loki. """
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
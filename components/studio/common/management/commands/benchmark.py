@@ -0,0 +1,114 @@
+import copy
+import os
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from common.benchmark import runner
+from common.benchmark.factories import SCALES, build_dataset
+from common.benchmark.scenarios import SCENARIOS, stubbed_externals
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks the hot endpoints and tasks on a throwaway database '
+            'and compares the results to a stored baseline.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small',
+                            help='Size of the generated dataset.')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                            help='Scenario to run, may be repeated. Default: all.')
+        parser.add_argument('--baseline', default=settings.BENCHMARK_BASELINE,
+                            help='Baseline file to compare to or save.')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Store the results as the new baseline.')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed p95 latency increase as a fraction.')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the benchmark database between runs.')
+
+    def handle(self, *args, **options):
+        scenarios = {name: SCENARIOS[name]
+                     for name in options['scenario'] or SCENARIOS}
+
+        # Keep the benchmark's cache entries and status broadcasts away
+        # from those of a running Studio.
+        caches = copy.deepcopy(settings.CACHES)
+        for cache in caches.values():
+            cache['KEY_PREFIX'] = cache.get('KEY_PREFIX', '') + ':benchmark'
+        isolated = override_settings(
+            CACHES=caches, INSTRUMENTATION=False,
+            CHANNEL_LAYERS={'default': {
+                'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+
+        setup_test_environment()
+        isolated.enable()
+        self.clear_caches()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            self.stdout.write(
+                'Generating {} dataset...'.format(options['scale']))
+            dataset = build_dataset(**SCALES[options['scale']])
+            with stubbed_externals():
+                results = runner.run(scenarios, dataset, options['iterations'],
+                                     options['warmup'])
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb'])
+            self.clear_caches()
+            isolated.disable()
+            teardown_test_environment()
+
+        baseline = {}
+        if os.path.exists(options['baseline']) and not options['save_baseline']:
+            stored = runner.load_baseline(options['baseline'])
+            if stored['scale'] == options['scale']:
+                baseline = stored['results']
+            else:
+                self.stderr.write('Baseline is for scale {}, not comparing.'.format(
+                    stored['scale']))
+        self.report(results, baseline)
+
+        if options['save_baseline']:
+            runner.save_baseline(
+                options['baseline'], options['scale'], results)
+            self.stdout.write(
+                'Baseline saved to {}'.format(options['baseline']))
+            return
+
+        regressions = runner.compare(results, baseline, options['tolerance'])
+        if regressions:
+            raise CommandError('Performance regressions:\n' +
+                               '\n'.join(regressions))
+
+    def clear_caches(self):
+        # The database is recreated with the same primary keys, so entries
+        # of an earlier run would be served as if they were current.
+        for cache in caches.all():
+            if hasattr(cache, 'delete_pattern'):
+                # Only the keys under the benchmark prefix.
+                cache.delete_pattern('*')
+            else:
+                cache.clear()
+
+    def report(self, results, baseline):
+        row = '{:<26}{:>9}{:>9}{:>9}{:>9}{:>9}{:>14}'
+        self.stdout.write(row.format('scenario', 'p50 ms', 'p90 ms', 'p95 ms',
+                                     'p99 ms', 'queries', 'base p95/q'))
+        for name, result in results.items():
+            base = baseline.get(name)
+            self.stdout.write(row.format(
+                name,
+                '{:.1f}'.format(result['p50_ms']),
+                '{:.1f}'.format(result['p90_ms']),
+                '{:.1f}'.format(result['p95_ms']),
+                '{:.1f}'.format(result['p99_ms']),
+                result['queries'],
+                '{:.1f}/{}'.format(base['p95_ms'], base['queries']) if base else '-'))
@@ -0,0 +1,50 @@
+from django.conf import settings
+
+from . import instrumentation
+
+
+class InstrumentationMiddleware:
+    """
+    Measures every request with an instrumentation Recorder, see
+    common/instrumentation.py. With DEBUG on, the numbers of the request
+    are also returned in Server-Timing and X-Studio-* response headers.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not instrumentation.enabled():
+            return self.get_response(request)
+
+        recorder = request.instrumentation = instrumentation.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.stop(recorder)
+
+        view = recorder.name or 'unresolved'
+        duration = recorder.flush('view', {'view': view,
+                                           'method': request.method,
+                                           'status': response.status_code})
+
+        if settings.DEBUG:
+            response['Server-Timing'] = ', '.join([
+                'db;dur={:.1f};desc="{} queries"'.format(
+                    recorder.query_time*1000, recorder.queries),
+                'ext;dur={:.1f};desc="{} external calls"'.format(
+                    recorder.external_time*1000, len(recorder.external)),
+                'total;dur={:.1f}'.format(duration*1000),
+            ])
+            response['X-Studio-Queries'] = recorder.queries
+            response['X-Studio-Query-Time'] = '{:.4f}'.format(
+                recorder.query_time)
+            response['X-Studio-External-Calls'] = len(recorder.external)
+            response['X-Studio-External-Time'] = '{:.4f}'.format(
+                recorder.external_time)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        recorder = getattr(request, 'instrumentation', None)
+        if recorder is not None:
+            recorder.name = request.resolver_match.view_name
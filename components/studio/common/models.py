@@ -1,3 +1,34 @@
-from django.db import models
+from celery.signals import task_postrun, task_prerun
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.dispatch import receiver
 
-# Create your models here.
+from . import instrumentation
+
+
+@receiver(request_started, dispatch_uid='db_health_check_signal')
+def check_persistent_connections(sender, **kwargs):
+    # A persistent connection closed by the server would otherwise fail
+    # the next request that reuses it.
+    if not settings.DB_HEALTH_CHECKS:
+        return
+    for conn in connections.all():
+        if conn.connection is not None and not conn.is_usable():
+            conn.close()
+
+
+@task_prerun.connect(dispatch_uid='task_instrumentation_start_signal')
+def start_task_instrumentation(task_id, task, **kwargs):
+    if instrumentation.enabled():
+        task.request.recorder = instrumentation.start(task.name)
+
+
+@task_postrun.connect(dispatch_uid='task_instrumentation_stop_signal')
+def stop_task_instrumentation(task_id, task, state=None, **kwargs):
+    recorder = getattr(task.request, 'recorder', None)
+    if recorder is None:
+        return
+    task.request.recorder = None
+    instrumentation.stop(recorder)
+    recorder.flush('task', {'task': task.name, 'state': state or 'UNKNOWN'})
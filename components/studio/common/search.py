@@ -0,0 +1,59 @@
+"""
+Postgres full-text search over models, apps and projects.
+
+Searchable models carry a search_vector column (SearchVectorField with a
+GIN index) that is rebuilt by their post_save receivers through
+update_search_vector. Queries match every word as a prefix and are ranked
+with ts_rank, field weights A-C make name hits outrank description hits.
+"""
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db.models import F, Value
+
+SEARCH_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+
+def build_vector(fields):
+    """
+    Combined SearchVector of (field, weight) pairs. A field is a column
+    name or any expression, e.g. Value() for data from related tables.
+    """
+    vector = None
+    for field, weight in fields:
+        part = SearchVector(field, weight=weight,
+                            config=settings.SEARCH_CONFIG)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def update_search_vector(instance, fields):
+    """ Rebuilds the search vector of one row in the database. """
+    type(instance).objects.filter(pk=instance.pk).update(
+        search_vector=build_vector(fields))
+
+
+def search_query(text):
+    """
+    SearchQuery matching all words of text as prefixes, or None if text
+    has no words. Only word characters reach to_tsquery.
+    """
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return None
+    return SearchQuery(' & '.join(word+':*' for word in words),
+                       search_type='raw', config=settings.SEARCH_CONFIG)
+
+
+def ranked(queryset, query, limit=SEARCH_LIMIT):
+    """ The rows of queryset matching query, best match first. """
+    return queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query)).order_by('-rank', '-pk')[:limit]
+
+
+def tag_text(instance):
+    """ Tags of a tagulous tagged instance as one string for indexing. """
+    return Value(' '.join(tag.name for tag in instance.tags.all()))
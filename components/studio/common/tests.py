@@ -1,3 +1,142 @@
-from django.test import TestCase
+import json
+import logging
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from . import instrumentation
+from .benchmark import runner
+from .benchmark.factories import build_dataset
+from .benchmark.scenarios import SCENARIOS, stubbed_externals
+from .cache import cached_fragment
+from .helpers import lttb
+from .log import JSONFormatter
+
+
+class LTTBTestCase(SimpleTestCase):
+    def test_short_series_is_untouched(self):
+        points = [(i, i * i) for i in range(10)]
+        self.assertEqual(lttb(points, 20), points)
+
+    def test_downsample_keeps_endpoints_and_peaks(self):
+        points = [(i, 0) for i in range(1000)]
+        points[500] = (500, 100)
+        sampled = lttb(points, 20)
+        self.assertEqual(len(sampled), 20)
+        self.assertEqual(sampled[0], points[0])
+        self.assertEqual(sampled[-1], points[-1])
+        self.assertIn((500, 100), sampled)
+
+
+class CachedFragmentTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+
+        @cached_fragment('test_fragment')
+        def fragment(arg):
+            self.calls.append(arg)
+            return [arg, len(self.calls)]
+        self.fragment = fragment
+
+    def test_result_is_cached_per_argument(self):
+        self.assertEqual(self.fragment(1), [1, 1])
+        self.assertEqual(self.fragment(1), [1, 1])
+        self.assertEqual(self.fragment(2), [2, 2])
+        self.assertEqual(self.calls, [1, 2])
+
+    def test_invalidate(self):
+        self.fragment(1)
+        self.fragment(2)
+        self.fragment.invalidate(1)
+        self.assertEqual(self.fragment(1), [1, 3])
+        self.assertEqual(self.fragment(2), [2, 2])
+        self.fragment.invalidate_all()
+        self.assertEqual(self.fragment(2), [2, 4])
+
+
+@override_settings(INSTRUMENTATION=True, DEBUG=True)
+class InstrumentationTestCase(TestCase):
+    def setUp(self):
+        instrumentation.get_store().clear()
+        User.objects.create_user('foo', 'foo@test.com', 'bar')
+        self.client.login(username='foo', password='bar')
+
+    def test_request_is_measured(self):
+        response = self.client.get(reverse('portal:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response['X-Studio-Queries']), 0)
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+        metrics = self.client.get(reverse('common:metrics')).content.decode()
+        self.assertIn('# TYPE studio_view_duration_seconds histogram', metrics)
+        self.assertIn('studio_view_queries_count{view="portal:index"} 1.0',
+                      metrics)
+        self.assertIn('studio_view_duration_seconds_bucket{le="+Inf",'
+                      'method="GET",status="200",view="portal:index"} 1.0',
+                      metrics)
+
+    def test_external_calls_are_added_to_the_call(self):
+        recorder = instrumentation.start('test')
+        try:
+            with instrumentation.external_call('kubectl'):
+                pass
+            instrumentation.run(['true'])
+        finally:
+            instrumentation.stop(recorder)
+        self.assertEqual([kind for kind, _ in recorder.external],
+                         ['kubectl', 'true'])
+        recorder.flush('task', {'task': 'test', 'state': 'SUCCESS'})
+        metrics = instrumentation.render()
+        self.assertIn('studio_external_call_duration_seconds_count'
+                      '{kind="kubectl",task="test"} 1.0', metrics)
+
+    def test_task_is_measured(self):
+        from apps.tasks import clean_resource_usage
+
+        clean_resource_usage.apply()
+        metrics = instrumentation.render()
+        self.assertIn('studio_task_duration_seconds_count{state="SUCCESS",'
+                      'task="apps.tasks.clean_resource_usage"} 1.0', metrics)
+        self.assertIn('studio_task_queries_count'
+                      '{task="apps.tasks.clean_resource_usage"} 1.0', metrics)
+
+    @override_settings(INSTRUMENTATION=False)
+    def test_metrics_disabled(self):
+        response = self.client.get(reverse('common:metrics'))
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('X-Studio-Queries', response)
+
+
+class JSONFormatterTestCase(SimpleTestCase):
+    def test_record_is_one_json_object(self):
+        record = logging.LogRecord('apps.tasks', logging.WARNING, __file__, 1,
+                                   'Failed to run command: %s', ('helm',), None)
+        entry = json.loads(JSONFormatter().format(record))
+        self.assertEqual(entry['level'], 'WARNING')
+        self.assertEqual(entry['logger'], 'apps.tasks')
+        self.assertEqual(entry['message'], 'Failed to run command: helm')
+
+
+class BenchmarkTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.dataset = build_dataset(projects=4, instances=3, models=2,
+                                     statuses=2, apps=3)
+
+    def test_scenarios_run(self):
+        with stubbed_externals():
+            results = runner.run(SCENARIOS, self.dataset, iterations=2)
+        self.assertEqual(set(results), set(SCENARIOS))
+        for name, result in results.items():
+            self.assertGreater(result['queries'], 0, name)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+    def test_compare(self):
+        baseline = {'auth': {'queries': 5, 'p95_ms': 10.0}}
+        self.assertEqual(runner.compare(
+            {'auth': {'queries': 5, 'p95_ms': 12.0}}, baseline, 0.25), [])
+        self.assertEqual(len(runner.compare(
+            {'auth': {'queries': 6, 'p95_ms': 13.0}}, baseline, 0.25)), 2)
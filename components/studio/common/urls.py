@@ -9,4 +9,5 @@ urlpatterns = [
     path('welcome/', views.HomeView.as_view(), name='welcome'),
     path('success/', views.RegistrationCompleteView.as_view(), name='success'),
     path('signup/', views.SignUpView.as_view(), name='signup'),
+    path('metrics', views.metrics, name='metrics'),
 ]
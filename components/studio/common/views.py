@@ -1,10 +1,12 @@
 from django.conf import settings
 from django.contrib import messages
+from django.http import Http404, HttpResponse
 from django.http.response import HttpResponseRedirect
 from django.shortcuts import redirect
 from django.urls import reverse_lazy
 from django.views.generic import CreateView, TemplateView
 
+from . import instrumentation
 from .forms import SignUpForm
 
 
@@ -42,3 +44,11 @@ class SignUpView(CreateView):
 
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
+
+
+def metrics(request):
+    """ Instrumentation metrics for Prometheus, see common/instrumentation.py. """
+    if not instrumentation.enabled():
+        raise Http404
+    return HttpResponse(instrumentation.render(),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,3 +1,4 @@
+import hashlib
 import io
 import shutil
 import tarfile
@@ -65,6 +66,82 @@ def add_pmo_to_publish(mdl, pmodel):
     pmodel.model_obj.add(pmo)
 
 
+# Chunk size of artifact manifests. Chunks of earlier artifacts are reused
+# as sources of a server side compose, whose parts must be 5 MiB or more.
+ARTIFACT_CHUNK_SIZE = 8*1024*1024
+
+
+def content_key(content_hash):
+    """ The content addressed object name of an artifact. """
+    return 'sha256-{}'.format(content_hash)
+
+
+def artifact_manifest(path, chunk_size=ARTIFACT_CHUNK_SIZE):
+    """ The manifest of the file at path, see validate_manifest. """
+    total = hashlib.sha256()
+    chunks = []
+    size = 0
+    with open(path, 'rb') as fin:
+        for chunk in iter(lambda: fin.read(chunk_size), b''):
+            total.update(chunk)
+            chunks.append(hashlib.sha256(chunk).hexdigest())
+            size += len(chunk)
+    return {'algorithm': 'sha256', 'chunk_size': chunk_size, 'size': size,
+            'hash': total.hexdigest(), 'chunks': chunks}
+
+
+def _is_sha256(value):
+    return isinstance(value, str) and len(value) == 64 and all(
+        c in '0123456789abcdef' for c in value)
+
+
+def validate_manifest(manifest):
+    """
+    Raises ValueError unless manifest describes an artifact of size bytes
+    with sha256 hash, cut into chunks of chunk_size bytes (the last one
+    shorter) whose sha256 hashes are listed in order:
+
+        {'algorithm': 'sha256', 'chunk_size': 8388608, 'size': 9000000,
+         'hash': '<hex>', 'chunks': ['<hex>', '<hex>']}
+    """
+    try:
+        chunk_size = manifest['chunk_size']
+        size = manifest['size']
+        chunks = manifest['chunks']
+        valid = (manifest['algorithm'] == 'sha256' and
+                 isinstance(chunk_size, int) and chunk_size > 0 and
+                 isinstance(size, int) and size >= 0 and
+                 _is_sha256(manifest['hash']) and
+                 isinstance(chunks, list) and
+                 len(chunks) == -(-size // chunk_size) and
+                 all(_is_sha256(chunk) for chunk in chunks))
+    except (KeyError, TypeError):
+        valid = False
+    if not valid:
+        raise ValueError('Invalid artifact manifest.')
+
+
+def known_artifacts(models):
+    """
+    The artifacts stored for models with a manifest, as
+    ({content hash: {'bucket', 'object'}},
+     {chunk hash: {'bucket', 'object', 'offset', 'length'}}).
+    """
+    objects = dict()
+    chunks = dict()
+    for model in models:
+        manifest = model.manifest
+        location = {'bucket': model.bucket, 'object': model.uid}
+        objects.setdefault(manifest['hash'], location)
+        chunk_size = manifest['chunk_size']
+        for i, chunk in enumerate(manifest['chunks']):
+            offset = i*chunk_size
+            chunks.setdefault(chunk, dict(
+                location, offset=offset,
+                length=min(chunk_size, manifest['size']-offset)))
+    return objects, chunks
+
+
 def get_download_url(model_id):
     model = Model.objects.get(pk=model_id)
     bucket = model.bucket
@@ -129,6 +206,15 @@ def create_client(S3_storage, secure_mode=True):
     return client
 
 
+def artifact_exists(artifact_name, bucket, S3_storage, secure_mode=True):
+    client = create_client(S3_storage, secure_mode)
+    try:
+        client.stat_object(bucket, artifact_name)
+    except Exception:
+        return False
+    return True
+
+
 # This Method use Minio Python API to save an artificat into a running minio server instance
 def set_artifact(artifact_name, artifact_file, bucket, S3_storage, is_file=False, secure_mode=True):
     """ Instance must be a byte-like object. """
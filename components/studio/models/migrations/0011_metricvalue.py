@@ -0,0 +1,34 @@
+# Generated by Django 3.2.11 on 2026-10-19 16:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('models', '0010_alter_model_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_id', models.CharField(max_length=32)),
+                ('trained_model', models.CharField(default='', max_length=32)),
+                ('project', models.CharField(default='', max_length=255)),
+                ('key', models.CharField(max_length=255)),
+                ('value', models.FloatField()),
+                ('metadata', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metric_values', to='models.metadata')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='metricvalue',
+            index=models.Index(fields=['project', 'trained_model', 'key', 'metadata'], name='metricvalue_series_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='metricvalue',
+            unique_together={('metadata', 'key')},
+        ),
+    ]
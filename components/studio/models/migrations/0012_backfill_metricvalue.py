@@ -0,0 +1,43 @@
+from ast import literal_eval
+
+from django.db import migrations
+
+
+def backfill_metric_values(apps, schema_editor):
+    Metadata = apps.get_model('models', 'Metadata')
+    MetricValue = apps.get_model('models', 'MetricValue')
+    values = []
+    for md in Metadata.objects.all().iterator():
+        try:
+            metrics = literal_eval(md.metrics) if md.metrics else {}
+        except (ValueError, SyntaxError):
+            continue
+        if not isinstance(metrics, dict):
+            continue
+        for key, value in metrics.items():
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+            values.append(MetricValue(metadata_id=md.pk,
+                                      run_id=md.run_id,
+                                      trained_model=md.trained_model,
+                                      project=md.project,
+                                      key=str(key)[:255],
+                                      value=value))
+        if len(values) >= 1000:
+            MetricValue.objects.bulk_create(values)
+            values = []
+    MetricValue.objects.bulk_create(values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('models', '0011_metricvalue'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_metric_values,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.11 on 2026-10-19 16:32
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('models', '0012_backfill_metricvalue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='model',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='model',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='model_search_idx'),
+        ),
+    ]
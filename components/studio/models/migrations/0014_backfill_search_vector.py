@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+def backfill_search_vector(apps, schema_editor):
+    Model = apps.get_model('models', 'Model')
+    config = settings.SEARCH_CONFIG
+    Model._default_manager.update(
+        search_vector=SearchVector('name', weight='A', config=config) +
+        SearchVector('description', weight='B', config=config) +
+        SearchVector('model_card', weight='C', config=config))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('models', '0013_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_vector,
+                             migrations.RunPython.noop),
+    ]
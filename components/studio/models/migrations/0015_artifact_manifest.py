@@ -0,0 +1,23 @@
+# Generated by Django 3.2.11 on 2026-10-19 17:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('models', '0014_backfill_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='model',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='model',
+            name='manifest',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
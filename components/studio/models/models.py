@@ -4,14 +4,18 @@ from functools import cmp_to_key
 
 from django import forms
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
-from django.db.models.signals import pre_delete, pre_save
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
 from django.dispatch import receiver
 from django.utils.module_loading import import_string
 from minio import Minio
 from tagulous.models import TagField
 
-from projects.helpers import get_minio_keys
+from common.search import update_search_vector
+from projects.helpers import get_minio_keys, invalidate_project_summary
 
 
 def compare_version(v1, v2):
@@ -122,9 +126,19 @@ class Model(models.Model):
         upload_to='models/image', null=True, blank=True, default=None)
     docker_image = models.OneToOneField('projects.Environment', null=True, blank=True,
                                         on_delete=models.CASCADE, default=None)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # sha256 of the artifact and the hashes of its chunks, see
+    # models.helpers.validate_manifest. Such artifacts are stored under a
+    # content addressed uid that versions with equal bytes share.
+    content_hash = models.CharField(
+        max_length=64, blank=True, default='', db_index=True)
+    manifest = models.JSONField(null=True, blank=True)
 
     class Meta:
         unique_together = ('name', 'version', 'project')
+        indexes = [
+            GinIndex(fields=['search_vector'], name='model_search_idx'),
+        ]
 
     def __str__(self):
         return "{name}:{version}".format(name=self.name, version=self.version)
@@ -173,6 +187,64 @@ class Metadata(models.Model):
         unique_together = ('run_id', 'trained_model')
 
 
+class MetricValue(models.Model):
+    """ One row per (run, metric key), parsed from Metadata.metrics on write. """
+    metadata = models.ForeignKey(
+        Metadata, on_delete=models.CASCADE, related_name='metric_values')
+    run_id = models.CharField(max_length=32)
+    trained_model = models.CharField(max_length=32, default='')
+    project = models.CharField(max_length=255, default='')
+    key = models.CharField(max_length=255)
+    value = models.FloatField()
+
+    class Meta:
+        unique_together = ('metadata', 'key')
+        indexes = [
+            models.Index(fields=['project', 'trained_model', 'key', 'metadata'],
+                         name='metricvalue_series_idx'),
+        ]
+
+
+def parse_metadata_metrics(md):
+    """ Returns (key, value) pairs for the numeric metrics of a Metadata row. """
+    try:
+        metrics = literal_eval(md.metrics) if md.metrics else {}
+    except (ValueError, SyntaxError):
+        return []
+    if not isinstance(metrics, dict):
+        return []
+    pairs = []
+    for key, value in metrics.items():
+        try:
+            pairs.append((str(key)[:255], float(value)))
+        except (TypeError, ValueError):
+            continue
+    return pairs
+
+
+def index_metadata_metrics(md_objects):
+    """ (Re)builds the MetricValue rows for the given Metadata objects. """
+    md_objects = [md for md in md_objects if md.pk]
+    if not md_objects:
+        return 0
+    MetricValue.objects.filter(metadata__in=md_objects).delete()
+    values = [MetricValue(metadata=md,
+                          run_id=md.run_id,
+                          trained_model=md.trained_model,
+                          project=md.project,
+                          key=key,
+                          value=value)
+              for md in md_objects
+              for key, value in parse_metadata_metrics(md)]
+    MetricValue.objects.bulk_create(values, batch_size=1000)
+    return len(values)
+
+
+@receiver(post_save, sender=Metadata, dispatch_uid='metadata_post_save_signal')
+def post_save_metadata(sender, instance, using, **kwargs):
+    index_metadata_metrics([instance])
+
+
 @receiver(pre_save, sender=Model, dispatch_uid='model_pre_save_signal')
 def pre_save_model(sender, instance, using, **kwargs):
     # Load version backend
@@ -196,17 +268,33 @@ def pre_save_model(sender, instance, using, **kwargs):
                 instance.name, instance.version, release_type))
 
 
+@receiver([post_save, post_delete], sender=Model, dispatch_uid='model_summary_signal')
+def model_changed(sender, instance, **kwargs):
+    invalidate_project_summary(instance.project_id)
+
+
+@receiver(post_save, sender=Model, dispatch_uid='model_search_signal')
+def update_model_search(sender, instance, **kwargs):
+    update_search_vector(instance, [('name', 'A'), ('description', 'B'),
+                                    ('model_card', 'C')])
+
+
 @receiver(pre_delete, sender=Model, dispatch_uid='model_pre_delete_signal')
 def pre_delete_model(sender, instance, using, **kwargs):
+    # Content addressed artifacts are shared by versions with equal bytes.
+    shared = instance.content_hash and Model.objects.filter(
+        uid=instance.uid, s3=instance.s3, bucket=instance.bucket).exclude(
+        pk=instance.pk).exists()
     # Model is saved in bucket 'model' with filename 'instance.uid'
     minio_url = '{}-minio.{}'.format(instance.project.slug, settings.DOMAIN)
     minio_keys = get_minio_keys(instance.project)
     try:
-        client = Minio(instance.project.s3storage.host,
-                       access_key=instance.project.s3storage.access_key,
-                       secret_key=instance.project.s3storage.secret_key,
-                       secure=settings.OIDC_VERIFY_SSL)
-        client.remove_object('models', instance.uid)
+        if not shared:
+            client = Minio(instance.project.s3storage.host,
+                           access_key=instance.project.s3storage.access_key,
+                           secret_key=instance.project.s3storage.secret_key,
+                           secure=settings.OIDC_VERIFY_SSL)
+            client.remove_object('models', instance.uid)
     except:
         print('Failed to delete model object {} from minio store.'.format(instance.uid))
     # Check if model has been deployed, if so, delete deployment.
@@ -1,14 +1,14 @@
 import json
 
 from django import template
-from django.db.models.functions import Length
 
 register = template.Library()
 
 
 @register.filter(name='split')
 def split(value, arg):
-    return value.all().order_by(Length('name').desc())
+    # Sorted in Python so that prefetched tags are not queried again.
+    return sorted(value.all(), key=lambda tag: len(tag.name), reverse=True)
 
 
 @register.filter
@@ -43,3 +43,29 @@ def count_str(value):
 @register.filter(name='subtract')
 def subtract(value, arg):
     return value - arg
+
+
+@register.simple_tag(takes_context=True)
+def query_toggle(context, key, value):
+    """
+    The current query string with value added to the list under key, or
+    removed from it if already present. Pagination restarts.
+    """
+    query = context['request'].GET.copy()
+    query.pop('page', None)
+    values = query.getlist(key)
+    value = str(value)
+    if value in values:
+        values.remove(value)
+    else:
+        values.append(value)
+    query.setlist(key, values)
+    return query.urlencode()
+
+
+@register.simple_tag(takes_context=True)
+def query_replace(context, key, value):
+    """ The current query string with key set to value. """
+    query = context['request'].GET.copy()
+    query[key] = value
+    return query.urlencode()
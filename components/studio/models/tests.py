@@ -1,12 +1,20 @@
+import hashlib
+import os
+import tempfile
+from unittest import mock
+
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from guardian.shortcuts import assign_perm, remove_perm
+from rest_framework.test import APIClient
 
-from projects.models import Project
+from portal.models import PublicModelObject, PublishedModel
+from projects.models import S3, Project
 
-from .models import Model, ObjectType
+from .helpers import artifact_manifest, content_key, validate_manifest
+from .models import Metadata, MetricValue, Model, ObjectType
 
 
 class ModelViewForbidden(TestCase):
@@ -249,6 +257,245 @@ class ModelViewForbidden(TestCase):
         self.assertEqual(response.status_code, 403)
 
 
+class MetricValueTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('foo', 'foo@test.com', 'bar')
+        project = Project.objects.create_project(
+            name='test-metrics',
+            owner=user,
+            description='',
+            repository=''
+        )
+        self.model = Model.objects.create(uid="test_uid",
+                                          name="test",
+                                          project=project,
+                                          access='PR')
+        for i in range(500):
+            Metadata.objects.create(run_id='run{}'.format(i),
+                                    trained_model=str(self.model),
+                                    project=project.name,
+                                    parameters="{'epochs': 5}",
+                                    metrics="{{'accuracy': {}, 'loss': '{}', 'note': 'n/a'}}".format(i/500, 1-i/500))
+        self.client.login(username='foo', password='bar')
+
+    def test_metrics_are_indexed_on_save(self):
+        """
+        Test that numeric metrics are stored as one row per run and key
+        """
+        self.assertEqual(MetricValue.objects.filter(
+            key='accuracy').count(), 500)
+        self.assertEqual(MetricValue.objects.filter(key='loss').count(), 500)
+        self.assertFalse(MetricValue.objects.filter(key='note').exists())
+
+        md = Metadata.objects.get(run_id='run1')
+        md.metrics = "{'accuracy': 0.5}"
+        md.save()
+        self.assertEqual(list(md.metric_values.values_list('key', 'value')),
+                         [('accuracy', 0.5)])
+
+    def test_chart_data_is_downsampled(self):
+        """
+        Test that /models/<int:id>/metrics returns downsampled series
+        """
+        project = Project.objects.get(name='test-metrics')
+        response = self.client.get(
+            reverse(
+                'models:chart_data',
+                kwargs={
+                    'user': 'foo',
+                    'project': project.slug,
+                    'id': self.model.id
+                }
+            ),
+            {'metric': 'accuracy', 'points': 50}
+        )
+        self.assertEqual(response.status_code, 200)
+        metrics = response.json()['metrics']
+        self.assertEqual(len(metrics), 1)
+        details = metrics[0]['details']
+        self.assertEqual(len(details['data']), 50)
+        self.assertEqual(details['total_runs'], 500)
+        self.assertEqual(details['run_id'][0], 'run0')
+        self.assertEqual(details['run_id'][-1], 'run499')
+
+
+class ArtifactDedupTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('foo', 'foo@test.com', 'bar')
+        self.project = Project.objects.create_project(
+            name='test-dedup',
+            owner=user,
+            description='',
+            repository=''
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+
+    def manifest(self, data, chunk_size=4):
+        path = os.path.join(tempfile.mkdtemp(), 'model.tar.gz')
+        with open(path, 'wb') as f:
+            f.write(data)
+        return artifact_manifest(path, chunk_size=chunk_size)
+
+    def test_manifest(self):
+        manifest = self.manifest(b'0123456789')
+        self.assertEqual(manifest['size'], 10)
+        self.assertEqual(manifest['chunks'], [
+            hashlib.sha256(chunk).hexdigest()
+            for chunk in (b'0123', b'4567', b'89')])
+        validate_manifest(manifest)
+        with self.assertRaises(ValueError):
+            validate_manifest(dict(manifest, chunks=manifest['chunks'][:2]))
+        with self.assertRaises(ValueError):
+            validate_manifest(dict(manifest, hash='../etc'))
+
+    def test_chunks_endpoint(self):
+        """
+        Test that stored chunks are located by offset in earlier artifacts
+        """
+        manifest = self.manifest(b'0123456789')
+        Model.objects.create(uid=content_key(manifest['hash']), name='m',
+                             version='1.0', project=self.project,
+                             s3=self.project.s3storage,
+                             content_hash=manifest['hash'], manifest=manifest)
+        Model.objects.create(uid='legacy', name='m', version='0.9',
+                             project=self.project)
+        url = reverse('api:model-chunks',
+                      kwargs={'project_pk': self.project.pk})
+        response = self.client.get(url, {'name': 'm'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['objects'], {manifest['hash']: {
+            'bucket': 'models', 'object': content_key(manifest['hash'])}})
+        self.assertEqual(data['chunks'][manifest['chunks'][2]]['offset'], 8)
+        self.assertEqual(data['chunks'][manifest['chunks'][2]]['length'], 2)
+        self.assertEqual(self.client.get(url, {'name': 'other'}).json(),
+                         {'objects': {}, 'chunks': {}})
+
+    @override_settings(OIDC_VERIFY_SSL=False)
+    def test_shared_artifact_kept_on_delete(self):
+        self.project.s3storage = S3.objects.create(
+            name='minio', host='minio.test', access_key='a', secret_key='s',
+            owner=self.project.owner, project=self.project)
+        self.project.save()
+        manifest = self.manifest(b'weights')
+        models = [Model.objects.create(uid=content_key(manifest['hash']),
+                                       name='m', version=version,
+                                       project=self.project,
+                                       content_hash=manifest['hash'],
+                                       manifest=manifest)
+                  for version in ('1.0', '1.1')]
+        with mock.patch('models.models.Minio') as minio:
+            models[0].delete()
+            minio.assert_not_called()
+            models[1].delete()
+            minio.return_value.remove_object.assert_called_once_with(
+                'models', content_key(manifest['hash']))
+
+    @override_settings(OIDC_VERIFY_SSL=False)
+    def test_artifact_of_other_storage_not_shared(self):
+        other = Project.objects.create_project(
+            name='test-dedup-other', owner=self.project.owner,
+            description='', repository='')
+        manifest = self.manifest(b'weights')
+        models = [Model.objects.create(uid=content_key(manifest['hash']),
+                                       name='m', version='1.0',
+                                       project=project,
+                                       s3=S3.objects.create(
+                                           name='minio', host=project.slug,
+                                           access_key='a', secret_key='s',
+                                           owner=project.owner,
+                                           project=project),
+                                       content_hash=manifest['hash'],
+                                       manifest=manifest)
+                  for project in (self.project, other)]
+        self.project.s3storage = models[0].s3
+        self.project.save()
+        with mock.patch('models.models.Minio') as minio:
+            models[0].delete()
+            minio.return_value.remove_object.assert_called_once_with(
+                'models', content_key(manifest['hash']))
+
+    def test_create_rejects_uid_not_matching_manifest(self):
+        ObjectType.objects.create(name='Model', slug='model')
+        manifest = self.manifest(b'weights')
+        url = reverse('api:model-list',
+                      kwargs={'project_pk': self.project.pk})
+        data = {'uid': content_key('0'*64), 'name': 'm',
+                'release_type': 'minor', 'version': '1.0',
+                'description': '', 'model_card': '', 'object_type': 'model',
+                'manifest': manifest}
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Model.objects.exists())
+
+        data['uid'] = content_key(manifest['hash'])
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Model.objects.get().uid, data['uid'])
+
+
+class PublishedModelCatalogTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('foo', 'foo@test.com', 'bar')
+        project = Project.objects.create_project(
+            name='test-catalog',
+            owner=user,
+            description='',
+            repository=''
+        )
+        self.pmodel = PublishedModel.objects.create(name='m', project=project)
+        for version, tag in [('1.0', 'old'), ('2.0', 'new')]:
+            model = Model.objects.create(uid='uid'+version, name='m',
+                                         version=version, project=project)
+            model.tags.add(tag)
+            self.pmodel.model_obj.add(
+                PublicModelObject.objects.create(model=model))
+        other = Model.objects.create(uid='uid3', name='n', project=project)
+        other.tags.add('other')
+        PublishedModel.objects.create(name='n', project=project).model_obj.add(
+            PublicModelObject.objects.create(model=other))
+
+    def test_latest_model_obj_is_maintained(self):
+        self.pmodel.refresh_from_db()
+        self.assertEqual(self.pmodel.latest_model_obj.model.version, '2.0')
+
+        self.pmodel.model_obj.remove(self.pmodel.latest_model_obj)
+        self.pmodel.refresh_from_db()
+        self.assertEqual(self.pmodel.latest_model_obj.model.version, '1.0')
+
+    def test_latest_model_obj_after_delete(self):
+        """
+        Test that deleting the latest object falls back to the previous one
+        """
+        url = reverse('models:details_public', kwargs={'id': self.pmodel.pk})
+        self.pmodel.refresh_from_db()
+        self.pmodel.latest_model_obj.delete()
+        self.pmodel.refresh_from_db()
+        self.assertEqual(self.pmodel.latest_model_obj.model.version, '1.0')
+        response = self.client.get(reverse('models:index'), {'tag': 'old'})
+        self.assertEqual(response.context['page'].paginator.count, 1)
+
+        self.pmodel.latest_model_obj.delete()
+        self.pmodel.refresh_from_db()
+        self.assertIsNone(self.pmodel.latest_model_obj)
+        # Not found pages redirect to the start page.
+        self.assertRedirects(self.client.get(url), '/',
+                             fetch_redirect_response=False)
+
+    def test_index_filters_on_latest_tags(self):
+        url = reverse('models:index')
+        response = self.client.get(url)
+        self.assertEqual(response.context['page'].paginator.count, 2)
+
+        response = self.client.get(url, {'tag': ['new', 'missing']})
+        self.assertEqual([pm.name for pm in response.context['page']], ['m'])
+        self.assertContains(response, '?tag=missing')
+
+        response = self.client.get(url, {'tag': 'old'})
+        self.assertEqual(response.context['page'].paginator.count, 0)
+
+
 class TestFixtures(TestCase):
     fixtures = ['models/fixtures/objecttype_fixtures.json']
 
@@ -33,4 +33,6 @@ urlpatterns = [
          views.upload_model_headline, name='upload_model_headline'),
     path('<user>/<project>/models/<int:id>/docker',
          views.add_docker_image, name='add_docker_image'),
+    path('<user>/<project>/models/<int:id>/metrics',
+         views.chart_data, name='chart_data'),
 ]
@@ -3,8 +3,9 @@ import logging
 import os
 import subprocess
 import uuid
-from collections import defaultdict
 from importlib.resources import path
+from itertools import groupby
+from operator import itemgetter
 from unicodedata import decimal
 
 import markdown
@@ -13,8 +14,9 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.files import File
+from django.core.paginator import Paginator
 from django.db.models import Q
-from django.http import HttpResponseRedirect
+from django.http import Http404, HttpResponseRedirect, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse, reverse_lazy
 from django.views.generic import View
@@ -22,14 +24,20 @@ from guardian.decorators import permission_required_or_403
 from guardian.mixins import PermissionRequiredMixin
 
 from apps.models import AppInstance, Apps
+from common.helpers import lttb
+from common.instrumentation import external_call
 from portal.models import PublicModelObject, PublishedModel
+from projects.helpers import get_sidebar_projects
 from projects.models import Environment, Project, ProjectLog
 
 from .forms import EnvironmentForm, ModelForm, UploadModelCardHeadlineForm
-from .helpers import get_download_url, set_artifact
-from .models import Metadata, Model, ModelLog, ObjectType
+from .helpers import (artifact_exists, artifact_manifest, content_key,
+                      get_download_url, set_artifact)
+from .models import MetricValue, Model, ModelLog, ObjectType
+
+CHART_MAX_POINTS = 200
+CHART_MAX_POINTS_LIMIT = 2000
 
-new_data = defaultdict(list)
 logger = logging.getLogger(__name__)
 
 
@@ -105,7 +113,8 @@ class ModelCreate(LoginRequiredMixin, PermissionRequiredMixin, View):
             cmd = 'kubectl get po -l release=' + app_release + \
                 ' -o jsonpath="{.items[0].metadata.name}"'
             try:
-                result = subprocess.check_output(cmd, shell=True)
+                with external_call('kubectl'):
+                    result = subprocess.check_output(cmd, shell=True)
                 # because the above subprocess run returns a byte-like object
                 app_pod = result.decode('utf-8')
             except subprocess.CalledProcessError:
@@ -121,15 +130,17 @@ class ModelCreate(LoginRequiredMixin, PermissionRequiredMixin, View):
                 os.chdir(temp_folder_path)
                 os.getcwd()
             except OSError as error:
-                print(error)
+                logger.warning('Failed to create %s: %s',
+                               temp_folder_path, error)
             # e.g. kubectl cp rfc058c6f-5fdb99c68c-kw5qb:/home/jovyan/work/project-vol/models ./models
             # Note: default namespace is assumed here
             cmd = 'kubectl cp ' + app_pod + ':/home/jovyan/work/' + model_persistent_vol + \
                 '/' + model_folder_name + ' ' + './' + model_folder_name
             try:
-                result = subprocess.check_output(cmd, shell=True)
-                print('LOG INFO SUBPROCESS - FOLDER COPY WITH KUBECTL: ',
-                      result.decode('utf-8'))
+                with external_call('kubectl'):
+                    result = subprocess.check_output(cmd, shell=True)
+                logger.debug('Model folder copied with kubectl: %s',
+                             result.decode('utf-8'))
             except (subprocess.CalledProcessError, FileNotFoundError):
                 messages.error(
                     request, 'Oops, something went wrong: Models folder could not be copied')
@@ -146,7 +157,7 @@ class ModelCreate(LoginRequiredMixin, PermissionRequiredMixin, View):
                 try:
                     result = subprocess.run(['tar', '--exclude={}'.format(
                         model_file), '-czvf', model_file, model_folder_name], stdout=subprocess.PIPE, check=True)
-                    print('LOG INFO SUBPROCESS - ARCHIVE CREATION: ', result)
+                    logger.debug('Model archive created: %s', result.args)
                 except (subprocess.CalledProcessError, FileNotFoundError):
                     messages.error(
                         request, "Oops, something went wrong: The archive for the model folder was not created!")
@@ -161,10 +172,17 @@ class ModelCreate(LoginRequiredMixin, PermissionRequiredMixin, View):
                 with open(model_card, 'r') as f:
                     model_card_html_string = f.read()
 
-            # Method from helpers.py, where S3 related methods exists
-            artifact_name = model_name + '_' + self.model_uid + '.tar'
-            status = set_artifact(artifact_name, model_file, model_folder_name,
-                                  model_S3, is_file=is_file, secure_mode=secure_mode)
+            # Artifacts are content addressed, equal bytes are stored once.
+            manifest = artifact_manifest(model_file)
+            artifact_name = content_key(manifest['hash'])
+            if artifact_exists(artifact_name, model_folder_name, model_S3,
+                               secure_mode=secure_mode):
+                logger.info('Artifact %s already stored', artifact_name)
+                status = True
+            else:
+                # Method from helpers.py, where S3 related methods exists
+                status = set_artifact(artifact_name, model_file, model_folder_name,
+                                      model_S3, is_file=is_file, secure_mode=secure_mode)
 
             if not status:
                 messages.error(
@@ -181,7 +199,9 @@ class ModelCreate(LoginRequiredMixin, PermissionRequiredMixin, View):
                               path=model_folder_name,
                               project=model_project,
                               s3=model_S3,
-                              access='PR')
+                              access='PR',
+                              content_hash=manifest['hash'],
+                              manifest=manifest)
             new_model.save()
 
             # Setting the model object type based on form input from user
@@ -195,7 +215,8 @@ class ModelCreate(LoginRequiredMixin, PermissionRequiredMixin, View):
                     os.system('rm -rf {}'.format(temp_folder_path))
                     os.chdir(settings.BASE_DIR)
             except OSError as error:
-                print(error)
+                logger.warning('Failed to clean up %s: %s',
+                               temp_folder_path, error)
 
             # Finally, we redirect
             return redirect(redirect_url)
@@ -206,11 +227,7 @@ class ModelCreate(LoginRequiredMixin, PermissionRequiredMixin, View):
 
 # Published models visible under the "Catalogs" menu
 def index(request, user=None, project=None, id=0):
-    try:
-        projects = Project.objects.filter(Q(owner=request.user) | Q(
-            authorized=request.user), status='active')
-    except Exception as err:
-        print("User not logged in.")
+    projects = get_sidebar_projects(request.user)
 
     if project:
         project = Project.objects.filter(slug=project).first()
@@ -221,61 +238,23 @@ def index(request, user=None, project=None, id=0):
     else:
         # TODO move tags to separate djapp
 
-        # create session object to store info about model and their tag counts
-        if "model_tags" not in request.session:
-            request.session['model_tags'] = {}
-        # tag_count from the get request helps set num_tags which helps set the number of tags to show in the template
-        if "tag_count" in request.GET:
-            # add model id to model_tags object
-            if "model_id_add" in request.GET:
-                num_tags = int(request.GET['tag_count'])
-                id = int(request.GET['model_id_add'])
-                request.session['model_tags'][str(id)] = num_tags
-            # remove model id from model_tags object
-            if "model_id_remove" in request.GET:
-                num_tags = int(request.GET['tag_count'])
-                id = int(request.GET['model_id_remove'])
-                if str(id) in request.session['model_tags']:
-                    request.session['model_tags'].pop(str(id))
-
-        # reset model_tags if Model Tab on Sidebar pressed
-        if id == 0:
-            if 'tf_add' not in request.GET and 'tf_remove' not in request.GET:
-                request.session['model_tags'] = {}
+        # Filter state lives in the URL: ?tag=<name> (repeatable) selects
+        # models whose latest version has any of the tags, ?expand=<id>
+        # shows all tags of a model.
+        tag_filters = request.GET.getlist('tag')
+        expanded = request.GET.getlist('expand')
 
         media_url = settings.MEDIA_URL
         published_models = PublishedModel.objects.all()
-
-        # create session object to store ids for tag seacrh if it does not exist
-        if "tag_filters" not in request.session:
-            request.session['tag_filters'] = []
-        if 'tf_add' in request.GET:
-            tag = request.GET['tf_add']
-            if tag not in request.session['tag_filters']:
-                request.session['tag_filters'].append(tag)
-        elif 'tf_remove' in request.GET:
-            tag = request.GET['tf_remove']
-            if tag in request.session['tag_filters']:
-                request.session['tag_filters'].remove(tag)
-        elif "tag_count" not in request.GET:
-            tag = ""
-            request.session['tag_filters'] = []
-        print("tag_filters: ", request.session['tag_filters'])
-
-        # changed list of published model only if tag filters are present
-        if request.session['tag_filters']:
-            tagged_published_models = []
-            for model in published_models:
-                model_objs = model.model_obj.order_by('-model__version')
-                latest_model_obj = model_objs[0]
-                mymodel = latest_model_obj.model
-                for t in mymodel.tags.all():
-                    if t in request.session['tag_filters']:
-                        tagged_published_models.append(model)
-                        break
-            published_models = tagged_published_models
-
-        request.session.modified = True
+        if tag_filters:
+            published_models = published_models.filter(
+                latest_model_obj__model__in=Model.objects.filter(
+                    tags__name__in=tag_filters).values('pk'))
+        published_models = published_models.select_related(
+            'latest_model_obj__model').prefetch_related(
+            'latest_model_obj__model__tags').order_by('-created_on')
+        page = Paginator(published_models, settings.CATALOG_PAGE_SIZE).get_page(
+            request.GET.get('page'))
 
         return render(request, 'models/index.html', locals())
 
@@ -289,8 +268,7 @@ def list(request, user, project):
     # Will be added to locals() which create a dict context with local variables
     menu = dict()
     menu['objects'] = 'active'
-    projects = Project.objects.filter(Q(owner=request.user) | Q(
-        authorized=request.user), status='active')
+    projects = get_sidebar_projects(request.user)
     project = Project.objects.filter(Q(owner=request.user) | Q(
         authorized=request.user), status='active', slug=project).distinct().first()
     models = Model.objects.filter(project=project).order_by(
@@ -313,7 +291,7 @@ def unpublish_model(request, user, project, id):
         pmos.delete()
         pmodel.delete()
     except Exception as err:
-        print(err)
+        logger.warning('Failed to unpublish model %s: %s', model.pk, err)
     model.access = "PR"
     model.save()
     return HttpResponseRedirect(reverse('models:list', kwargs={'user': user, 'project': project}))
@@ -323,7 +301,6 @@ def unpublish_model(request, user, project, id):
 @permission_required_or_403('can_view_project',
                             (Project, 'slug', 'project'))
 def publish_model(request, user, project, id):
-    print("PUBLISHING MODEL")
     import random
 
     import s3fs
@@ -332,7 +309,7 @@ def publish_model(request, user, project, id):
 
     # TODO: Check that user has access to this particular model.
     model = Model.objects.get(pk=id)
-    print(model)
+    logger.info('Publishing model %s', model.pk)
     # Default behavior is that all versions of a model are published.
     models = Model.objects.filter(id=id, name=model.name, project=model.project)
 
@@ -384,7 +361,6 @@ def add_tag(request, published_id, id):
     previous = model.get_access_display()
     if request.method == 'POST':
         new_tag = request.POST.get('tag', '')
-        print("New Tag: ", new_tag)
         model.tags.add(new_tag)
         model.save()
     return HttpResponseRedirect(reverse('models:details_public', kwargs={'id': published_id}))
@@ -395,9 +371,7 @@ def remove_tag(request, published_id, id):
     model = Model.objects.filter(pk=id).first()
     previous = model.get_access_display()
     if request.method == 'POST':
-        print(request.POST)
         new_tag = request.POST.get('tag', '')
-        print("Remove Tag: ", new_tag)
         model.tags.remove(new_tag)
         model.save()
 
@@ -412,7 +386,6 @@ def add_tag_private(request, user, project, id):
     previous = model.get_access_display()
     if request.method == 'POST':
         new_tag = request.POST.get('tag', '')
-        print("New Tag: ", new_tag)
         model.tags.add(new_tag)
         model.save()
 
@@ -426,9 +399,7 @@ def remove_tag_private(request, user, project, id):
     model = Model.objects.filter(pk=id).first()
     previous = model.get_access_display()
     if request.method == 'POST':
-        print(request.POST)
         new_tag = request.POST.get('tag', '')
-        print("Remove Tag: ", new_tag)
         model.tags.remove(new_tag)
         model.save()
 
@@ -579,10 +550,9 @@ def details(request, user, project, id):
             'cpu_details': ast.literal_eval(log.cpu_details)
         })
 
-    md_objects = Metadata.objects.filter(
-        project=project.name, trained_model=model)
-    if md_objects:
-        metrics = get_chart_data(md_objects)
+    # Only the metric keys are rendered, the series are fetched from chart_data
+    metrics = MetricValue.objects.filter(
+        project=project.name, trained_model=model).order_by('key').values_list('key', flat=True).distinct()
 
     filename = None
     readme = None
@@ -599,62 +569,68 @@ def details(request, user, project, id):
                 md = markdown.Markdown(extensions=['extra'])
                 readme = md.convert(payload['readme'])
     except Exception as e:
-        logger.error(
-            "Failed to get response from {} with error: {}".format(url, e))
+        logger.error("Failed to get response from %s with error: %s", url, e)
 
     return render(request, 'models_details.html', locals())
 
 
-def get_chart_data(md_objects):
-    new_data.clear()
-    metrics_pre = []
+def get_chart_data(project_name, trained_model, metric=None, max_points=CHART_MAX_POINTS):
+    """
+    Builds chart-ready series (one per metric key) from the MetricValue table
+    in a single query. Series longer than max_points are downsampled.
+    """
+    values = MetricValue.objects.filter(
+        project=project_name, trained_model=trained_model)
+    if metric:
+        values = values.filter(key=metric)
+    values = values.order_by('key', 'metadata_id').values_list(
+        'key', 'run_id', 'value')
+
     metrics = []
-    for md_item in md_objects:
-        metrics_pre.append({
-            'run_id': md_item.run_id,
-            'metrics': ast.literal_eval(md_item.metrics),
-            'parameters': ast.literal_eval(md_item.parameters)
-        })
-    for m in metrics_pre:
-        for key, value in m["metrics"].items():
-            new_data[key].append([m["run_id"], value, m["parameters"]])
-    for key, value in new_data.items():
-        data = []
-        labels = []
-        params = []
-        run_id = []
-        run_counter = 0
-        for item in value:
-            run_counter += 1
-            labels.append("Run {}".format(run_counter))
-            run_id.append(item[0])
-            data.append(item[1])
-            params.append(item[2])
+    for key, rows in groupby(values.iterator(), key=itemgetter(0)):
+        points = [(run_counter, value, run_id)
+                  for run_counter, (_, run_id, value) in enumerate(rows, start=1)]
+        total_runs = len(points)
+        points = lttb(points, max_points)
         metrics.append({
             "metric": key,
             "details": {
-                "run_id": run_id,
-                "labels": labels,
-                "data": data,
-                "params": params
+                "run_id": [p[2] for p in points],
+                "labels": ["Run {}".format(p[0]) for p in points],
+                "data": [p[1] for p in points],
+                "total_runs": total_runs
             }
         })
     return metrics
 
 
+@login_required
+@permission_required_or_403('can_view_project',
+                            (Project, 'slug', 'project'))
+def chart_data(request, user, project, id):
+    project = Project.objects.filter(slug=project).first()
+    model = get_object_or_404(Model, pk=id, project=project)
+    try:
+        max_points = int(request.GET.get('points', CHART_MAX_POINTS))
+    except ValueError:
+        max_points = CHART_MAX_POINTS
+    max_points = min(max_points, CHART_MAX_POINTS_LIMIT)
+
+    metrics = get_chart_data(project.name, model,
+                             metric=request.GET.get('metric'),
+                             max_points=max_points)
+    return JsonResponse({'metrics': metrics})
+
+
 def import_model(request, id):
-    print("IMPORTING MODEL")
+    logger.debug('Import of model %s requested', id)
 
 
 @login_required
 @permission_required_or_403('can_view_project',
                             (Project, 'slug', 'project'))
 def details_private(request, user, project, id):
-    try:
-        projects = Project.objects.filter(Q(owner=request.user) | Q(
-            authorized=request.user), status='active')
-    except Exception as err:
-        print("User not logged in.")
+    projects = get_sidebar_projects(request.user)
     base_template = 'base.html'
 
     project_slug = project
@@ -665,7 +641,7 @@ def details_private(request, user, project, id):
         base_template = 'projects/base.html'
     except Exception as err:
         project = []
-        print(err)
+        logger.warning('Failed to fetch project %s: %s', project_slug, err)
     if not project:
         base_template = 'base.html'
 
@@ -674,13 +650,10 @@ def details_private(request, user, project, id):
     model = Model.objects.get(pk=id)
     all_tags = Model.tags.tag_model.objects.all()
     private = True
-    print("MY TAGS: ", model.tags, user)
     # published_model = PublishedModel(pk=id)
     # model_objs = published_model.model_obj.order_by('-model__version')
     # latest_model_obj = model_objs[0]
     # model = latest_model_obj.model
-    # print(model_objs)
-    # print(latest_model_obj)
     bucket = model.bucket
     uid = model.uid
 
@@ -690,12 +663,7 @@ def details_private(request, user, project, id):
 def details_public(request, id):
     private = False
     all_tags = Model.tags.tag_model.objects.all()
-    print("Details tag ID:", id)
-    try:
-        projects = Project.objects.filter(Q(owner=request.user) | Q(
-            authorized=request.user), status='active')
-    except Exception as err:
-        print("User not logged in.")
+    projects = get_sidebar_projects(request.user)
     base_template = 'base.html'
     if 'project' in request.session:
         project_slug = request.session['project']
@@ -708,21 +676,21 @@ def details_public(request, id):
                 base_template = 'projects/base.html'
             except Exception as err:
                 project = []
-                print(err)
+                logger.warning('Failed to fetch project %s: %s',
+                               project_slug, err)
             if not project:
                 base_template = 'base.html'
     else:
         base_template = 'base.html'
 
     media_url = settings.MEDIA_URL
-    print(media_url, flush=True)
-    published_model = PublishedModel(pk=id)
-    print(published_model, flush=True)
+    published_model = get_object_or_404(
+        PublishedModel.objects.select_related('latest_model_obj__model'), pk=id)
     model_objs = published_model.model_obj.order_by('-model__version')
-    latest_model_obj = model_objs[0]
+    latest_model_obj = published_model.latest_model_obj or model_objs.first()
+    if latest_model_obj is None:
+        raise Http404('Model {} has no published versions.'.format(id))
     model = latest_model_obj.model
-    print(model_objs, flush=True)
-    print(latest_model_obj, flush=True)
 
     return render(request, 'models_details_public.html', locals())
 
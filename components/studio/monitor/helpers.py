@@ -1,7 +1,14 @@
 import logging
+from collections import defaultdict
 
-import requests as r
-from django.conf import settings
+from django.db import connection
+from django.db.models import Avg, CharField, F, Sum, Value
+from django.db.models.fields.json import KeyTextTransform, KeyTransform
+from django.db.models.functions import Coalesce
+
+from apps.models import ResourceData
+
+from . import prometheus
 
 
 def pod_up(app_name):
@@ -10,23 +17,8 @@ def pod_up(app_name):
     try:
         query_up = 'sum(up{app="'+app_name+'"})'
         query_count = 'count(up{app="'+app_name+'"})'
-        print(query_up)
-        print(query_count)
-        print(settings.PROMETHEUS_SVC+'/api/v1/query')
-        response = r.get(settings.PROMETHEUS_SVC +
-                         '/api/v1/query', params={'query': query_up})
-        num_pods_up = 0
-        num_pods_count = 0
-        if response:
-            print(response.text)
-            result_up_json = response.json()
-            result_up = result_up_json['data']['result']
-
-        response = r.get(settings.PROMETHEUS_SVC +
-                         '/api/v1/query', params={'query': query_count})
-        if response:
-            result_count_json = response.json()
-            result_count = result_count_json['data']['result']
+        result_up, result_count = prometheus.query_many(
+            [query_up, query_count])
         num_pods_up = result_up[0]['value'][1]
         num_pods_count = result_count[0]['value'][1]
     except:
@@ -43,10 +35,7 @@ def get_count_over_time(name, app_name, path, status_code, time_span):
     try:
         query = 'sum(max_over_time('+name+'{app="'+app_name+'", path="/' + \
             path+'/", status_code="'+status_code+'"}['+time_span+']))'
-        response = r.get(settings.PROMETHEUS_SVC +
-                         '/api/v1/query', params={'query': query})
-        if response:
-            total_count = response.json()['data']['result'][0]['value'][1]
+        total_count = prometheus.scalar(prometheus.query(query), 0)
     except:
         print('Failed to get total count for: {}, {}, {}.'.format(
             app_name, path, status_code))
@@ -56,10 +45,7 @@ def get_count_over_time(name, app_name, path, status_code, time_span):
 
 def get_total_labs_cpu_usage_60s(project_slug):
     query = 'sum(sum (rate (container_cpu_usage_seconds_total{image!=""}[60s])) by (pod) * on(pod) group_left kube_pod_labels{label_project="'+project_slug+'", label_app="lab"})'
-    print(query)
-    response = r.get(settings.PROMETHEUS_SVC +
-                     '/api/v1/query', params={'query': query})
-    result = response.json()['data']['result']
+    result = prometheus.query(query)
     if result:
         cpu_usage = result[0]['value'][1]
         return "{:.1f}".format(float(cpu_usage))
@@ -69,11 +55,7 @@ def get_total_labs_cpu_usage_60s(project_slug):
 def get_total_cpu_usage_60s_ts(project_slug, resource_type):
     query = '''(sum (sum ( irate (container_cpu_usage_seconds_total{image!=""}[60s] ) ) by (pod) * on(pod) group_left kube_pod_labels{label_type="''' + \
         resource_type+'",label_project="'+project_slug+'"})) [30m:30s]'
-    print(query)
-    response = r.get(settings.PROMETHEUS_SVC +
-                     '/api/v1/query', params={'query': query})
-    # print(response.json())
-    result = response.json()['data']['result']
+    result = prometheus.query(query)
     if result:
         return result[0]['values']
     return 0
@@ -82,9 +64,7 @@ def get_total_cpu_usage_60s_ts(project_slug, resource_type):
 def get_total_labs_memory_usage_60s(project_slug):
     query = 'sum(sum (rate (container_memory_usage_bytes{image!=""}[60s])) by (pod) * on(pod) group_left kube_pod_labels{label_project="' + \
         project_slug+'", label_app="lab"})'
-    response = r.get(settings.PROMETHEUS_SVC +
-                     '/api/v1/query', params={'query': query})
-    result = response.json()['data']['result']
+    result = prometheus.query(query)
     if result:
         memory_usage = result[0]['value'][1]
         return "{:.3f}".format(float(memory_usage)/1e9*0.931323)
@@ -93,11 +73,7 @@ def get_total_labs_memory_usage_60s(project_slug):
 
 def get_labs_memory_requests(project_slug):
     query = 'sum(kube_pod_container_resource_requests_memory_bytes * on(pod) group_left kube_pod_labels{label_project="'+project_slug+'"})'
-    # query = 'kube_pod_container_resource_requests_cpu_cores'
-
-    response = r.get(settings.PROMETHEUS_SVC +
-                     '/api/v1/query', params={'query': query})
-    result = response.json()['data']['result']
+    result = prometheus.query(query)
     if result:
         memory = result[0]['value'][1]
         return "{:.2f}".format(float(memory)/1e9*0.931323)
@@ -106,16 +82,19 @@ def get_labs_memory_requests(project_slug):
 
 def get_labs_cpu_requests(project_slug):
     query = 'sum(kube_pod_container_resource_requests_cpu_cores * on(pod) group_left kube_pod_labels{label_project="'+project_slug+'"})'
-
-    response = r.get(settings.PROMETHEUS_SVC +
-                     '/api/v1/query', params={'query': query})
-    result = response.json()['data']['result']
+    result = prometheus.query(query)
     if result:
         num_cpus = result[0]['value'][1]
         return num_cpus
     return 0
 
 
+def _resource_by_app_query(project_slug, resource_type, q_type, mem_or_cpu):
+    return 'sum by (label_app) (kube_pod_container_resource_'+q_type+'_'+mem_or_cpu + \
+        ' * on(pod) group_left(label_app) kube_pod_labels{label_project="' + \
+        project_slug+'", label_type="'+resource_type+'"})'
+
+
 def get_resource(project_slug, resource_type, q_type, mem_or_cpu, app_name=[]):
     query = 'sum(kube_pod_container_resource_'+q_type+'_'+mem_or_cpu + \
         ' * on(pod) group_left kube_pod_labels{label_project="' + \
@@ -124,18 +103,106 @@ def get_resource(project_slug, resource_type, q_type, mem_or_cpu, app_name=[]):
         query += ', label_app="'+app_name+'"})'
     else:
         query += '})'
-    response = r.get(settings.PROMETHEUS_SVC +
-                     '/api/v1/query', params={'query': query})
-    result = response.json()['data']['result']
-    if result:
-        res = result[0]['value'][1]
-        return res
-    return '0.0'
+    return prometheus.scalar(prometheus.query(query))
+
+
+RESOURCE_KEYS = [('limits', 'cpu_cores'), ('requests', 'cpu_cores'),
+                 ('limits', 'memory_bytes'), ('requests', 'memory_bytes')]
+
+
+def get_resources_by_app(project_slug, resource_type):
+    """
+    Requests and limits of every app of a type in a project, keyed by
+    label_app and then by '<q_type>_<mem_or_cpu>'. Costs four concurrent
+    grouped queries regardless of the number of apps.
+    """
+    queries = [_resource_by_app_query(project_slug, resource_type, q_type, mem_or_cpu)
+               for q_type, mem_or_cpu in RESOURCE_KEYS]
+    results = prometheus.query_many(queries)
+    resources = dict()
+    for (q_type, mem_or_cpu), result in zip(RESOURCE_KEYS, results):
+        for app_name, value in prometheus.by_label(result, 'label_app').items():
+            resources.setdefault(app_name, dict())[
+                q_type+'_'+mem_or_cpu] = value
+    return resources
 
 
 def get_all():
     query = 'kube_pod_container_resource_limits_memory_bytes * on(pod) group_left kube_pod_labels{label_type="lab", label_project="stochss-dev-tiz"}'
-    response = r.get(settings.PROMETHEUS_SVC +
-                     '/api/v1/query', params={'query': query})
-    result = response.json()['data']['result']
+    result = prometheus.query(query)
     print(result)
+
+
+def _bucket(width):
+    # Integer division on the integer epoch column floors to the bucket start.
+    return (F('time') / Value(width)) * Value(width)
+
+
+def get_usage(project_slug, start, end, width):
+    """
+    Resource usage of a project between start and end (epoch seconds),
+    aggregated in SQL into buckets of width seconds.
+
+    Returns a dict with the bucket start times, the project total as
+    avg/min/max envelopes (min/max are taken over the sampled totals in the
+    bucket, so short peaks survive downsampling), and per-app and per-flavor
+    averages aligned with the bucket times.
+    """
+    points = ResourceData.objects.filter(
+        time__gte=start, time__lt=end, appinstance__project__slug=project_slug)
+
+    # Totals: sum the apps per sample time, then aggregate the samples per
+    # bucket. The ORM cannot aggregate over an aggregate, so the grouped
+    # queryset is used as a subquery.
+    per_sample = points.values('time').annotate(
+        cpu=Sum('cpu'), mem=Sum('mem')).order_by()
+    inner_sql, inner_params = per_sample.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT (t.time / %s) * %s AS bucket, '
+            'AVG(t.cpu), MIN(t.cpu), MAX(t.cpu), '
+            'AVG(t.mem), MIN(t.mem), MAX(t.mem) '
+            'FROM (' + inner_sql + ') t GROUP BY bucket ORDER BY bucket',
+            [width, width] + list(inner_params))
+        rows = cursor.fetchall()
+
+    times = [row[0] for row in rows]
+    total = {
+        'cpu': {'avg': [], 'min': [], 'max': []},
+        'mem': {'avg': [], 'min': [], 'max': []},
+    }
+    for row in rows:
+        for i, stat in enumerate(['avg', 'min', 'max']):
+            total['cpu'][stat].append(float(row[1+i]))
+            total['mem'][stat].append(float(row[4+i]))
+
+    # Per app: average usage of every app in every bucket.
+    per_app = points.annotate(bucket=_bucket(width)).values(
+        'bucket', 'appinstance', 'appinstance__name',
+        flavor=Coalesce(KeyTextTransform('name', KeyTransform(
+            'flavor', 'appinstance__parameters')), Value('unknown'),
+            output_field=CharField())
+    ).annotate(cpu=Avg('cpu'), mem=Avg('mem')).order_by()
+
+    index = {t: i for i, t in enumerate(times)}
+    apps = dict()
+    flavors = defaultdict(lambda: {'cpu': [0.0]*len(times),
+                                   'mem': [0.0]*len(times)})
+    for row in per_app:
+        i = index.get(row['bucket'])
+        if i is None:
+            continue
+        if row['appinstance'] not in apps:
+            apps[row['appinstance']] = {'name': row['appinstance__name'],
+                                        'cpu': [0.0]*len(times),
+                                        'mem': [0.0]*len(times)}
+        for series in (apps[row['appinstance']], flavors[row['flavor']]):
+            series['cpu'][i] += row['cpu']
+            series['mem'][i] += row['mem']
+
+    return {
+        'time': times,
+        'total': total,
+        'apps': apps,
+        'flavors': dict(flavors),
+    }
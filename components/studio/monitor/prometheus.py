@@ -0,0 +1,110 @@
+"""
+Thin Prometheus HTTP API client shared by the monitor views.
+
+All requests go through one pooled session with a timeout, results are
+cached for PROMETHEUS_CACHE_TTL seconds keyed by query, time and step, and
+independent queries can be fanned out concurrently with query_many.
+"""
+import contextvars
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+
+from common.instrumentation import external_call
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = 8
+
+_session = None
+_session_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS,
+                               thread_name_prefix='prometheus')
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1,
+                                      pool_maxsize=MAX_WORKERS)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def _cache_key(path, params):
+    raw = path + '|' + '|'.join('{}={}'.format(k, params[k])
+                                for k in sorted(params))
+    return 'prometheus:' + hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def _get(path, params):
+    key = _cache_key(path, params)
+    result = cache.get(key)
+    if result is not None:
+        return result
+    try:
+        with external_call('prometheus'):
+            response = get_session().get(settings.PROMETHEUS_SVC + path,
+                                         params=params,
+                                         timeout=settings.PROMETHEUS_TIMEOUT)
+        response.raise_for_status()
+        result = response.json()['data']['result']
+    except (requests.RequestException, ValueError, KeyError) as err:
+        logger.warning('Prometheus query failed: %s (%s)',
+                       params.get('query'), err)
+        return None
+    cache.set(key, result, settings.PROMETHEUS_CACHE_TTL)
+    return result
+
+
+def query(promql, time=None):
+    """ Instant query, returns the result vector or None on failure. """
+    params = {'query': promql}
+    if time is not None:
+        params['time'] = time
+    return _get('/api/v1/query', params)
+
+
+def query_range(promql, start, end, step):
+    """ Range query, returns the result matrix or None on failure. """
+    return _get('/api/v1/query_range', {'query': promql, 'start': start,
+                                        'end': end, 'step': step})
+
+
+def query_many(queries):
+    """
+    Runs several instant queries concurrently, results in the same order.
+    Each item is a PromQL string or a (promql, time) tuple.
+    """
+    # Each query runs in a copy of the caller's context, so that its time is
+    # added to the request being instrumented.
+    futures = [_executor.submit(contextvars.copy_context().run, query,
+                                *(q if isinstance(q, tuple) else (q,)))
+               for q in queries]
+    return [f.result() for f in futures]
+
+
+def scalar(result, default='0.0'):
+    """ Value of the first sample of an instant result, as a string. """
+    if result:
+        return result[0]['value'][1]
+    return default
+
+
+def by_label(result, label):
+    """ Maps label value to sample value for a grouped instant result. """
+    values = dict()
+    for sample in result or []:
+        values[sample['metric'].get(label, '')] = sample['value'][1]
+    return values
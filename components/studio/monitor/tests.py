@@ -1,3 +1,117 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from apps.models import AppInstance, Apps, ResourceData
+from projects.models import Project
+
+from . import prometheus
+from .helpers import get_resources_by_app, get_usage
+
+
+def _vector(label, samples):
+    return {'status': 'success',
+            'data': {'resultType': 'vector',
+                     'result': [{'metric': {label: name}, 'value': [0, value]}
+                                for name, value in samples]}}
+
+
+class PrometheusClientTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_query_is_cached(self):
+        response = mock.Mock()
+        response.json.return_value = _vector('app', [('lab', '1')])
+        with mock.patch.object(prometheus.get_session(), 'get',
+                               return_value=response) as get:
+            first = prometheus.query('up')
+            second = prometheus.query('up')
+        self.assertEqual(first, second)
+        self.assertEqual(get.call_count, 1)
+        self.assertIn('timeout', get.call_args[1])
+
+    def test_failed_query_returns_none(self):
+        with mock.patch.object(prometheus.get_session(), 'get',
+                               side_effect=prometheus.requests.ConnectionError), \
+                self.assertLogs('monitor.prometheus', 'WARNING'):
+            self.assertIsNone(prometheus.query('up'))
+
+    def test_resources_by_app_uses_grouped_queries(self):
+        """
+        Test that requests/limits of all apps cost four queries
+        """
+        response = mock.Mock()
+        response.json.return_value = _vector(
+            'label_app', [('lab-1', '2'), ('lab-2', '0.5')])
+        with mock.patch.object(prometheus.get_session(), 'get',
+                               return_value=response) as get:
+            resources = get_resources_by_app('project', 'lab')
+        self.assertEqual(get.call_count, 4)
+        for call in get.call_args_list:
+            self.assertTrue(call[1]['params']['query'].startswith(
+                'sum by (label_app)'))
+        self.assertEqual(resources['lab-1']['limits_cpu_cores'], '2')
+        self.assertEqual(resources['lab-2']['requests_memory_bytes'], '0.5')
+
+
+class UsageTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('foo', 'foo@test.com', 'bar')
+        self.project = Project.objects.create_project(
+            name='test-usage',
+            owner=user,
+            description='',
+            repository=''
+        )
+        app = Apps.objects.create(name='Jupyter', slug='jupyter')
+        small = AppInstance.objects.create(
+            name='lab-1', app=app, project=self.project, owner=user,
+            parameters={'flavor': {'name': 'small'}})
+        large = AppInstance.objects.create(
+            name='lab-2', app=app, project=self.project, owner=user,
+            parameters={})
+        self.start = 1000200
+        data = []
+        # One sample per minute for an hour, with a single spike at 30 min.
+        for i in range(60):
+            t = self.start + 60*i
+            data.append(ResourceData(appinstance=small, cpu=100, mem=10,
+                                     gpu=0, time=t))
+            data.append(ResourceData(appinstance=large,
+                                     cpu=1000 if i == 30 else 200,
+                                     mem=20, gpu=0, time=t))
+        ResourceData.objects.bulk_create(data)
+        self.client.login(username='foo', password='bar')
+
+    def test_get_usage_buckets(self):
+        """
+        Test that samples are bucketed with avg/min/max and broken down
+        """
+        usage = get_usage(self.project.slug, self.start,
+                          self.start+3600, 600)
+        self.assertEqual(len(usage['time']), 6)
+        self.assertEqual(usage['time'][0], self.start)
+        cpu = usage['total']['cpu']
+        self.assertEqual(max(cpu['max']), 1100)
+        self.assertEqual(min(cpu['min']), 300)
+        self.assertEqual(set(usage['flavors']), {'small', 'unknown'})
+        self.assertEqual(usage['flavors']['small']['mem'], [10.0]*6)
+        self.assertEqual(sorted(a['name'] for a in usage['apps'].values()),
+                         ['lab-1', 'lab-2'])
+
+    def test_usage_view(self):
+        with mock.patch('monitor.views.time.time',
+                        return_value=self.start+3600):
+            response = self.client.get(
+                reverse('monitor:usage',
+                        kwargs={'user': 'foo', 'project': self.project.slug}),
+                {'window': 3600, 'points': 12})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['step'], 300)
+        self.assertEqual(len(data['labels']), len(data['data_cpu']))
+        self.assertLessEqual(len(data['labels']), 13)
@@ -1,4 +1,3 @@
-import itertools
 import logging
 import time
 from datetime import datetime
@@ -6,36 +5,36 @@ from datetime import datetime
 from django.conf import settings as sett
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.db.models import Count, F, Sum
+from django.db.models import Count
 from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
 from django.shortcuts import render, reverse
+from guardian.decorators import permission_required_or_403
 
-from apps.models import AppInstance, ResourceData
+from apps.models import AppInstance
 # from deployments.models import DeploymentInstance
 from models.models import Model
+from projects.helpers import get_sidebar_projects
 from projects.models import Project
 
 from .helpers import (get_all, get_labs_cpu_requests, get_labs_memory_requests,
-                      get_resource, get_total_cpu_usage_60s_ts,
+                      get_resources_by_app, get_total_cpu_usage_60s_ts,
                       get_total_labs_cpu_usage_60s,
-                      get_total_labs_memory_usage_60s)
+                      get_total_labs_memory_usage_60s, get_usage)
 
 
 def get_cpu_mem(resources, project_slug, resource_type):
     res_list = list()
+    usage = get_resources_by_app(project_slug, resource_type)
     for resource in resources:
-        res_cpu_limit = get_resource(
-            project_slug, resource_type, 'limits', 'cpu_cores', app_name=resource.appname)
-        res_cpu_limit = "{:.2f}".format(float(res_cpu_limit))
-        res_cpu_request = get_resource(
-            project_slug, resource_type, 'requests', 'cpu_cores', app_name=resource.appname)
-        res_cpu_limit = "{:.2f}".format(float(res_cpu_request))
-        res_mem_limit = get_resource(
-            project_slug, resource_type, 'limits', 'memory_bytes', app_name=resource.appname)
-        res_mem_limit = "{:.2f}".format(float(res_mem_limit)/1e9*0.931323)
-        res_mem_request = get_resource(
-            project_slug, resource_type, 'requests', 'memory_bytes', app_name=resource.appname)
-        res_mem_request = "{:.2f}".format(float(res_mem_request)/1e9*0.931323)
+        res_usage = usage.get(resource.appname, dict())
+        res_cpu_limit = "{:.2f}".format(
+            float(res_usage.get('limits_cpu_cores', '0.0')))
+        res_cpu_request = "{:.2f}".format(
+            float(res_usage.get('requests_cpu_cores', '0.0')))
+        res_mem_limit = "{:.2f}".format(
+            float(res_usage.get('limits_memory_bytes', '0.0'))/1e9*0.931323)
+        res_mem_request = "{:.2f}".format(
+            float(res_usage.get('requests_memory_bytes', '0.0'))/1e9*0.931323)
 
         if resource_type == 'lab':
             res_owner = resource.lab_session_owner.username
@@ -85,12 +84,7 @@ def liveout(request, user, project):
 
 @login_required
 def overview(request, user, project):
-    try:
-        projects = Project.objects.filter(Q(owner=request.user) | Q(
-            authorized=request.user), status='active').distinct('pk')
-    except TypeError as err:
-        projects = []
-        print(err)
+    projects = get_sidebar_projects(request.user)
 
     is_authorized = True
     user_permissions = get_permissions(request, project, sett.MONITOR_PERM)
@@ -182,48 +176,43 @@ def cpuchart(request, user, project, resource_type):
     })
 
 
-def usage(request, user, project):
+# Raw samples are kept for 48 hours, see apps.tasks.clean_resource_usage.
+USAGE_MAX_WINDOW = 48*3600
+USAGE_DEFAULT_WINDOW = 2*3600
+USAGE_DEFAULT_POINTS = 200
+USAGE_MAX_POINTS = 1000
 
-    curr_timestamp = time.time()
-    points = ResourceData.objects.filter(
-        time__gte=curr_timestamp-2*3600, appinstance__project__slug=project).order_by('time')
-    all_cpus = list()
-    for point in points:
-        all_cpus.append(point.cpu)
-    # print("NUMBER OF POINTS")
-    # print(len(all_cpus))
-    # print("MAX:")
-    # print(max(all_cpus))
-    # print(all_cpus)
-    total = points.annotate(timeP=F('time')).values(
-        'timeP').annotate(total_cpu=Sum('cpu'), total_mem=Sum('mem'))
-    # print(total)
-
-    labels = list(total.values_list('timeP'))
-    labels = list(itertools.chain.from_iterable(labels))
-    step = 1
-    np = 200
-    if len(labels) > np:
-        step = round(len(labels)/np)
-    labels = labels[::step]
-    x_data = list()
-    for label in labels:
-        x_data.append(datetime.fromtimestamp(label).strftime('%H:%M:%S'))
-
-    total_mem = list(total.values_list('total_mem'))
-    total_mem = list(itertools.chain.from_iterable(total_mem))[::step]
-
-    total_cpu = list(total.values_list('total_cpu'))
-    # print("MAX CPU")
-    # print(max(total_cpu))
-    total_cpu = list(itertools.chain.from_iterable(total_cpu))[::step]
-    # print("MAX CPU")
-    # print(max(total_cpu))
-
-    # print(len(total_cpu))
 
+@login_required
+@permission_required_or_403('can_view_project',
+                            (Project, 'slug', 'project'))
+def usage(request, user, project):
+    """
+    Project resource usage for the last ?window= seconds (default 2 hours)
+    in at most ?points= buckets (default 200). The response keeps the
+    labels/data_cpu/data_mem keys used by the overview charts.
+    """
+    try:
+        window = int(request.GET.get('window', USAGE_DEFAULT_WINDOW))
+        points = int(request.GET.get('points', USAGE_DEFAULT_POINTS))
+    except ValueError:
+        return HttpResponse('window and points must be integers.', status=400)
+    window = min(max(window, 60), USAGE_MAX_WINDOW)
+    points = min(max(points, 1), USAGE_MAX_POINTS)
+
+    end = int(time.time())
+    start = end-window
+    width = max(-(-window // points), 1)
+    data = get_usage(project, start, end, width)
+
+    labels = [datetime.fromtimestamp(t).strftime('%H:%M:%S')
+              for t in data['time']]
     return JsonResponse(data={
-        'labels': x_data,
-        'data_cpu': total_cpu,
-        'data_mem': total_mem
+        'labels': labels,
+        'data_cpu': data['total']['cpu']['avg'],
+        'data_mem': data['total']['mem']['avg'],
+        'start': start,
+        'end': end,
+        'step': width,
+        **data,
     })
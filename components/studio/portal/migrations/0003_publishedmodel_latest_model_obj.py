@@ -0,0 +1,19 @@
+# Generated by Django 3.2.11 on 2026-10-19 16:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publishedmodel',
+            name='latest_model_obj',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='portal.publicmodelobject'),
+        ),
+    ]
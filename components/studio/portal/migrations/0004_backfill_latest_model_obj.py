@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def backfill_latest_model_obj(apps, schema_editor):
+    PublishedModel = apps.get_model('portal', 'PublishedModel')
+    for pmodel in PublishedModel.objects.all().iterator():
+        pmodel.latest_model_obj = pmodel.model_obj.order_by(
+            '-model__version').first()
+        pmodel.save(update_fields=['latest_model_obj'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0003_publishedmodel_latest_model_obj'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_latest_model_obj,
+                             migrations.RunPython.noop),
+    ]
@@ -4,7 +4,9 @@ from datetime import datetime, timedelta
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import models
-from django.db.models.signals import pre_delete, pre_save
+from django.db.models import Q
+from django.db.models.signals import (m2m_changed, post_delete, pre_delete,
+                                      pre_save)
 from django.dispatch import receiver
 from django.template import engines
 from django.utils.text import slugify
@@ -23,7 +25,50 @@ class PublishedModel(models.Model):
     name = models.CharField(max_length=512)
     project = models.ForeignKey('projects.Project', on_delete=models.CASCADE)
     model_obj = models.ManyToManyField(PublicModelObject)
+    # Newest entry of model_obj, kept up to date by the m2m_changed signal
+    # so catalog pages can join on it instead of sorting per model.
+    latest_model_obj = models.ForeignKey(
+        PublicModelObject, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='+')
     img = models.ImageField(upload_to='models/image',
                             null=True, blank=True, default=None)
     updated_on = models.DateTimeField(auto_now=True)
     created_on = models.DateTimeField(auto_now_add=True)
+
+    def update_latest_model_obj(self):
+        self.latest_model_obj = self.model_obj.order_by(
+            '-model__version').first()
+        self.save(update_fields=['latest_model_obj'])
+
+
+@receiver(m2m_changed, sender=PublishedModel.model_obj.through,
+          dispatch_uid='published_model_obj_changed_signal')
+def published_model_obj_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # pk_set is None on clear, the affected models are then the ones
+        # pointing at the cleared object.
+        pmodels = PublishedModel.objects.filter(
+            Q(pk__in=pk_set or []) | Q(latest_model_obj=instance))
+    else:
+        pmodels = [instance]
+    for pmodel in pmodels:
+        pmodel.update_latest_model_obj()
+
+
+@receiver(pre_delete, sender=PublicModelObject,
+          dispatch_uid='public_model_obj_pre_delete_signal')
+def public_model_obj_pre_delete(sender, instance, **kwargs):
+    # Deleting the object clears latest_model_obj and the m2m rows without
+    # m2m_changed, remember the models to recompute after the delete.
+    instance._published_models = list(PublishedModel.objects.filter(
+        latest_model_obj=instance).values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=PublicModelObject,
+          dispatch_uid='public_model_obj_post_delete_signal')
+def public_model_obj_post_delete(sender, instance, **kwargs):
+    for pmodel in PublishedModel.objects.filter(
+            pk__in=getattr(instance, '_published_models', [])):
+        pmodel.update_latest_model_obj()
@@ -1,3 +1,35 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from apps.models import AppInstance, Apps
+from projects.models import Project
+
+
+class PortalIndexTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('foo', 'foo@test.com', 'bar')
+        project = Project.objects.create_project(
+            name='test-portal',
+            owner=user,
+            description='',
+            repository=''
+        )
+        app = Apps.objects.create(name='Jupyter', slug='jupyter')
+        for name, tags, access in [('a', ['ml', 'gpu'], 'public'),
+                                   ('b', ['ml'], 'public'),
+                                   ('c', ['ml'], 'private')]:
+            instance = AppInstance.objects.create(
+                name=name, app=app, project=project, owner=user, access=access)
+            instance.tags.add(*tags)
+
+    def test_tag_filter_in_url(self):
+        url = reverse('portal:index')
+        response = self.client.get(url, {'tag': 'ml'})
+        self.assertEqual(sorted(app.name for app in response.context['page']),
+                         ['a', 'b'])
+
+        response = self.client.get(url, {'tag': 'gpu'})
+        self.assertEqual([app.name for app in response.context['page']], ['a'])
+        # The removal link drops the tag again.
+        self.assertContains(response, 'href="{}?"'.format(url))
@@ -4,7 +4,7 @@ import uuid
 import requests
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Q
+from django.core.paginator import Paginator
 from django.http import JsonResponse
 from django.shortcuts import HttpResponseRedirect, redirect, render, reverse
 from django.template import engines
@@ -13,15 +13,11 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import View
 
 from apps.models import AppInstance, Apps
-from projects.models import Project
+from projects.helpers import get_sidebar_projects
 
 
 def index(request, id=0):
-    try:
-        projects = Project.objects.filter(Q(owner=request.user) | Q(
-            authorized=request.user), status='active')
-    except Exception as err:
-        print("User not logged in.")
+    projects = get_sidebar_projects(request.user)
     #base_template = 'base.html'
     if 'project' in request.session:
         project_slug = request.session['project']
@@ -41,58 +37,21 @@ def index(request, id=0):
     #     print(base_template)
     media_url = settings.MEDIA_URL
 
-    # create session object to store info about app and their tag counts
-    if "app_tags" not in request.session:
-        request.session['app_tags'] = {}
-    # tag_count from the get request helps set num_tags which helps set the number of tags to show in the template
-    if "tag_count" in request.GET:
-        # add app id to app_tags object
-        if "app_id_add" in request.GET:
-            num_tags = int(request.GET['tag_count'])
-            id = int(request.GET['app_id_add'])
-            request.session['app_tags'][str(id)] = num_tags
-        # remove app id from app_tags object
-        if "app_id_remove" in request.GET:
-            num_tags = int(request.GET['tag_count'])
-            id = int(request.GET['app_id_remove'])
-            if str(id) in request.session['app_tags']:
-                request.session['app_tags'].pop(str(id))
-
-    # reset app_tags if Apps Tab on Sidebar pressed
-    if id == 0:
-        if 'tf_add' not in request.GET and 'tf_remove' not in request.GET:
-            request.session['app_tags'] = {}
-
-    published_apps = AppInstance.objects.filter(
-        ~Q(state='Deleted'), access='public')
-
-    # create session object to store ids for tag seacrh if it does not exist
-    if "app_tag_filters" not in request.session:
-        request.session['app_tag_filters'] = []
-    if 'tf_add' in request.GET:
-        tag = request.GET['tf_add']
-        if tag not in request.session['app_tag_filters']:
-            request.session['app_tag_filters'].append(tag)
-    elif 'tf_remove' in request.GET:
-        tag = request.GET['tf_remove']
-        if tag in request.session['app_tag_filters']:
-            request.session['app_tag_filters'].remove(tag)
-    elif "tag_count" not in request.GET:
-        tag = ""
-        request.session['app_tag_filters'] = []
-    print("app_tag_filters: ", request.session['app_tag_filters'])
-
-    # changed list of published model only if tag filters are present
-    if request.session['app_tag_filters']:
-        tagged_published_apps = []
-        for app in published_apps:
-            for t in app.tags.all():
-                if t in request.session['app_tag_filters']:
-                    tagged_published_apps.append(app)
-                    break
-        published_apps = tagged_published_apps
-
-    request.session.modified = True
+    # Filter state lives in the URL: ?tag=<name> (repeatable) selects apps
+    # with any of the tags, ?expand=<id> shows all tags of an app.
+    tag_filters = request.GET.getlist('tag')
+    expanded = request.GET.getlist('expand')
+
+    published_apps = AppInstance.objects.filter(access='public').exclude(
+        state='Deleted')
+    if tag_filters:
+        published_apps = published_apps.filter(
+            pk__in=AppInstance.objects.filter(
+                tags__name__in=tag_filters).values('pk'))
+    published_apps = published_apps.select_related(
+        'app').prefetch_related('tags').order_by('-created_on')
+    page = Paginator(published_apps, settings.CATALOG_PAGE_SIZE).get_page(
+        request.GET.get('page'))
 
     template = 'portal/index.html'
     return render(request, template, locals())
@@ -1,7 +1,13 @@
 import base64
 import re
 
+from django.apps import apps
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Subquery
+
+from common.cache import cached_fragment
 
 
 def urlify(s):
@@ -26,3 +32,81 @@ def decrypt_key(key):
     base64_bytes = key.encode('ascii')
     result = base64.b64decode(base64_bytes)
     return result.decode('ascii')
+
+
+@cached_fragment('sidebar_projects')
+def _sidebar_projects(user):
+    Project = apps.get_model(app_label=settings.PROJECTS_MODEL)
+    return list(Project.objects.filter(
+        Q(owner=user) | Q(authorized=user), status='active').distinct(
+        'name', 'pk').order_by('name', 'pk').values('name', 'slug'))
+
+
+def get_sidebar_projects(user):
+    """ Name and slug of the active projects of a user, for the project menu. """
+    if not user.is_authenticated:
+        return []
+    return _sidebar_projects(user)
+
+
+def invalidate_sidebar_projects(user_pks):
+    for user_pk in set(user_pks):
+        transaction.on_commit(
+            lambda user_pk=user_pk: _sidebar_projects.invalidate(user_pk))
+
+
+def project_summary_key(project_pk):
+    return 'project_summary_{}'.format(project_pk)
+
+
+def invalidate_project_summary(project_pk):
+    """ Drops the cached overview of a project once the current transaction commits. """
+    if project_pk:
+        transaction.on_commit(
+            lambda: cache.delete(project_summary_key(project_pk)))
+
+
+def get_project_summary(project):
+    """
+    Cached overview data of a project, shared by all its members:
+
+    instances: every non-deleted app instance that belongs to a category,
+        newest first, with app, category and owner joined in and annotated
+        with latest_status, shared (visible to project members) and public.
+    models: the ten latest model objects with their object types.
+    activity_logs: the five latest project log entries.
+
+    The cache entry is dropped by signals whenever one of these changes.
+    """
+    key = project_summary_key(project.pk)
+    summary = cache.get(key)
+    if summary is not None:
+        return summary
+
+    AppInstance = apps.get_model(app_label=settings.APPINSTANCE_MODEL)
+    Model = apps.get_model(app_label=settings.MODELS_MODEL)
+    AppPermission = AppInstance._meta.get_field('permission').related_model
+    AppStatus = AppInstance._meta.get_field('status').related_model
+    ProjectLog = apps.get_model('projects', 'ProjectLog')
+
+    latest_status = AppStatus.objects.filter(
+        appinstance=OuterRef('pk')).order_by('-time').values('status_type')[:1]
+    instances = AppInstance.objects.filter(
+        ~Q(state='Deleted'), project=project, app__category__isnull=False
+    ).select_related('app', 'app__category', 'owner').annotate(
+        latest_status=Subquery(latest_status),
+        shared=Exists(AppPermission.objects.filter(
+            appinstance=OuterRef('pk'), projects=project)),
+        public=Exists(AppPermission.objects.filter(
+            appinstance=OuterRef('pk'), public=True)),
+    ).order_by('-created_on')
+
+    summary = {
+        'instances': list(instances),
+        'models': list(Model.objects.filter(project=project).prefetch_related(
+            'object_type').order_by('-uploaded_at')[:10]),
+        'activity_logs': list(ProjectLog.objects.filter(
+            project=project).order_by('-created_at')[:5]),
+    }
+    cache.set(key, summary, settings.PROJECT_SUMMARY_CACHE_TTL)
+    return summary
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+def backfill_search_vector(apps, schema_editor):
+    Project = apps.get_model('projects', 'Project')
+    config = settings.SEARCH_CONFIG
+    Project.objects.update(search_vector=SearchVector('name', weight='A', config=config) +
+                           SearchVector('description', weight='B', config=config))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_vector,
+                             migrations.RunPython.noop),
+    ]
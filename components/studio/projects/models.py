@@ -6,13 +6,19 @@ import string
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_save, pre_delete
 from django.dispatch import receiver
 from django.utils.text import slugify
 from guardian.shortcuts import assign_perm
 from rest_framework.authtoken.models import Token
 
+from common.search import update_search_vector
+
+from .helpers import invalidate_project_summary, invalidate_sidebar_projects
+
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_auth_token(sender, instance=None, created=False, **kwargs):
@@ -154,6 +160,7 @@ class Project(models.Model):
     status = models.CharField(max_length=20, null=True,
                               blank=True, default="active")
     updated_at = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     # These fields should be removed.
     image = models.CharField(max_length=2048, blank=True, null=True)
@@ -169,11 +176,39 @@ class Project(models.Model):
         permissions = [
             ('can_view_project', 'Can view project')
         ]
+        indexes = [
+            GinIndex(fields=['search_vector'], name='project_search_idx'),
+        ]
 
     def __str__(self):
         return "Name: {} ({})".format(self.name, self.status)
 
 
+def _project_users(project):
+    return [project.owner_id] + list(project.authorized.values_list('pk', flat=True))
+
+
+@receiver([post_save, pre_delete], sender=Project, dispatch_uid='project_sidebar_signal')
+def project_changed(sender, instance, **kwargs):
+    invalidate_sidebar_projects(_project_users(instance))
+
+
+@receiver(m2m_changed, sender=Project.authorized.through, dispatch_uid='project_authorized_sidebar_signal')
+def project_authorized_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_sidebar_projects([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        invalidate_sidebar_projects(pk_set)
+    elif action == 'pre_clear':
+        invalidate_sidebar_projects(_project_users(instance))
+
+
+@receiver(post_save, sender=Project, dispatch_uid='project_search_signal')
+def update_project_search(sender, instance, **kwargs):
+    update_search_vector(instance, [('name', 'A'), ('description', 'B')])
+
+
 class ProjectLog(models.Model):
     MODULE_CHOICES = [
         ('DE', 'deployments'),
@@ -192,6 +227,11 @@ class ProjectLog(models.Model):
         settings.PROJECTS_MODEL, on_delete=models.CASCADE)
 
 
+@receiver(post_save, sender=ProjectLog, dispatch_uid='project_log_post_save_signal')
+def post_save_project_log(sender, instance, **kwargs):
+    invalidate_project_summary(instance.project_id)
+
+
 class ProjectTemplate(models.Model):
     description = models.TextField(null=True, blank=True)
     image = models.ImageField(
@@ -3,12 +3,13 @@ import os
 import yaml
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 from guardian.shortcuts import assign_perm, remove_perm
 
-from .helpers import decrypt_key
-from .models import Environment, Project
+from .helpers import decrypt_key, get_sidebar_projects, project_summary_key
+from .models import Environment, Project, ProjectLog
 
 
 class ProjectTestCase(TestCase):
@@ -244,3 +245,125 @@ class ProjectViewTestCase(TestCase):
         self.assertEqual(project.owner, new_owner)
         self.assertTrue(new_owner.has_perm('can_view_project', project))
         self.assertTrue(owner in project.authorized.all())
+
+
+class ProjectOverviewTestCase(TestCase):
+    def setUp(self):
+        from apps.models import AppCategories, AppInstance, Apps, AppStatus
+
+        user = User.objects.create_user('foo', 'foo@test.com', 'bar')
+        other = User.objects.create_user('member', 'foo@test.com', 'bar')
+        self.project = Project.objects.create_project(
+            name='test-overview',
+            owner=user,
+            description='',
+            repository=''
+        )
+        category = AppCategories.objects.create(name='Compute', slug='compute')
+        app = Apps.objects.create(name='Jupyter', slug='jupyter',
+                                  category=category)
+        self.instance = AppInstance.objects.create(
+            name='mylab', app=app, project=self.project, owner=user)
+        AppInstance.objects.create(
+            name='otherlab', app=app, project=self.project, owner=other)
+        AppStatus.objects.create(
+            appinstance=self.instance, status_type='Installed')
+        self.url = reverse('projects:details', kwargs={
+            'user': 'foo', 'project_slug': self.project.slug})
+        self.client.login(username='foo', password='bar')
+        cache.clear()
+
+    def test_overview_lists_visible_apps(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        objs = response.context['resources'][0]['objs']
+        self.assertEqual([obj.name for obj in objs], ['mylab'])
+        self.assertEqual(objs[0].latest_status, 'Installed')
+        self.assertEqual(response.context['pk_list'],
+                         "'{}'".format(self.instance.pk))
+
+    def test_summary_is_cached_and_invalidated(self):
+        from apps.models import AppStatus
+
+        self.client.get(self.url)
+        self.assertIsNotNone(cache.get(project_summary_key(self.project.pk)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AppStatus.objects.create(
+                appinstance=self.instance, status_type='Running')
+        self.assertIsNone(cache.get(project_summary_key(self.project.pk)))
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response.context['resources'][0]['objs'][0].latest_status, 'Running')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProjectLog.objects.create(project=self.project, headline='h',
+                                      description='d')
+        self.assertIsNone(cache.get(project_summary_key(self.project.pk)))
+
+
+class SidebarProjectsTestCase(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('foo', 'foo@test.com', 'bar')
+        self.member = User.objects.create_user('member', 'foo@test.com', 'bar')
+        self.project = Project.objects.create_project(
+            name='test-sidebar',
+            owner=self.owner,
+            description='',
+            repository=''
+        )
+        cache.clear()
+
+    def names(self, user):
+        return [project['name'] for project in get_sidebar_projects(user)]
+
+    def test_sidebar_follows_authorized_users(self):
+        self.assertEqual(self.names(self.member), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.authorized.add(self.member)
+        self.assertEqual(self.names(self.member), ['test-sidebar'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.authorized.remove(self.member)
+        self.assertEqual(self.names(self.member), [])
+
+    def test_sidebar_follows_project_changes(self):
+        self.assertEqual(self.names(self.owner), ['test-sidebar'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.name = 'renamed'
+            self.project.save()
+        self.assertEqual(self.names(self.owner), ['renamed'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.delete()
+        self.assertEqual(self.names(self.owner), [])
+
+
+class AppMenuTestCase(TestCase):
+    def setUp(self):
+        from apps.models import AppCategories, Apps
+
+        user = User.objects.create_user('foo', 'foo@test.com', 'bar')
+        self.project = Project.objects.create_project(
+            name='test-menu',
+            owner=user,
+            description='',
+            repository=''
+        )
+        self.category = AppCategories.objects.create(
+            name='Compute', slug='compute')
+        Apps.objects.create(name='Jupyter', slug='jupyter',
+                            category=self.category)
+        cache.clear()
+
+    def test_menu_is_invalidated_by_new_apps(self):
+        from apps.helpers import get_app_menu
+        from apps.models import Apps
+
+        menu = get_app_menu(self.project)
+        self.assertEqual([app.slug for app in menu['apps']['compute']],
+                         ['jupyter'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Apps.objects.create(name='VS Code', slug='vscode',
+                                category=self.category, priority=200)
+        menu = get_app_menu(self.project)
+        self.assertEqual([app.slug for app in menu['apps']['compute']],
+                         ['vscode', 'jupyter'])
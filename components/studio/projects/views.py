@@ -1,6 +1,7 @@
 import base64
 import logging
 import random
+from collections import defaultdict
 
 import markdown
 import requests as r
@@ -16,8 +17,11 @@ from django.shortcuts import render, reverse
 from guardian.decorators import permission_required_or_403
 from guardian.shortcuts import assign_perm, remove_perm
 
+from apps.helpers import get_app_menu
+
 from .exceptions import ProjectCreationException
 from .forms import PublishProjectToGitHub, TransferProjectOwnershipForm
+from .helpers import get_project_summary, get_sidebar_projects
 from .models import (S3, Environment, Flavor, MLFlow, Project, ProjectLog,
                      ProjectTemplate)
 from .tasks import create_resources_from_template
@@ -66,12 +70,7 @@ def create_environment(request, user, project_slug):
 @permission_required_or_403('can_view_project',
                             (Project, 'slug', 'project_slug'))
 def settings(request, user, project_slug):
-    try:
-        projects = Project.objects.filter(Q(owner=request.user) | Q(
-            authorized=request.user), status='active').distinct('pk')
-    except TypeError as err:
-        projects = []
-        print(err)
+    projects = get_sidebar_projects(request.user)
 
     template = 'projects/settings.html'
     project = Project.objects.filter(Q(owner=request.user) | Q(
@@ -437,12 +436,7 @@ def create(request):
 def details(request, user, project_slug):
 
     is_authorized = False
-    try:
-        projects = Project.objects.filter(Q(owner=request.user) | Q(
-            authorized=request.user), status='active').distinct('pk')
-    except TypeError as err:
-        projects = []
-        print(err)
+    projects = get_sidebar_projects(request.user)
     if request.user.is_superuser:
         is_authorized = True
     else:
@@ -468,32 +462,29 @@ def details(request, user, project_slug):
         message = 'Project not found.'
 
     if project:
-        pk_list = ''
-
         status_success = django_settings.APPS_STATUS_SUCCESS
         status_warning = django_settings.APPS_STATUS_WARNING
-        activity_logs = ProjectLog.objects.filter(
-            project=project).order_by('-created_at')[:5]
-        resources = list()
-        cats = AppCategories.objects.all().order_by('-priority')
-        rslugs = []
-        for cat in cats:
-            rslugs.append({"slug": cat.slug, "name": cat.name})
-
-        for rslug in rslugs:
-            tmp = AppInstance.objects.filter(~Q(state="Deleted"), Q(owner=request.user) | Q(permission__projects__slug=project.slug) | Q(permission__public=True),
-                                             project=project,
-                                             app__category__slug=rslug['slug']).order_by('-created_on')[:5]
-            for instance in tmp:
-                pk_list += str(instance.pk)+','
-            apps_filtered = Apps.objects.filter(category__slug=rslug['slug'], user_can_create=True).order_by(
-                'slug', '-revision').distinct('slug')
-            resources.append(
-                {"title": rslug['name'], "objs": tmp, "apps": apps_filtered})
-        pk_list = pk_list[:-1]
-        pk_list = "'"+pk_list+"'"
-        models = Model.objects.filter(
-            project=project).order_by('-uploaded_at')[:10]
+        summary = get_project_summary(project)
+        activity_logs = summary['activity_logs']
+        models = summary['models']
+
+        # Latest five visible instances per category.
+        objs = defaultdict(list)
+        for instance in summary['instances']:
+            category = instance.app.category_id
+            if len(objs[category]) >= 5:
+                continue
+            if instance.owner_id == request.user.pk or instance.shared or instance.public:
+                objs[category].append(instance)
+
+        app_menu = get_app_menu(project)
+        resources = [{"title": cat.name,
+                      "objs": objs[cat.slug],
+                      "apps": app_menu['apps'].get(cat.slug, [])}
+                     for cat in app_menu['categories']]
+        pk_list = "'"+','.join(str(instance.pk)
+                               for resource in resources
+                               for instance in resource['objs'])+"'"
 
     return render(request, template, locals())
 
@@ -0,0 +1,49 @@
+// Keeps the status badges (elements with id "status-<pk>") of a project's
+// apps up to date. Status changes are pushed over a websocket, polling the
+// get_status view is only used while the socket is not connected.
+function watchAppStatus(socketPath, statusUrl, pkList, interval) {
+  "use strict";
+  var statusSocket = null;
+
+  function connect() {
+    var scheme = window.location.protocol === 'https:' ? 'wss://' : 'ws://';
+    statusSocket = new WebSocket(scheme + window.location.host + socketPath);
+    statusSocket.onmessage = function(e) {
+      var data = JSON.parse(e.data);
+      var element = document.getElementById("status-" + data.pk);
+      if (element) {
+        element.innerHTML = data.html;
+      }
+    };
+    statusSocket.onclose = function() {
+      statusSocket = null;
+      setTimeout(connect, 30000);
+    };
+  }
+
+  function poll() {
+    if (statusSocket && statusSocket.readyState === WebSocket.OPEN) {
+      setTimeout(poll, interval);
+      return;
+    }
+    $.ajax({
+      type: "GET",
+      url: statusUrl,
+      data: {'pk': pkList},
+      success: function(data) {
+        pkList.split(',').forEach(function(item) {
+          var element = document.getElementById("status-" + item);
+          if (element) {
+            element.innerHTML = data['status-' + item];
+          }
+        });
+      },
+      complete: function() {
+        setTimeout(poll, interval);
+      }
+    });
+  }
+
+  connect();
+  setTimeout(poll, interval);
+}
@@ -4,4 +4,21 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'studio.settings')
 
-application = get_asgi_application()
+# Initialise Django before importing consumers that touch the ORM.
+django_asgi_app = get_asgi_application()
+
+from channels.auth import AuthMiddlewareStack  # noqa: E402
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.security.websocket import \
+    AllowedHostsOriginValidator  # noqa: E402
+
+import apps.routing  # noqa: E402
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    # Reject sockets opened from foreign pages, which would otherwise
+    # carry the visitor's session cookie.
+    'websocket': AllowedHostsOriginValidator(AuthMiddlewareStack(
+        URLRouter(apps.routing.websocket_urlpatterns)
+    )),
+})
@@ -4,12 +4,12 @@ from django.db.models.signals import pre_save
 from django.dispatch import receiver
 from django.http import HttpResponseRedirect
 from rest_framework.authentication import (BasicAuthentication,
-                                           SessionAuthentication,
-                                           TokenAuthentication)
+                                           SessionAuthentication)
 from rest_framework.permissions import BasePermission, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from api.authentication import ExpiringTokenAuthentication
 from apps.models import AppInstance
 from projects.models import Project
 
@@ -70,7 +70,7 @@ class ModifiedSessionAuthentication(SessionAuthentication):
 
 class AuthView(APIView):
     authentication_classes = [
-        ModifiedSessionAuthentication, TokenAuthentication]
+        ModifiedSessionAuthentication, ExpiringTokenAuthentication]
     permission_classes = [IsAuthenticated, AccessPermission]
 
     def get(self, request, format=None):
@@ -3,11 +3,10 @@
 import fire
 import os
 import tensorflow as tf
-from stackn import stackn
-
 import requests
 import numpy as np
 from stackn.auth import get_config
+from stackn.sdk import Client
 
 
 NUM_CLASSES=10
@@ -41,7 +40,32 @@ def _create_model(name='mnist-keras', seed="seed.npz", dir="models/1/"):
     model.set_weights(weights)
 
     tf.saved_model.save(model, dir)
-    stackn.create_object(name, object_type='tensorflow', release_type="major", secure_mode=False)
+    with Client(secure=False) as studio:
+        studio.create_object(name, object_type='tensorflow', release_type="major")
+
+class _MetadataCallback(tf.keras.callbacks.Callback):
+    """ Logs per-epoch metrics to STACKn, flushed in batches. """
+    def __init__(self, logger, run_id, trained_model, parameters):
+        super().__init__()
+        self.logger = logger
+        self.run_id = run_id
+        self.trained_model = trained_model
+        self.parameters = parameters
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.logger.add(run_id=f'{self.run_id}-{epoch}',
+                        trained_model=self.trained_model,
+                        parameters=self.parameters,
+                        metrics={k: float(v) for k, v in (logs or {}).items()})
+
+def _train(name='mnist-keras', version='1.0', epochs=5, batch_size=32, data_path="data/mnist.npz", run_id='run'):
+    x, y = _load_data(data_path)
+    model = _compile_model()
+    parameters = {'epochs': epochs, 'batch_size': batch_size}
+    # Metrics are sent from a background thread, training never waits for Studio.
+    with Client() as studio, studio.metadata_logger(batch_size=50, background=True) as logger:
+        model.fit(x, y, epochs=epochs, batch_size=batch_size,
+                  callbacks=[_MetadataCallback(logger, run_id, f'{name}:{version}', parameters)])
 
 def _get_data(out_dir='data'):
     # Make dir if necessary
@@ -99,5 +123,6 @@ def _predict(endpoint, n=2, data_path="data/mnist.npz"):
 if __name__ == '__main__':
   fire.Fire({"get_data": _get_data,
             "build_model": _create_model,
+            "train": _train,
             "predict": _predict
             })
\ No newline at end of file